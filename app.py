@@ -1,10 +1,19 @@
 import streamlit as st
 import pandas as pd
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from datetime import datetime, date
+from datetime import datetime
 from io import BytesIO
 import calendar
+import os
+import time
+import uuid
+
+from billing import REFERENCE_STORE_PATH, ReferenceStore, ResultCache, RunMetrics
+from billing import MAX_CONCURRENT_JOBS, JobRunner, billing_job, job_worker_budget
+from billing import TARIFF_PATH, load_tariffs
+from billing import ANOMALY_KINDS, validate_workbook, format_days_outside_month
+from billing import DEFAULT_MEMORY_LIMIT_MB, LARGE_FILE_MB
+from billing import DEFAULT_PART_MATCHING, PART_MATCHING
+from billing import DEFAULT_LAYOUT, LAYOUTS
 
 st.set_page_config(page_title="Billing Summary Processor", layout="wide")
 
@@ -42,277 +51,202 @@ with st.sidebar:
         type=['xlsx', 'xlsm'],
         help="Upload the billing data file with daily sheets (1, 2, 3...31)"
     )
-
-def process_billing_data(file, month, year):
-    """Main processing function that mimics the VBA logic"""
-    
-    # Load workbook
-    wb = openpyxl.load_workbook(file, keep_vba=True, data_only=False)
-    
-    # Column headers definition
-    column_headers = [
-        "Order Date", "DU", "DU-Order", "CM Code.", "Sold To",
-        "Destination Code", "Ship To", "Address 1", "Address 2",
-        "Province", "Post Code", "Area", "Total Pick Q'TY",
-        "Ship Total WT", "Up 10KG/Chg", "Rate/KG", "Min/Charge",
-        "All Charge", "Pick Date", "Transport", "Premium",
-        "Remark", "Part No.", "Pick Q'TY", "Total Weight"
-    ]
-    
-    # Create temporary dataframe to collect data
-    temp_data = []
-    
-    # Get days in month
-    days_in_month = calendar.monthrange(year, month)[1]
-    
-    # Process each numeric sheet (representing days)
-    progress_bar = st.progress(0)
-    status_text = st.empty()
     
-    for day in range(1, days_in_month + 1):
-        sheet_name = str(day)
-        if sheet_name in wb.sheetnames:
-            status_text.text(f"Processing day {day}...")
-            sheet = wb[sheet_name]
-            
-            # Create delivery date
-            delivery_date = date(year, month, day)
-            
-            # Read data starting from row 9
-            row = 9
-            while sheet.cell(row, 1).value is not None:
-                temp_data.append({
-                    'Order Date': delivery_date,
-                    'DU': sheet.cell(row, 1).value,
-                    'Order': sheet.cell(row, 2).value,
-                    'DU-Order': sheet.cell(row, 3).value,
-                    'CM Code': sheet.cell(row, 4).value,
-                    'Sold To': sheet.cell(row, 5).value,
-                    'CN Code': sheet.cell(row, 6).value,
-                    'Ship To': sheet.cell(row, 7).value,
-                    'Address1': sheet.cell(row, 8).value,
-                    'Address2': sheet.cell(row, 9).value,
-                    'Province': sheet.cell(row, 10).value,
-                    'Post Code': sheet.cell(row, 11).value,
-                    'Tel': sheet.cell(row, 12).value,
-                    'Part Number': sheet.cell(row, 13).value,
-                    'Pick QTY': sheet.cell(row, 14).value,
-                    'Free Gift': sheet.cell(row, 15).value,
-                    'Remark': sheet.cell(row, 16).value
-                })
-                row += 1
-        
-        progress_bar.progress((day) / days_in_month)
-    
-    status_text.text("Sorting data...")
-    
-    # Convert to DataFrame and sort
-    temp_df = pd.DataFrame(temp_data)
-    if len(temp_df) > 0:
-        temp_df = temp_df.sort_values(by=['Order Date', 'DU-Order'])
-    
-    # Load reference sheets
-    cargo_sheet = wb['Cargo and Weight']
-    sell_sheet = wb['Sell Price']
-    
-    # Build lookup dictionaries
-    status_text.text("Building lookup tables...")
-    
-    # Cargo and Weight lookup (Part Number -> Weight)
-    cargo_lookup = {}
-    row = 3
-    while cargo_sheet.cell(row, 2).value is not None:
-        part_num = cargo_sheet.cell(row, 2).value
-        weight = cargo_sheet.cell(row, 5).value
-        if part_num and weight:
-            cargo_lookup[str(part_num)] = float(weight)
-        row += 1
+    st.divider()
     
-    # Sell Price lookup (Post Code -> Area, Min Charge, Rate/KG)
-    sell_lookup = {}
-    row = 2
-    while sell_sheet.cell(row, 1).value is not None:
-        post_code = sell_sheet.cell(row, 1).value
-        area = sell_sheet.cell(row, 3).value
-        min_charge = sell_sheet.cell(row, 4).value
-        rate_kg = sell_sheet.cell(row, 5).value
-        if post_code:
-            sell_lookup[str(int(post_code))] = {
-                'area': area,
-                'min_charge': float(min_charge) if min_charge else 0,
-                'rate_kg': float(rate_kg) if rate_kg else 0
-            }
-        row += 1
+    # Parallel day sheet extraction
+    worker_count = st.number_input(
+        "Worker Processes",
+        min_value=1,
+        max_value=job_worker_budget(),
+        value=1,
+        step=1,
+        help=f"Read the daily sheets in parallel worker processes (1 = read them one by one). Up to "
+             f"{MAX_CONCURRENT_JOBS} jobs run at once, so each gets at most {job_worker_budget()}"
+    )
     
-    # Process summary data
-    status_text.text("Generating summary...")
-    summary_data = []
+    use_cache = st.checkbox(
+        "Reuse Cached Results",
+        value=True,
+        help="Skip re-processing when the same file is uploaded again or only the month changes"
+    )
     
-    if len(temp_df) > 0:
-        # Group by DU-Order
-        grouped = temp_df.groupby('DU-Order')
-        
-        for du_order, group in grouped:
-            # Get first row for basic info
-            first_row = group.iloc[0]
-            
-            # Calculate totals
-            total_qty = group['Pick QTY'].sum()
-            
-            # Calculate total weight
-            total_weight = 0
-            for _, row_data in group.iterrows():
-                part_num = str(row_data['Part Number']) if pd.notna(row_data['Part Number']) else ''
-                qty = row_data['Pick QTY'] if pd.notna(row_data['Pick QTY']) else 0
-                
-                if part_num in cargo_lookup:
-                    total_weight += qty * cargo_lookup[part_num]
-            
-            # Get pricing info
-            post_code = str(int(first_row['Post Code'])) if pd.notna(first_row['Post Code']) else ''
-            
-            if post_code in sell_lookup:
-                area = sell_lookup[post_code]['area']
-                min_charge = sell_lookup[post_code]['min_charge']
-                rate_kg = sell_lookup[post_code]['rate_kg']
-            else:
-                area = "Post Code Not Found"
-                min_charge = 0
-                rate_kg = 0
-            
-            # Calculate charges
-            up_10kg = max(total_weight - 10, 0) if total_weight > 10 else 0
-            all_charge = (up_10kg * rate_kg) + min_charge
-            transport = "STL" if area == "BKK" else "DASH"
-            
-            # Create summary row
-            summary_row = {
-                'Order Date': first_row['Order Date'],
-                'DU': '',
-                'DU-Order': du_order,
-                'CM Code.': first_row['CM Code'],
-                'Sold To': first_row['Sold To'],
-                'Destination Code': first_row['CN Code'],
-                'Ship To': first_row['Ship To'],
-                'Address 1': first_row['Address1'],
-                'Address 2': first_row['Address2'],
-                'Province': first_row['Province'],
-                'Post Code': first_row['Post Code'],
-                'Area': area,
-                'Total Pick Q\'TY': total_qty,
-                'Ship Total WT': total_weight,
-                'Up 10KG/Chg': up_10kg,
-                'Rate/KG': rate_kg,
-                'Min/Charge': min_charge,
-                'All Charge': all_charge,
-                'Pick Date': '',
-                'Transport': transport,
-                'Premium': '',
-                'Remark': first_row['Remark']
-            }
-            
-            # Add detail rows
-            for idx, row_data in group.iterrows():
-                part_num = str(row_data['Part Number']) if pd.notna(row_data['Part Number']) else ''
-                qty = row_data['Pick QTY'] if pd.notna(row_data['Pick QTY']) else 0
-                
-                # Calculate individual weight
-                if part_num in cargo_lookup:
-                    item_weight = qty * cargo_lookup[part_num]
-                else:
-                    item_weight = 'Part Not Found'
-                
-                detail_row = summary_row.copy()
-                detail_row['Part No.'] = part_num
-                detail_row['Pick Q\'TY'] = qty
-                detail_row['Total Weight'] = item_weight
-                
-                summary_data.append(detail_row)
+    use_incremental = st.checkbox(
+        "Incremental Month-to-Date",
+        value=False,
+        help="Re-process only the day sheets that changed since your last upload of this file for "
+             "the selected month (kept across sessions when you are signed in, else for this session)"
+    )
     
-    status_text.text("Creating output file...")
-    progress_bar.progress(1.0)
+    use_reference_store = st.checkbox(
+        "Use Compiled Reference Tables",
+        value=False,
+        help="Keep 'Cargo and Weight' and 'Sell Price' in a compiled store, rebuilt only when "
+             "those sheets change. Files with only day sheets are then priced from the store."
+    )
     
-    # Create output workbook
-    output_wb = openpyxl.Workbook()
-    summary_sheet = output_wb.active
-    summary_sheet.title = "Summary"
+    use_tariffs = st.checkbox(
+        "Use Tariff Definitions",
+        value=False,
+        disabled=not os.path.exists(TARIFF_PATH),
+        help=f"Price orders with the customer/date tariffs in {TARIFF_PATH} (threshold, weight bands, "
+             "FSC rate, transport rules) instead of the standard 10 kg / 13.62% FSC rules"
+    )
     
-    # Write headers
-    for col_idx, header in enumerate(column_headers, start=1):
-        cell = summary_sheet.cell(1, col_idx, header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+    part_matching = st.selectbox(
+        "Part Number Matching",
+        options=PART_MATCHING,
+        index=PART_MATCHING.index(DEFAULT_PART_MATCHING),
+        format_func=lambda x: x.capitalize(),
+        help="Exact: as typed. Normalized: ignore case, spaces, dashes and number/text differences. "
+             "Fuzzy: also match a unique part a few characters longer or shorter, or spelled almost "
+             "the same. Parts not matched exactly are listed in a 'Part Match' column; fuzzy matches "
+             "are highlighted."
+    )
     
-    # Set column widths
-    col_widths = [12, 3, 17, 10, 24, 16, 28, 13, 13, 9, 10, 9, 15, 13, 14, 9, 13, 15, 14, 9, 9, 18, 16, 10, 12]
-    for col_idx, width in enumerate(col_widths, start=1):
-        summary_sheet.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = width
+    layout = st.selectbox(
+        "Output Layout",
+        options=LAYOUTS,
+        index=LAYOUTS.index(DEFAULT_LAYOUT),
+        format_func=lambda x: x.capitalize(),
+        help="Flat: the Summary sheet, every line repeating its order. Normalized: one row per "
+             "DU-Order on an Orders sheet, the lines on a Detail sheet and By Day / By Area totals "
+             "(a smaller file that opens faster). The flat footer sums the charge of every line, "
+             "so an order counts once per line; the normalized totals count each order once"
+    )
     
-    summary_sheet.row_dimensions[1].height = 35
+    # Large uploads run in a separate process under a memory ceiling
+    use_large_file = st.checkbox(
+        "Large File Mode",
+        value=uploaded_file is not None and uploaded_file.size >= LARGE_FILE_MB * 1e6,
+        disabled=use_incremental,
+        help=f"Spill the upload to a temporary file and process it in a separate process held under "
+             f"the memory ceiling, one day sheet at a time (on by default from {LARGE_FILE_MB} MB; "
+             "not with Incremental Month-to-Date)"
+    ) and not use_incremental
+    
+    memory_limit_mb = st.number_input(
+        "Memory Ceiling (MB)",
+        min_value=256,
+        max_value=65536,
+        value=DEFAULT_MEMORY_LIMIT_MB,
+        step=256,
+        disabled=not use_large_file,
+        help="A run that needs more memory stops with an error instead of crashing the server"
+    )
     
-    # Freeze first row
-    summary_sheet.freeze_panes = 'A2'
+    st.divider()
     
-    # Write data
-    row_num = 2
-    for item in summary_data:
-        for col_idx, header in enumerate(column_headers, start=1):
-            value = item.get(header, '')
-            cell = summary_sheet.cell(row_num, col_idx, value)
-            
-            # Format numbers
-            if header in ['Total Pick Q\'TY', 'Ship Total WT', 'Up 10KG/Chg', 'All Charge', 'Pick Q\'TY', 'Total Weight']:
-                if isinstance(value, (int, float)) and value != 'Part Not Found':
-                    cell.number_format = '#,##0.00'
-        
-        row_num += 1
+    # Performance instrumentation
+    show_performance = st.checkbox(
+        "Show Performance Details",
+        value=False,
+        help="Time every processing phase and track memory (adds some overhead)"
+    )
     
-    # Add summary formulas at bottom
-    if row_num > 2:
-        last_data_row = row_num - 1
-        
-        # Summary row
-        summary_sheet.cell(row_num + 3, 13, f'=SUM(M2:M{last_data_row})')
-        summary_sheet.cell(row_num + 3, 14, f'=SUM(N2:N{last_data_row})')
-        summary_sheet.cell(row_num + 3, 18, f'=SUM(R2:R{last_data_row})')
-        
-        # Labels
-        summary_sheet.cell(row_num + 4, 13, 'CTN')
-        summary_sheet.cell(row_num + 4, 14, 'KG')
-        summary_sheet.cell(row_num + 4, 18, 'BATH')
-        
-        # FSC calculation
-        summary_sheet.cell(row_num + 6, 13, 'Fuel surcharge (FSC)')
-        summary_sheet.cell(row_num + 6, 14, f'=R{row_num + 3}*0.1362')
-        summary_sheet.cell(row_num + 6, 18, f'=R{row_num + 3}+N{row_num + 6}')
-        
-        summary_sheet.cell(row_num + 7, 14, 'BATH')
-        summary_sheet.cell(row_num + 7, 18, 'BATH')
-        
-        # Format summary cells
-        for col in [13, 14, 18]:
-            summary_sheet.cell(row_num + 3, col).number_format = '#,##0.00'
-            summary_sheet.cell(row_num + 6, col).number_format = '#,##0.00'
-            summary_sheet.cell(row_num + 3, col).font = Font(bold=True)
-            summary_sheet.cell(row_num + 6, col).font = Font(bold=True)
+    capture_profile = st.checkbox(
+        "Capture cProfile",
+        value=False,
+        disabled=not show_performance,
+        help="Profile this run with cProfile (slower; for diagnosing slow files)"
+    )
+
+@st.cache_resource
+def get_result_cache():
+    """On-disk result cache shared by every session of this server"""
+    return ResultCache()
+
+@st.cache_resource
+def get_job_runner():
+    """Background job runner shared by every session of this server"""
+    return JobRunner(max_workers=MAX_CONCURRENT_JOBS)
+
+def state_owner():
+    """Owner of incremental state: the signed-in user, else this browser session"""
+    user = getattr(st, 'user', None) or getattr(st, 'experimental_user', None)
+    email = user.get('email') if user is not None else None
+    if email:
+        return email
+    return st.session_state.setdefault('state_owner', uuid.uuid4().hex)
+
+def show_incremental_report(report):
+    """Which days were reused, and DU-Orders found on more than one day"""
+    st.info(
+        f"♻️ Reused {len(report['reused'])} unchanged day(s); "
+        f"re-read day(s) {', '.join(map(str, report['extracted'])) or 'none'}."
+    )
+    if report['cross_day_orders']:
+        spanning = ', '.join(
+            f"{du_order} (days {', '.join(map(str, days))})"
+            for du_order, days in list(report['cross_day_orders'].items())[:10]
+        )
+        st.warning(
+            f"⚠️ {len(report['cross_day_orders'])} DU-Order(s) appear on more than one day, "
+            f"so the whole month was re-summarized: {spanning}"
+        )
+
+def show_performance_details(metrics):
+    """Performance expander: one row per phase, JSON export and cProfile output"""
+    with st.expander("⏱️ Performance", expanded=True):
+        if metrics.phases:
+            phase_df = pd.DataFrame(metrics.phases)
+            phase_df['peak_memory_mb'] = pd.to_numeric(phase_df['peak_memory_bytes']) / 1e6
+            phase_df['max_rss_mb'] = pd.to_numeric(phase_df['max_rss_bytes']) / 1e6
+            st.dataframe(
+                phase_df[['phase', 'seconds', 'rows', 'rows_per_second', 'peak_memory_mb', 'max_rss_mb']],
+                hide_index=True,
+                use_container_width=True
+            )
+        if metrics.total_seconds is not None:
+            st.caption(f"Total wall time: {metrics.total_seconds:.2f}s")
+        if metrics.instrumented is False:
+            st.caption("Memory peaks and cProfile output were not captured: another run was being measured at the same time.")
         
-        summary_sheet.cell(row_num + 6, 18).fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+        st.download_button(
+            label="⬇️ Download Metrics (JSON)",
+            data=metrics.to_json(),
+            file_name="billing_performance.json",
+            mime="application/json"
+        )
         
-        # Alignment
-        for row in [row_num + 3, row_num + 4, row_num + 6, row_num + 7]:
-            for col in [13, 14, 18]:
-                summary_sheet.cell(row, col).alignment = Alignment(horizontal='center')
-    
-    status_text.text("Complete!")
-    progress_bar.empty()
-    
-    # Save to BytesIO
-    output = BytesIO()
-    output_wb.save(output)
-    output.seek(0)
-    
-    return output, len(summary_data)
+        profile_text = metrics.profile_text()
+        if profile_text:
+            st.code(profile_text, language=None)
+            st.download_button(
+                label="⬇️ Download cProfile Stats (.prof)",
+                data=metrics.profile_bytes(),
+                file_name="billing_profile.prof",
+                mime="application/octet-stream"
+            )
+
+def show_validation(result):
+    """Anomaly counts per kind and every listed location, with a CSV export"""
+    period = f"{calendar.month_name[result['month']]} {result['year']}"
+    st.caption(
+        f"🔍 Checked {result['rows']} rows on {len(result['days'])} day sheet(s) for {period} "
+        f"in {result['seconds']:.2f}s"
+    )
+    if not result['reference_checked']:
+        st.warning("⚠️ No reference sheets in the file: parts and post codes were not looked up")
+    if not result['counts']:
+        st.success("✅ No problems found")
+        return
+    
+    st.warning(
+        "⚠️ Problems found: " + "; ".join(
+            f"{count} x {ANOMALY_KINDS[kind]}" for kind, count in result['counts'].items()
+        )
+    )
+    with st.expander("🔎 Anomalies", expanded=True):
+        anomaly_df = pd.DataFrame(result['anomalies'], columns=['sheet', 'row', 'column', 'value', 'message'])
+        anomaly_df['value'] = anomaly_df['value'].astype(object).map(lambda v: '' if v is None else str(v))
+        st.dataframe(anomaly_df, hide_index=True, use_container_width=True)
+        st.download_button(
+            label="⬇️ Download Anomalies (CSV)",
+            data=anomaly_df.to_csv(index=False).encode('utf-8-sig'),
+            file_name="billing_anomalies.csv",
+            mime="text/csv"
+        )
 
 # Main processing
 if uploaded_file is not None:
@@ -329,35 +263,113 @@ if uploaded_file is not None:
     
     st.divider()
     
-    # Process button
-    if st.button("🚀 Generate Summary", type="primary", use_container_width=True):
-        with st.spinner("Processing billing data..."):
+    # Quick check of the file before the (longer) run
+    validation_key = (uploaded_file.file_id, selected_month, selected_year, part_matching)
+    if st.button("🔍 Check File", use_container_width=True):
+        with st.spinner("Checking file..."):
             try:
-                output_file, record_count = process_billing_data(
-                    uploaded_file,
+                st.session_state['validation'] = (validation_key, validate_workbook(
+                    BytesIO(uploaded_file.getvalue()),
                     selected_month,
-                    selected_year
-                )
-                
-                st.success(f"✅ Processing complete! Generated {record_count} records.")
-                
-                # Download button
-                output_filename = f"Summary_Billing_{calendar.month_name[selected_month]}_{selected_year}.xlsx"
-                
-                st.download_button(
-                    label="⬇️ Download Summary Report",
-                    data=output_file,
-                    file_name=output_filename,
-                    mime="application/vnd.openxmlformats-officedococument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-                
-                st.balloons()
-                
+                    selected_year,
+                    reference_store=ReferenceStore(REFERENCE_STORE_PATH) if use_reference_store else None,
+                    part_matching=part_matching
+                ))
             except Exception as e:
-                st.error(f"❌ Error processing file: {str(e)}")
-                st.exception(e)
-else:
+                st.session_state.pop('validation', None)
+                st.error(f"❌ Could not read the file: {e}")
+    validation = st.session_state.get('validation')
+    if validation is not None and validation[0] == validation_key:
+        show_validation(validation[1])
+    
+    # Process button: the run happens in a background job so widget
+    # interaction or a page refresh does not throw the work away
+    if st.button("🚀 Generate Summary", type="primary", use_container_width=True):
+        metrics = RunMetrics(track_memory=True, profile=capture_profile) if show_performance else None
+        try:
+            tariffs = load_tariffs(TARIFF_PATH) if use_tariffs else None
+        except (OSError, ValueError, KeyError) as e:
+            st.error(f"❌ Invalid tariff definitions in {TARIFF_PATH}: {e}")
+            st.stop()
+        job_id = get_job_runner().submit(
+            billing_job,
+            uploaded_file.getvalue(),
+            uploaded_file.name,
+            selected_month,
+            selected_year,
+            workers=worker_count,
+            cache=get_result_cache() if use_cache else None,
+            reference_store=ReferenceStore(REFERENCE_STORE_PATH) if use_reference_store else None,
+            incremental=use_incremental,
+            metrics=metrics,
+            tariffs=tariffs,
+            part_matching=part_matching,
+            memory_limit_mb=memory_limit_mb if use_large_file else None,
+            layout=layout,
+            owner=state_owner(),
+            label=f"{uploaded_file.name} {calendar.month_name[selected_month]} {selected_year}"
+        )
+        st.session_state['job_id'] = job_id
+        st.query_params['job'] = job_id
+
+# Reconnect to the current job (also after a rerun or a page refresh)
+job_id = st.session_state.get('job_id') or st.query_params.get('job')
+job = get_job_runner().get(job_id) if job_id else None
+
+if job_id and job is None:
+    st.warning("⚠️ The previous job is no longer available on this server. Please generate the summary again.")
+    st.session_state.pop('job_id', None)
+    if 'job' in st.query_params:
+        del st.query_params['job']
+elif job is not None:
+    st.session_state['job_id'] = job.id
+    st.caption(f"Job {job.id}: {job.label}")
+    
+    if not job.done:
+        position = get_job_runner().queue_position(job.id)
+        if position is not None:
+            st.info(f"⏳ Queued ({position} ahead of you incl. this job) - other files are being processed")
+        st.progress(job.progress)
+        st.text(job.message)
+        if st.button("✖️ Cancel", key=f"cancel-{job.id}"):
+            get_job_runner().cancel(job.id)
+        time.sleep(1)
+        st.rerun()
+    elif job.status == 'cancelled':
+        st.info("✖️ The job was cancelled.")
+    elif job.status == 'error':
+        st.error(f"❌ Error processing file: {job.error}")
+        st.code(job.traceback, language=None)
+    else:
+        result = job.result
+        if result['incremental'] is not None:
+            show_incremental_report(result['incremental'])
+        
+        st.success(f"✅ Processing complete! Generated {result['records']} records.")
+        if result.get('days_outside_month'):
+            st.warning("⚠️ " + format_days_outside_month(result['days_outside_month'], result['month'], result['year']))
+        if result.get('peak_rss_bytes'):
+            st.caption(f"🧠 Peak memory of the billing process: {result['peak_rss_bytes'] / 1e6:,.0f} MB")
+        
+        # Download button
+        output_filename = f"Summary_Billing_{calendar.month_name[result['month']]}_{result['year']}.xlsx"
+        
+        st.download_button(
+            label="⬇️ Download Summary Report",
+            data=result['xlsx'],
+            file_name=output_filename,
+            mime="application/vnd.openxmlformats-officedococument.spreadsheetml.sheet",
+            use_container_width=True
+        )
+        
+        if st.session_state.get('celebrated') != job.id:
+            st.session_state['celebrated'] = job.id
+            st.balloons()
+        
+    if job.done and job.result is not None and job.result['metrics'] is not None:
+        show_performance_details(job.result['metrics'])
+
+if uploaded_file is None and job is None:
     st.info("👆 Please upload an Excel file to begin processing")
     
     # Display instructions
@@ -375,11 +387,15 @@ else:
              - "Cargo and Weight" sheet with part numbers and weights
              - "Sell Price" sheet with post codes and pricing info
         
-        3. **Generate Summary**
+        3. **Check File** (optional)
+           - Click "Check File" to list missing parts, unknown post codes, bad quantities,
+             DU-Orders repeated on other days and day sheets outside the month, by sheet and row
+        
+        4. **Generate Summary**
            - Click the "Generate Summary" button
            - Wait for processing to complete
         
-        4. **Download Result**
+        5. **Download Result**
            - Download the generated Summary report
            - The report will contain consolidated billing data
         
@@ -0,0 +1,126 @@
+"""Core billing summary logic shared by the Streamlit app and other entry points"""
+
+from billing.ingest import (
+    ALL_DAYS,
+    DAY_COLUMNS,
+    CATEGORY_COLUMNS,
+    NUMERIC_COLUMNS,
+    open_workbook,
+    iter_day_batches,
+    extract_day,
+    month_days,
+    extract_days,
+    extract_days_parallel,
+    stamp_month,
+    extract_month,
+    extract_month_parallel,
+    workbook_source,
+    read_cargo_lookup,
+    read_sell_lookup,
+)
+from billing.summary import (
+    SUMMARY_COLUMNS,
+    EXTRA_COLUMNS,
+    cargo_table,
+    sell_table,
+    part_keys,
+    post_code_keys,
+    summarize,
+    order_rows,
+    order_pivot,
+)
+from billing.parts import (
+    PART_MATCHING,
+    DEFAULT_PART_MATCHING,
+    normalize_part,
+    PartIndex,
+)
+from billing.tariff import (
+    TARIFF_PATH,
+    STANDARD_TARIFF,
+    TariffBook,
+    load_tariffs,
+)
+from billing.writer import (
+    COLUMN_WIDTHS,
+    FSC_RATE,
+    LAYOUTS,
+    DEFAULT_LAYOUT,
+    footer_fsc_rate,
+    write_summary,
+)
+from billing.cache import (
+    ResultCache,
+    content_key,
+)
+from billing.columnar import (
+    COLUMNAR_FORMATS,
+    read_columnar_info,
+    read_detail,
+    read_summary_columnar,
+    write_detail,
+    write_summary_columnar,
+)
+from billing.manifest import (
+    read_manifest,
+    parts_fingerprint,
+    sheet_fingerprints,
+)
+from billing.reference import (
+    REFERENCE_SHEETS,
+    REFERENCE_STORE_PATH,
+    ReferenceStore,
+    has_reference_sheets,
+    load_reference_tables,
+    compile_reference_store,
+)
+from billing.profiling import (
+    RunMetrics,
+    max_rss_bytes,
+)
+from billing.pipeline import (
+    parse_workbook,
+    typed_columns,
+    detail_frame,
+    month_frames,
+    summarize_month,
+    run_billing,
+    run_from_columnar,
+)
+from billing.incremental import (
+    INCREMENTAL_DIR,
+    state_path,
+    run_incremental,
+)
+from billing.bounded import (
+    DEFAULT_MEMORY_LIMIT_MB,
+    LARGE_FILE_MB,
+    MemoryLimitExceeded,
+    spill_upload,
+    run_bounded,
+)
+from billing.jobs import (
+    MAX_CONCURRENT_JOBS,
+    Job,
+    JobCancelled,
+    JobRunner,
+    billing_job,
+    job_worker_budget,
+)
+from billing.consolidate import (
+    consolidate,
+    order_totals,
+    write_consolidation,
+)
+from billing.validate import (
+    ANOMALY_KINDS,
+    validate_workbook,
+    format_validation,
+    days_outside_month,
+    format_days_outside_month,
+)
+from billing.api import (
+    MAX_UPLOAD_MB,
+    api_job,
+    make_server,
+)
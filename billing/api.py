@@ -0,0 +1,303 @@
+"""HTTP API for programmatic submission, on the same job runner as the app
+
+    python -m billing serve --port 8765 --workers 2
+
+    curl --data-binary @book.xlsm "http://localhost:8765/jobs?month=5&year=2024&name=book.xlsm"
+    curl -F file=@book.xlsm -F month=5 -F year=2024 -F format=parquet http://localhost:8765/jobs
+    curl "http://localhost:8765/jobs/<id>"
+    curl -OJ "http://localhost:8765/jobs/<id>/result?wait=300"
+    curl -X DELETE "http://localhost:8765/jobs/<id>"
+
+POST /jobs takes the workbook as the raw request body (parameters in the
+query string) or as the 'file' field of a multipart form. It queues the run
+and answers 202 with the job id at once; the result is fetched from
+/jobs/<id>/result when the job is done. Runs share a fixed pool of workers,
+further jobs wait in the queue; DELETE /jobs/<id> cancels one. Only the
+standard library is used.
+"""
+
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, quote, urlsplit
+import calendar
+import json
+import os
+import re
+import unicodedata
+import zipfile
+
+from billing.columnar import write_summary_columnar
+from billing.ingest import month_days
+from billing.jobs import MAX_CONCURRENT_JOBS, JobRunner, billing_job
+from billing.parts import PART_MATCHING
+from billing.pipeline import month_frames, parse_workbook
+from billing.validate import days_outside_month
+from billing.writer import DEFAULT_LAYOUT, LAYOUTS
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Larger uploads are refused with 413
+MAX_UPLOAD_MB = 200
+
+# Longest a result request may block with ?wait=
+MAX_WAIT_SECONDS = 600
+
+# Characters dropped from client-supplied names: control characters
+# (CR/LF included), quotes, path separators and the header separator ';'
+UNSAFE_NAME = re.compile(r'[\x00-\x1f\x7f"\\/;]')
+
+# Output format -> (content type, file name kind, extension)
+OUTPUT_FORMATS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'Summary_Billing', '.xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'Summary', '.parquet'),
+}
+
+
+def api_job(data, name, month, year, output_format='xlsx', workers=1, cache=None, reference_store=None,
+            tariffs=None, part_matching=None, layout=DEFAULT_LAYOUT, progress=None):
+    """One submitted run: the month's summary as XLSX or as Parquet rows
+
+    XLSX runs go through billing_job like the app's. Parquet runs parse and
+    summarize the month the same way and write the Summary rows as
+    write_summary_columnar does. Returns {'body': bytes, 'records': int,
+    'content_type': str, 'filename': str, 'days_outside_month': {day: rows}}.
+    """
+    if output_format == 'xlsx':
+        result = billing_job(
+            data, name, month, year, workers=workers, cache=cache, reference_store=reference_store,
+            tariffs=tariffs, part_matching=part_matching, layout=layout, progress=progress
+        )
+        body, record_count, outside = result['xlsx'], result['records'], result['days_outside_month']
+    else:
+        parsed = parse_workbook(BytesIO(data), month_days(month, year), workers, reference_store, progress)
+        _, summary_df = month_frames(parsed, month, year, progress, tariffs=tariffs, part_matching=part_matching)
+        output = BytesIO()
+        write_summary_columnar(summary_df, output, month, year, fmt='parquet')
+        body, record_count = output.getvalue(), len(summary_df)
+        outside = days_outside_month(BytesIO(data), month, year)
+
+    content_type, kind, ext = OUTPUT_FORMATS[output_format]
+    stem = os.path.splitext(safe_name(name))[0] or 'workbook'
+    return {
+        'body': body,
+        'records': record_count,
+        'content_type': content_type,
+        'filename': f"{stem}_{kind}_{calendar.month_name[month]}_{year}{ext}",
+        'days_outside_month': outside,
+    }
+
+
+def safe_name(name):
+    """Base name of a client-supplied file name without control characters, quotes or separators"""
+    return UNSAFE_NAME.sub('', name.replace('\\', '/').rsplit('/', 1)[-1]).strip()
+
+
+def content_disposition(filename):
+    """Attachment header value: an ASCII filename plus the UTF-8 one (RFC 5987)"""
+    fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    fallback = safe_name(fallback) or 'result'
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def job_options(fields):
+    """api_job arguments from the request's fields; raises ValueError on bad input"""
+    try:
+        month, year = int(fields['month']), int(fields['year'])
+    except KeyError as e:
+        raise ValueError(f"'{e.args[0]}' is required") from None
+    except ValueError:
+        raise ValueError("'month' and 'year' must be numbers") from None
+    if not 1 <= month <= 12:
+        raise ValueError(f"'month' must be 1..12, not {month}")
+
+    options = {
+        'month': month,
+        'year': year,
+        'output_format': fields.get('format', 'xlsx'),
+        'layout': fields.get('layout', DEFAULT_LAYOUT),
+        'part_matching': fields.get('part_matching'),
+    }
+    for key, name, choices in (('output_format', 'format', OUTPUT_FORMATS), ('layout', 'layout', LAYOUTS),
+                               ('part_matching', 'part_matching', PART_MATCHING)):
+        if options[key] is not None and options[key] not in choices:
+            raise ValueError(f"Unknown {name} '{options[key]}', expected one of {', '.join(choices)}")
+    return options
+
+
+def form_fields(content_type, body):
+    """{name: text} and the uploaded file (name, bytes) of a multipart/form-data body"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+    if not message.is_multipart():
+        raise ValueError("Malformed multipart body")
+    fields, upload = {}, None
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        if name == 'file':
+            upload = (safe_name(part.get_filename() or '') or 'workbook.xlsx', payload)
+        elif name:
+            fields[name] = payload.decode('utf-8')
+    return fields, upload
+
+
+class BillingServer(ThreadingHTTPServer):
+    """HTTP server holding the job runner and the settings every run uses"""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=MAX_CONCURRENT_JOBS, cache=None, reference_store=None, tariffs=None,
+                 max_upload_mb=MAX_UPLOAD_MB):
+        super().__init__(address, BillingRequestHandler)
+        self.runner = JobRunner(workers)
+        self.cache = cache
+        self.reference_store = reference_store
+        self.tariffs = tariffs
+        self.max_upload_bytes = int(max_upload_mb * 1e6)
+
+    def server_close(self):
+        super().server_close()
+        self.runner.shutdown(wait=False)
+
+    def submit(self, data, name, options):
+        return self.runner.submit(
+            api_job, data, name, cache=self.cache, reference_store=self.reference_store, tariffs=self.tariffs,
+            label=f"{name} {calendar.month_name[options['month']]} {options['year']}", **options
+        )
+
+
+class BillingRequestHandler(BaseHTTPRequestHandler):
+    """Routes: GET /health, GET /jobs, POST /jobs, GET /jobs/<id>, GET /jobs/<id>/result, DELETE /jobs/<id>"""
+
+    server_version = 'BillingAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['health']:
+            jobs = self.server.runner.jobs()
+            self._send_json(HTTPStatus.OK, {
+                'status': 'ok',
+                'workers': self.server.runner.max_workers,
+                'queued': sum(job.status == 'queued' for job in jobs),
+                'running': sum(job.status == 'running' for job in jobs),
+            })
+        elif parts == ['jobs']:
+            jobs = sorted(self.server.runner.jobs(), key=lambda job: job.created)
+            self._send_json(HTTPStatus.OK, {'jobs': [self._job_dict(job) for job in jobs]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.server.runner.get(parts[1])
+            if job is None:
+                return self._send_error(HTTPStatus.NOT_FOUND, f"No job '{parts[1]}'")
+            self._send_json(HTTPStatus.OK, self._job_dict(job))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            self._send_result(parts[1], query.get('wait'))
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"No route for GET {url.path}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            return self._send_error(HTTPStatus.NOT_FOUND, f"No route for POST {url.path}")
+
+        try:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            return self._send_error(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+        if length > self.server.max_upload_bytes:
+            return self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                    f"Uploads are limited to {self.server.max_upload_bytes / 1e6:,.0f} MB")
+        body = self.rfile.read(length)
+
+        fields = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        content_type = self.headers.get('Content-Type', '')
+        try:
+            if content_type.startswith('multipart/form-data'):
+                form, upload = form_fields(content_type, body)
+                fields.update(form)
+                if upload is None:
+                    raise ValueError("The form has no 'file' field")
+                name, data = upload
+                name = safe_name(fields.get('name', name)) or name
+            else:
+                name, data = safe_name(fields.get('name', '')) or 'workbook.xlsx', body
+            if not zipfile.is_zipfile(BytesIO(data)):
+                raise ValueError("The upload is not an XLSX/XLSM workbook")
+            options = job_options(fields)
+        except ValueError as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+
+        job = self.server.runner.get(self.server.submit(data, name, options))
+        self._send_json(HTTPStatus.ACCEPTED, self._job_dict(job), {'Location': f'/jobs/{job.id}'})
+
+    def do_DELETE(self):
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self._send_error(HTTPStatus.NOT_FOUND, f"No route for DELETE {self.path}")
+        job = self.server.runner.get(parts[1])
+        if job is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"No job '{parts[1]}'")
+        if not self.server.runner.cancel(job.id):
+            return self._send_error(HTTPStatus.CONFLICT, f"Job '{job.id}' is already {job.status}")
+        self._send_json(HTTPStatus.ACCEPTED, self._job_dict(job))
+
+    def _send_result(self, job_id, wait):
+        try:
+            wait = min(float(wait or 0), MAX_WAIT_SECONDS)
+        except ValueError:
+            return self._send_error(HTTPStatus.BAD_REQUEST, "'wait' must be a number of seconds")
+        job = self.server.runner.wait(job_id, timeout=wait) if wait > 0 else self.server.runner.get(job_id)
+        if job is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"No job '{job_id}'")
+        if job.status == 'error':
+            return self._send_json(HTTPStatus.UNPROCESSABLE_ENTITY, self._job_dict(job))
+        if job.status == 'cancelled':
+            return self._send_json(HTTPStatus.GONE, self._job_dict(job))
+        if not job.done:
+            return self._send_json(HTTPStatus.ACCEPTED, self._job_dict(job), {'Retry-After': '1'})
+
+        result = job.result
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', result['content_type'])
+        self.send_header('Content-Length', str(len(result['body'])))
+        self.send_header('Content-Disposition', content_disposition(result['filename']))
+        self.send_header('X-Billing-Records', str(result['records']))
+        self.end_headers()
+        self.wfile.write(result['body'])
+
+    def _job_dict(self, job):
+        info = job.to_dict()
+        info['queue_position'] = self.server.runner.queue_position(job.id)
+        info['records'] = job.result['records'] if job.result else None
+        info['days_outside_month'] = job.result['days_outside_month'] if job.result else None
+        info['status_url'] = f'/jobs/{job.id}'
+        info['result_url'] = f'/jobs/{job.id}/result'
+        return info
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=MAX_CONCURRENT_JOBS, cache=None,
+                reference_store=None, tariffs=None, max_upload_mb=MAX_UPLOAD_MB):
+    """A BillingServer bound to host:port (port 0 picks a free one, e.g. in tests)"""
+    return BillingServer((host, port), workers, cache, reference_store, tariffs, max_upload_mb)
@@ -0,0 +1,111 @@
+"""Phase-by-phase benchmark of the billing pipeline on synthetic workbooks
+
+    python -m billing bench --days 31 --rows-per-day 2000 --results bench_results.jsonl
+
+Each run appends one JSON object per line to the results file, so results
+from different commits or machines can be compared over time.
+"""
+
+from datetime import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+
+import openpyxl
+import openpyxl.xml
+import pandas as pd
+
+from billing.pipeline import run_billing
+from billing.profiling import RunMetrics
+from billing.synthetic import generate_workbook
+
+# Bump when the result layout changes
+RESULT_VERSION = 1
+
+PHASES = ['load', 'extract', 'lookup', 'sort', 'summarize', 'write']
+
+
+def run_once(path, month, year, track_memory=False):
+    """One instrumented pipeline run; returns (RunMetrics, rows, records)"""
+    metrics = RunMetrics(track_memory=track_memory)
+    _, records = run_billing(path, month, year, metrics=metrics)
+    rows = next(record['rows'] for record in metrics.phases if record['phase'] == 'extract')
+    return metrics, rows, records
+
+
+def run_benchmark(days=31, rows_per_day=500, parts=2000, post_codes=300, repeat=3,
+                  month=1, year=2024, seed=0, workbook=None, track_memory=True):
+    """Generate a workbook (unless one is given) and benchmark it
+
+    Phase times are the best of repeat runs. Peak memory is measured with
+    tracemalloc on one extra run, so it does not slow the timed runs down.
+    """
+    params = {
+        'days': days, 'rows_per_day': rows_per_day, 'parts': parts,
+        'post_codes': post_codes, 'repeat': repeat, 'month': month, 'year': year, 'seed': seed,
+    }
+
+    tmp_dir = None
+    if workbook is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        workbook = os.path.join(tmp_dir.name, 'synthetic_billing.xlsx')
+        started = time.perf_counter()
+        generate_workbook(workbook, days, rows_per_day, parts, post_codes, seed=seed)
+        params['generate_seconds'] = round(time.perf_counter() - started, 3)
+    else:
+        params['workbook'] = os.path.basename(workbook)
+
+    try:
+        best = {}
+        for _ in range(repeat):
+            metrics, rows, records = run_once(workbook, month, year)
+            for phase in PHASES:
+                seconds = metrics.seconds(phase)
+                best[phase] = min(seconds, best.get(phase, seconds))
+
+        peak_memory = None
+        if track_memory:
+            metrics, _, _ = run_once(workbook, month, year, track_memory=True)
+            peak_memory = max(record['peak_memory_bytes'] for record in metrics.phases)
+
+        file_size = os.path.getsize(workbook)
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    total = sum(best.values())
+    return {
+        'version': RESULT_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'openpyxl': openpyxl.__version__,
+        # openpyxl serializes with lxml when it is installed, which the write phase depends on
+        'openpyxl_lxml': openpyxl.xml.LXML,
+        'params': params,
+        'file_bytes': file_size,
+        'rows': rows,
+        'records': records,
+        'phases': {phase: round(best[phase], 4) for phase in PHASES},
+        'total_seconds': round(total, 4),
+        'rows_per_second': round(rows / total, 1) if total else None,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def append_result(result, path):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def format_result(result):
+    lines = [f"📊 {result['rows']} rows, {result['records']} records, {result['file_bytes'] / 1e6:.1f} MB"]
+    for phase in PHASES:
+        lines.append(f"   {phase:<10} {result['phases'][phase]:8.3f}s")
+    lines.append(f"   {'total':<10} {result['total_seconds']:8.3f}s  ({result['rows_per_second']} rows/s)")
+    if result['peak_memory_bytes'] is not None:
+        lines.append(f"   peak memory {result['peak_memory_bytes'] / 1e6:.1f} MB (tracemalloc)")
+    return '\n'.join(lines)
@@ -0,0 +1,227 @@
+"""Bounded-memory runs for very large workbooks
+
+The upload is spilled to a temporary file and the run happens in a child
+process that reads it by path, so openpyxl streams the sheets straight from
+the file. The child caps its own address space at the memory ceiling, so an
+allocation past it fails with MemoryError however fast it comes, and the
+parent samples the child's resident set size while it extracts, summarizes
+and writes and stops it once it passes the ceiling. A file that does not fit
+fails with MemoryLimitExceeded instead of the container being OOM-killed.
+Where neither can be enforced (no RLIMIT_AS, no /proc) a RuntimeWarning says
+that the run is not bounded.
+"""
+
+from io import BytesIO
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import traceback
+import warnings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from billing.pipeline import run_billing
+from billing.profiling import RunMetrics, max_rss_bytes
+from billing.writer import DEFAULT_LAYOUT
+
+# Memory ceiling of the billing process in large-file mode
+DEFAULT_MEMORY_LIMIT_MB = 2048
+
+# Uploads from this size on are run in large-file mode by default in the app
+LARGE_FILE_MB = 50
+
+# How often the child's memory is sampled
+SAMPLE_SECONDS = 0.05
+
+SPILL_CHUNK_BYTES = 1024 * 1024
+
+
+class MemoryLimitExceeded(MemoryError):
+    """The billing process went over its memory ceiling and was stopped"""
+
+    def __init__(self, limit_bytes, used_bytes):
+        self.limit_bytes = limit_bytes
+        self.used_bytes = used_bytes
+        super().__init__(
+            f"the run needed more than the {limit_bytes / 1e6:,.0f} MB memory ceiling "
+            f"({used_bytes / 1e6:,.0f} MB in use when it was stopped); raise the ceiling or split the workbook"
+        )
+
+
+class RemoteTraceback(Exception):
+    """Traceback text of the child process, chained onto the error raised in the parent"""
+
+    def __str__(self):
+        return self.args[0]
+
+
+def rss_bytes(pid):
+    """Current resident set size of a process, or None where it cannot be read"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def limit_address_space(limit_bytes):
+    """Cap the address space of this process so allocations past the ceiling raise MemoryError
+
+    Address space already mapped but not resident when this is called
+    (shared libraries, thread stacks, allocator arenas) is allowed on top of
+    limit_bytes. Returns False where the platform has no such limit.
+    """
+    if resource is None or not hasattr(resource, 'RLIMIT_AS'):
+        return False
+    try:
+        with open('/proc/self/statm') as f:
+            size, resident = (int(value) * os.sysconf('SC_PAGE_SIZE') for value in f.read().split()[:2])
+    except (OSError, ValueError, AttributeError):
+        size = resident = 0
+
+    soft = size - resident + limit_bytes
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    except (ValueError, OSError):
+        return False
+    return True
+
+
+def spill_upload(file, suffix='.xlsx', directory=None):
+    """Copy an uploaded file (bytes or file object) to a temporary file; returns its path"""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            f.write(file)
+        else:
+            file.seek(0)
+            shutil.copyfileobj(file, f, SPILL_CHUNK_BYTES)
+    return path
+
+
+def _bounded_worker(path, month, year, output_path, limit_bytes, cache, reference_store, tariffs, part_matching,
+                    layout, metrics_options, messages):
+    """Child process: run the month and report back through messages
+
+    metrics_options are the RunMetrics arguments of the caller's metrics,
+    or None when the caller wants no metrics.
+    """
+    def progress(fraction, message):
+        messages.put(('progress', fraction, message))
+
+    # Sent before the cap, which also starts the queue's feeder thread
+    messages.put(('limit', limit_address_space(limit_bytes)))
+    try:
+        metrics = RunMetrics(**metrics_options) if metrics_options is not None else None
+        output, record_count = run_billing(
+            path, month, year, cache=cache, reference_store=reference_store, progress=progress, metrics=metrics,
+            tariffs=tariffs, part_matching=part_matching, layout=layout
+        )
+        with open(output_path, 'wb') as f:
+            f.write(output.getbuffer())
+        del output
+        messages.put(('done', record_count, metrics, max_rss_bytes()))
+    except MemoryError:
+        messages.put(('memory', max_rss_bytes()))
+    except Exception as e:
+        messages.put(('error', f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+def _metrics_options(metrics):
+    if metrics is None:
+        return None
+    return {'track_memory': metrics.track_memory, 'profile': metrics.profile}
+
+
+def run_bounded(file, month, year, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cache=None, reference_store=None,
+                progress=None, metrics=None, tariffs=None, part_matching=None, layout=DEFAULT_LAYOUT):
+    """run_billing in a child process held under memory_limit_mb
+
+    file is a path, or bytes / a file object that is spilled to a temporary
+    file first. Day sheets are read one by one in the child (no extraction
+    workers, which would escape the ceiling). The child measures the phases
+    (and captures the profile) metrics asks for, and they are added to it. Returns (BytesIO with the XLSX, number of summary
+    records, peak RSS of the child in bytes or None), and raises
+    MemoryLimitExceeded when the child goes over the ceiling.
+    """
+    limit_bytes = int(memory_limit_mb * 1e6)
+    spilled = None
+    if not isinstance(file, (str, os.PathLike)):
+        spilled = file = spill_upload(file)
+    fd, output_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue()
+    worker = context.Process(
+        target=_bounded_worker,
+        args=(os.fspath(file), month, year, output_path, limit_bytes, cache, reference_store, tariffs,
+              part_matching, layout, _metrics_options(metrics), messages),
+        daemon=True,
+    )
+    peak = 0
+    try:
+        worker.start()
+        while True:
+            try:
+                message = messages.get(timeout=SAMPLE_SECONDS)
+            except queue.Empty:
+                message = None
+                if not worker.is_alive():
+                    # Last chance for a message sent just before the exit
+                    try:
+                        message = messages.get(timeout=1)
+                    except queue.Empty:
+                        raise RuntimeError(f"the billing process exited unexpectedly (exit code {worker.exitcode})")
+
+            used = rss_bytes(worker.pid)
+            if used is not None:
+                peak = max(peak, used)
+                if used > limit_bytes:
+                    worker.kill()
+                    raise MemoryLimitExceeded(limit_bytes, used)
+
+            if message is None:
+                continue
+            kind = message[0]
+            if kind == 'limit':
+                if not message[1] and used is None:
+                    warnings.warn(
+                        f"the {limit_bytes / 1e6:,.0f} MB memory ceiling cannot be enforced on this platform; "
+                        "the run is not bounded", RuntimeWarning
+                    )
+            elif kind == 'progress':
+                if progress is not None:
+                    progress(message[1], message[2])
+            elif kind == 'memory':
+                raise MemoryLimitExceeded(limit_bytes, message[1] or peak)
+            elif kind == 'error':
+                raise RuntimeError(message[1]) from RemoteTraceback(message[2])
+            else:
+                _, record_count, child_metrics, child_peak = message
+                break
+
+        with open(output_path, 'rb') as f:
+            output = BytesIO(f.read())
+        if metrics is not None and child_metrics is not None:
+            metrics.phases.extend(child_metrics.phases)
+            metrics.total_seconds = child_metrics.total_seconds
+            metrics.instrumented = child_metrics.instrumented
+            metrics.profile_stats = child_metrics.profile_stats
+        return output, record_count, max(peak, child_peak or 0) or None
+    finally:
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.kill()
+        messages.close()
+        os.remove(output_path)
+        if spilled is not None:
+            os.remove(spilled)
@@ -0,0 +1,145 @@
+"""On-disk result cache keyed by the content hash of the uploaded workbook"""
+
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+
+
+def user_temp_dir(name):
+    """Per-user directory name under the system temp directory"""
+    if hasattr(os, 'getuid'):
+        name = f'{name}-{os.getuid()}'
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+# Default cache location and size limit
+CACHE_DIR = user_temp_dir('billing_summary_cache')
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def private_directory(directory):
+    """Create directory for pickle files only this user can write, or check an existing one
+
+    Loading a pickle runs code, so a directory another user owns or can
+    write to (e.g. one pre-created under a shared /tmp) is refused with
+    PermissionError. New directories get mode 0o700; group and other write
+    access is removed from existing ones.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return directory
+
+    info = os.lstat(directory)
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is not a directory owned by this user; refusing to use it for cache files")
+    if info.st_mode & 0o022:
+        os.chmod(directory, stat.S_IMODE(info.st_mode) & ~0o022)
+    return directory
+
+
+def content_key(source):
+    """SHA-256 of the workbook bytes (or of the file at a path)"""
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Parsed workbooks and finished summaries stored as pickle files
+
+    Two kinds of entries are kept for each workbook hash:
+
+    - the parsed workbook: the day sheets read so far plus the lookup tables,
+      so switching month reuses it and reads only the days it lacks
+    - the output of one (month, year): the XLSX bytes and the record count
+
+    When the directory grows past max_bytes the least recently used entries
+    are removed first. The directory must belong to the current user (see
+    private_directory).
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = private_directory(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.pkl')
+
+    def _load(self, name):
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _store(self, name, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(name))
+        self.evict()
+
+    def get_workbook(self, key):
+        """Parsed workbook {'days', 'parsed_days', 'cargo_lookup', 'sell_lookup', 'reference_fingerprint'} or None"""
+        return self._load(f'{key}-workbook')
+
+    def put_workbook(self, key, parsed):
+        self._store(f'{key}-workbook', parsed)
+
+    def get_output(self, key, month, year):
+        """Finished summary {'xlsx', 'records'} for the month or None"""
+        return self._load(f'{key}-{year}-{month:02d}')
+
+    def put_output(self, key, month, year, xlsx, records):
+        self._store(f'{key}-{year}-{month:02d}', {'xlsx': xlsx, 'records': records})
+
+    def size(self):
+        """Total bytes held by cache entries"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,536 @@
+"""Headless batch runner: many workbooks x many months, no Streamlit
+
+Examples:
+
+    python -m billing run data/*.xlsm --period 2024-05 --period 2024-06 -o out/
+    python -m billing compile-reference master.xlsm --store reference_tables.sqlite
+    python -m billing bench --rows-per-day 2000 --results bench_results.jsonl
+    python -m billing generate synthetic.xlsx --days 30 --rows-per-day 1000
+    python -m billing run data/*.xlsm --period 2024-05 --columnar parquet -o out/
+    python -m billing run huge.xlsm --period 2024-05 --memory-limit 1500
+    python -m billing run data/*.xlsm --period 2024-05 --layout normalized -o out/
+    python -m billing from-columnar out/*_Detail_*.parquet --reference-store reference_tables.sqlite
+    python -m billing consolidate jan.xlsm@2024-01 feb.xlsm@2024-02 out/ --start 2024-01 --end 2024-03
+    python -m billing validate data/*.xlsm --period 2024-05
+    python -m billing serve --port 8765 --workers 2
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import argparse
+import calendar
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from billing.api import DEFAULT_HOST, DEFAULT_PORT, MAX_UPLOAD_MB, make_server
+from billing.bench import append_result, format_result, run_benchmark
+from billing.bounded import run_bounded
+from billing.cache import CACHE_DIR, ResultCache
+from billing.columnar import COLUMNAR_FORMATS, read_columnar_info, write_detail, write_summary_columnar
+from billing.consolidate import consolidate, input_period, period_label, write_consolidation
+from billing.incremental import run_incremental, state_path
+from billing.ingest import ALL_DAYS, month_days
+from billing.jobs import MAX_CONCURRENT_JOBS
+from billing.pipeline import month_frames, parse_workbook, run_billing, run_from_columnar, summarize_month
+from billing.reference import REFERENCE_STORE_PATH, ReferenceStore, compile_reference_store
+from billing.synthetic import generate_workbook
+from billing.parts import DEFAULT_PART_MATCHING, PART_MATCHING
+from billing.tariff import load_tariffs
+from billing.validate import days_outside_month, format_days_outside_month, format_validation, validate_workbook
+from billing.writer import DEFAULT_LAYOUT, LAYOUTS, write_summary
+
+WORKBOOK_PATTERNS = ('*.xlsx', '*.xlsm')
+
+COLUMNAR_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Output name kind of from-columnar by input kind; a detail file is priced again
+FROM_COLUMNAR_KINDS = {'detail': 'Summary_Billing_Repriced', 'summary': 'Summary_Billing'}
+
+PART_MATCHING_HELP = ("How Part Numbers are matched to 'Cargo and Weight': exact, normalized (ignore case, "
+                      "spaces, dashes and number/text differences) or fuzzy (also prefix and near-miss matches, "
+                      "flagged in the output)")
+
+LAYOUT_HELP = ("Output workbook layout: flat (the Summary sheet, every line repeats its order) or normalized "
+               "(Orders, Detail, By Day and By Area sheets; smaller and faster to open). The flat footer "
+               "sums every line's charge, the normalized totals count each order once")
+
+
+def parse_period(text):
+    """'2024-05' or '5/2024' -> (5, 2024)"""
+    try:
+        if '/' in text:
+            month, year = text.split('/')
+        else:
+            year, month = text.split('-')
+        month, year = int(month), int(year)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid period '{text}', expected YYYY-MM")
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"invalid month in period '{text}'")
+    return month, year
+
+
+def find_workbooks(inputs):
+    """Expand directories and glob patterns into a sorted list of workbook paths"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in WORKBOOK_PATTERNS:
+                paths.extend(glob.glob(os.path.join(item, pattern)))
+        elif glob.has_magic(item):
+            paths.extend(glob.glob(item))
+        else:
+            paths.append(item)
+    # Skip Excel lock files (~$name.xlsx)
+    paths = [p for p in paths if not os.path.basename(p).startswith('~$')]
+    return sorted(set(paths))
+
+
+def consolidation_inputs(items):
+    """'book.xlsm@2024-05', Parquet/Arrow files, globs and directories -> [(path, month, year)]
+
+    Workbooks need their period after '@'; columnar files carry their own.
+    Directories are searched for columnar summary files (detail files of
+    the same months would be counted twice).
+    """
+    inputs = []
+    for item in items:
+        path, at, period = item.rpartition('@')
+        if not at:
+            path, period = item, None
+        month, year = parse_period(period) if period else (None, None)
+
+        if os.path.isdir(path):
+            paths = [
+                p for p in glob.glob(os.path.join(path, '*'))
+                if os.path.splitext(p)[1].lower() in COLUMNAR_FORMATS and read_columnar_info(p).get('kind') == 'summary'
+            ]
+        elif glob.has_magic(path):
+            paths = glob.glob(path)
+        else:
+            paths = [path]
+        inputs.extend((p, month, year) for p in sorted(paths))
+    return inputs
+
+
+def output_name(path, month, year, kind='Summary_Billing', ext='.xlsx'):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{kind}_{calendar.month_name[month]}_{year}{ext}"
+
+
+def columnar_source(path, month, year):
+    """Workbook name a run --columnar file was written for ('x_Detail_May_2024.parquet' -> 'x')"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for kind in ('Detail', 'Summary'):
+        suffix = f"_{kind}_{calendar.month_name[month]}_{year}"
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem
+
+
+def process_file(path, periods, output_dir, cache_dir=None, reference_store_path=None, incremental_dir=None,
+                 columnar=None, tariffs_path=None, memory_limit_mb=None, part_matching=None,
+                 layout=DEFAULT_LAYOUT):
+    """Run every period of one workbook; returns one report entry per period
+
+    The workbook is parsed once and reused for all of its periods. With
+    incremental_dir each period is run month-to-date against its saved state.
+    With columnar ('parquet' or 'arrow') the detail rows and the summary of
+    each period are also written in that format. tariffs_path is a tariff
+    JSON file to price the orders with. With memory_limit_mb each period is
+    run in large-file mode, held under that many MB, and its peak RSS is
+    reported. part_matching is how Part Numbers are matched (see billing.parts)
+    and layout how the summary workbooks are laid out (see billing.writer).
+    """
+    cache = ResultCache(cache_dir) if cache_dir else None
+    reference_store = ReferenceStore(reference_store_path) if reference_store_path else None
+    tariffs = load_tariffs(tariffs_path) if tariffs_path else None
+
+    parsed = None
+    results = []
+    for month, year in periods:
+        started = time.perf_counter()
+        entry = {'input': path, 'month': month, 'year': year}
+        try:
+            if incremental_dir:
+                output, record_count, entry['incremental'] = run_incremental(
+                    path, month, year,
+                    state_path(os.path.basename(path), month, year, incremental_dir),
+                    reference_store=reference_store, tariffs=tariffs, part_matching=part_matching,
+                    layout=layout
+                )
+            elif memory_limit_mb is not None:
+                output, record_count, entry['peak_rss_bytes'] = run_bounded(
+                    path, month, year, memory_limit_mb, cache=cache, reference_store=reference_store, tariffs=tariffs,
+                    part_matching=part_matching, layout=layout
+                )
+            elif cache is not None and not columnar:
+                output, record_count = run_billing(
+                    path, month, year, cache=cache, reference_store=reference_store, tariffs=tariffs,
+                    part_matching=part_matching, layout=layout
+                )
+            else:
+                if parsed is None:
+                    days = month_days(month, year) if len(periods) == 1 else ALL_DAYS
+                    parsed = parse_workbook(path, days, reference_store=reference_store)
+                if columnar:
+                    temp_df, summary_df = month_frames(parsed, month, year, tariffs=tariffs,
+                                                       part_matching=part_matching)
+                    ext = COLUMNAR_EXTENSIONS[columnar]
+                    entry['detail'] = os.path.join(output_dir, output_name(path, month, year, 'Detail', ext))
+                    entry['summary'] = os.path.join(output_dir, output_name(path, month, year, 'Summary', ext))
+                    write_detail(temp_df, entry['detail'], month, year)
+                    write_summary_columnar(summary_df, entry['summary'], month, year)
+                    output, record_count = write_summary(summary_df, layout=layout), len(summary_df)
+                else:
+                    output, record_count = summarize_month(parsed, month, year, tariffs=tariffs,
+                                                           part_matching=part_matching, layout=layout)
+
+            output_path = os.path.join(output_dir, output_name(path, month, year))
+            with open(output_path, 'wb') as f:
+                f.write(output.getvalue())
+
+            entry.update(status='ok', output=output_path, records=record_count)
+            outside = days_outside_month(path, month, year)
+            if outside:
+                entry['days_outside_month'] = outside
+        except Exception as e:
+            entry.update(status='error', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        entry['seconds'] = round(time.perf_counter() - started, 3)
+        results.append(entry)
+    return results
+
+
+def run_batch(paths, periods, output_dir, jobs=None, cache_dir=None, reference_store_path=None,
+              incremental_dir=None, log=print, columnar=None, tariffs_path=None, memory_limit_mb=None,
+              part_matching=None, layout=DEFAULT_LAYOUT):
+    """Process every workbook for every period, one worker process per workbook
+
+    Returns the run report as a dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths) or 1))
+    started_at = datetime.now()
+    started = time.perf_counter()
+    results = []
+
+    if jobs == 1:
+        for path in paths:
+            for entry in process_file(path, periods, output_dir, cache_dir, reference_store_path, incremental_dir,
+                                      columnar, tariffs_path, memory_limit_mb, part_matching, layout):
+                log(_log_line(entry))
+                results.append(entry)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [
+                pool.submit(process_file, path, periods, output_dir, cache_dir, reference_store_path, incremental_dir,
+                            columnar, tariffs_path, memory_limit_mb, part_matching, layout)
+                for path in paths
+            ]
+            for future in as_completed(futures):
+                for entry in future.result():
+                    log(_log_line(entry))
+                    results.append(entry)
+
+    results.sort(key=lambda entry: (entry['input'], entry['year'], entry['month']))
+    return {
+        'started': started_at.isoformat(timespec='seconds'),
+        'seconds': round(time.perf_counter() - started, 3),
+        'workers': jobs,
+        'jobs': results,
+        'succeeded': sum(1 for entry in results if entry['status'] == 'ok'),
+        'failed': sum(1 for entry in results if entry['status'] != 'ok'),
+    }
+
+
+def _log_line(entry):
+    period = f"{entry['year']}-{entry['month']:02d}"
+    if entry['status'] == 'ok':
+        peak = f", peak {entry['peak_rss_bytes'] / 1e6:,.0f} MB" if entry.get('peak_rss_bytes') else ''
+        line = f"✅ {entry['input']} {period}: {entry['records']} records -> {entry['output']} ({entry['seconds']}s{peak})"
+        if entry.get('days_outside_month'):
+            line += "\n   ⚠️ " + format_days_outside_month(entry['days_outside_month'], entry['month'], entry['year'])
+        return line
+    return f"❌ {entry['input']} {period}: {entry['error']}"
+
+
+def run_consolidate(args):
+    inputs = []
+    for path, month, year in consolidation_inputs(args.inputs):
+        month, year = input_period(path, month, year)
+        if month is None:
+            print(f"❌ {path}: no period, use {path}@YYYY-MM", file=sys.stderr)
+            return 2
+        if args.start and (year, month) < args.start[::-1]:
+            continue
+        if args.end and (year, month) > args.end[::-1]:
+            continue
+        inputs.append((path, month, year))
+    if not inputs:
+        print("❌ No inputs in the selected period range", file=sys.stderr)
+        return 2
+
+    def progress(fraction, message):
+        print(f"   {message}")
+
+    try:
+        report = consolidate(
+            inputs,
+            reference_store=ReferenceStore(args.reference_store) if args.reference_store else None,
+            cache=ResultCache(args.cache_dir) if args.cache_dir else None,
+            progress=progress,
+            tariffs=load_tariffs(args.tariffs) if args.tariffs else None,
+            part_matching=args.part_matching,
+        )
+    except (OSError, ValueError) as e:
+        print(f"❌ {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    periods = sorted((year, month) for _, month, year in inputs)
+    output_path = args.output or (f"Consolidated_Billing_{period_label(*periods[0][::-1])}"
+                                  f"_{period_label(*periods[-1][::-1])}.xlsx")
+    with open(output_path, 'wb') as f:
+        f.write(write_consolidation(report).getvalue())
+
+    for row in report['by_month'].to_dict('records'):
+        print(f"📅 {row['Period']}: {row['Orders']} orders, {row['All Charge']:,.2f} + FSC {row['FSC']:,.2f} "
+              f"= {row['Total incl. FSC']:,.2f} BATH")
+    print(f"✅ {len(inputs)} input(s) -> {output_path}")
+    return 0
+
+
+def run_validate(args):
+    paths = find_workbooks(args.inputs)
+    if not paths:
+        print("❌ No workbooks found", file=sys.stderr)
+        return 2
+    month, year = args.period
+    reference_store = ReferenceStore(args.reference_store) if args.reference_store else None
+
+    results = []
+    clean = True
+    for path in paths:
+        try:
+            result = validate_workbook(path, month, year, reference_store, part_matching=args.part_matching)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {type(e).__name__}: {e}", file=sys.stderr)
+            clean = False
+            continue
+        print(f"📄 {path}")
+        print(format_validation(result, args.limit))
+        results.append(dict(result, input=path))
+        clean = clean and not result['counts']
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+    return 0 if clean else 1
+
+
+def run_serve(args):
+    server = make_server(
+        args.host, args.port, args.workers,
+        cache=ResultCache(args.cache_dir) if args.cache_dir else None,
+        reference_store=ReferenceStore(args.reference_store) if args.reference_store else None,
+        tariffs=load_tariffs(args.tariffs) if args.tariffs else None,
+        max_upload_mb=args.max_upload_mb,
+    )
+    host, port = server.server_address[:2]
+    print(f"🌐 Billing API on http://{host}:{port} with {args.workers} worker(s); Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m billing', description="Transport billing summary batch runner")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Generate summaries for many workbooks and months")
+    run.add_argument('inputs', nargs='+', help="Workbook files, directories or glob patterns")
+    run.add_argument('-p', '--period', dest='periods', type=parse_period, action='append', required=True,
+                     help="Billing period as YYYY-MM (repeatable)")
+    run.add_argument('-o', '--output-dir', default='summaries', help="Where to write the summary workbooks")
+    run.add_argument('-j', '--jobs', type=int, default=None, help="Worker processes (default: CPU count)")
+    run.add_argument('--report', default=None,
+                     help="Run report JSON path (default: <output-dir>/run_report.json)")
+    run.add_argument('--cache-dir', default=None,
+                     help=f"Reuse the on-disk result cache (e.g. {CACHE_DIR})")
+    run.add_argument('--reference-store', default=None,
+                     help="Compiled reference tables (SQLite) to price workbooks with")
+    run.add_argument('--incremental-dir', default=None,
+                     help="Month-to-date mode: keep per-day state here and redo only changed days")
+    run.add_argument('--tariffs', default=None, help="Tariff definitions (JSON) to price orders with")
+    run.add_argument('--part-matching', choices=PART_MATCHING, default=DEFAULT_PART_MATCHING,
+                     help=PART_MATCHING_HELP)
+    run.add_argument('--layout', choices=LAYOUTS, default=DEFAULT_LAYOUT, help=LAYOUT_HELP)
+    run.add_argument('--columnar', choices=sorted(COLUMNAR_EXTENSIONS), default=None,
+                     help="Also write the detail rows and the summary as Parquet or Arrow IPC")
+    run.add_argument('--memory-limit', type=int, default=None, metavar='MB',
+                     help="Large-file mode: run each workbook in a process held under this many MB "
+                          "(not with --incremental-dir or --columnar)")
+
+    from_columnar = commands.add_parser('from-columnar',
+                                        help="Write summary workbooks from Parquet/Arrow detail or summary files")
+    from_columnar.add_argument('inputs', nargs='+', help="Files written by run --columnar")
+    from_columnar.add_argument('-o', '--output-dir', default='summaries')
+    from_columnar.add_argument('--reference-store', default=None,
+                               help="Compiled reference tables to price detail files with")
+    from_columnar.add_argument('--reference-workbook', default=None,
+                               help="Workbook with 'Cargo and Weight' / 'Sell Price' to price detail files with")
+    from_columnar.add_argument('--tariffs', default=None, help="Tariff definitions (JSON) to price detail files with")
+    from_columnar.add_argument('--part-matching', choices=PART_MATCHING, default=DEFAULT_PART_MATCHING,
+                               help=PART_MATCHING_HELP)
+    from_columnar.add_argument('--layout', choices=LAYOUTS, default=DEFAULT_LAYOUT, help=LAYOUT_HELP)
+
+    compile_ref = commands.add_parser('compile-reference',
+                                      help="Compile 'Cargo and Weight' and 'Sell Price' into a store")
+    compile_ref.add_argument('workbook')
+    compile_ref.add_argument('--store', default=REFERENCE_STORE_PATH)
+
+    bench = commands.add_parser('bench', help="Benchmark every phase on a synthetic (or given) workbook")
+    bench.add_argument('--workbook', default=None, help="Benchmark this workbook instead of a synthetic one")
+    bench.add_argument('--days', type=int, default=31)
+    bench.add_argument('--rows-per-day', type=int, default=500)
+    bench.add_argument('--parts', type=int, default=2000, help="Part catalog size")
+    bench.add_argument('--post-codes', type=int, default=300)
+    bench.add_argument('--repeat', type=int, default=3, help="Runs per phase; the best time is kept")
+    bench.add_argument('--period', type=parse_period, default=(1, 2024), help="Month to process (YYYY-MM)")
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak memory run")
+    bench.add_argument('--results', default=None, help="Append the result as one JSON line to this file")
+
+    consolidate_cmd = commands.add_parser('consolidate',
+                                          help="Quarterly/yearly rollup of many monthly workbooks or summaries")
+    consolidate_cmd.add_argument('inputs', nargs='+',
+                                 help="book.xlsm@YYYY-MM, or Parquet/Arrow files/directories from run --columnar")
+    consolidate_cmd.add_argument('--start', type=parse_period, default=None, help="First period (YYYY-MM)")
+    consolidate_cmd.add_argument('--end', type=parse_period, default=None, help="Last period (YYYY-MM)")
+    consolidate_cmd.add_argument('-o', '--output', default=None,
+                                 help="Rollup workbook (default: Consolidated_Billing_<start>_<end>.xlsx)")
+    consolidate_cmd.add_argument('--reference-store', default=None,
+                                 help="Compiled reference tables for day-only workbooks and detail files")
+    consolidate_cmd.add_argument('--cache-dir', default=None, help="Reuse parsed workbooks from the result cache")
+    consolidate_cmd.add_argument('--tariffs', default=None, help="Tariff definitions (JSON) to price orders with")
+    consolidate_cmd.add_argument('--part-matching', choices=PART_MATCHING, default=DEFAULT_PART_MATCHING,
+                                 help=PART_MATCHING_HELP)
+
+    validate = commands.add_parser('validate', help="Check workbooks for bad rows before running them")
+    validate.add_argument('inputs', nargs='+', help="Workbook files, directories or glob patterns")
+    validate.add_argument('-p', '--period', type=parse_period, required=True, help="Billing period as YYYY-MM")
+    validate.add_argument('--reference-store', default=None,
+                          help="Compiled reference tables for workbooks without reference sheets")
+    validate.add_argument('--part-matching', choices=PART_MATCHING, default=DEFAULT_PART_MATCHING,
+                          help=PART_MATCHING_HELP)
+    validate.add_argument('--limit', type=int, default=20, help="Locations to print per workbook")
+    validate.add_argument('--json', default=None, help="Write every anomaly found to this JSON file")
+
+    serve = commands.add_parser('serve', help="Run the HTTP API that queues workbooks and returns summaries")
+    serve.add_argument('--host', default=DEFAULT_HOST, help="Interface to listen on (0.0.0.0 for all)")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('-w', '--workers', type=int, default=MAX_CONCURRENT_JOBS, help="Jobs run at the same time")
+    serve.add_argument('--cache-dir', default=None, help=f"Reuse the on-disk result cache (e.g. {CACHE_DIR})")
+    serve.add_argument('--reference-store', default=None,
+                       help="Compiled reference tables for workbooks without reference sheets")
+    serve.add_argument('--tariffs', default=None, help="Tariff definitions (JSON) to price orders with")
+    serve.add_argument('--max-upload-mb', type=int, default=MAX_UPLOAD_MB, help="Largest workbook accepted")
+
+    generate = commands.add_parser('generate', help="Write a synthetic billing workbook")
+    generate.add_argument('path')
+    generate.add_argument('--days', type=int, default=31)
+    generate.add_argument('--rows-per-day', type=int, default=500)
+    generate.add_argument('--parts', type=int, default=2000, help="Part catalog size")
+    generate.add_argument('--post-codes', type=int, default=300)
+    generate.add_argument('--seed', type=int, default=0)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'compile-reference':
+        store = compile_reference_store(args.workbook, args.store)
+        cargo_lookup, sell_lookup = store.load()
+        print(f"✅ Compiled {len(cargo_lookup)} parts and {len(sell_lookup)} post codes into {store.path}")
+        return 0
+
+    if args.command == 'from-columnar':
+        reference_store = ReferenceStore(args.reference_store) if args.reference_store else None
+        tariffs = load_tariffs(args.tariffs) if args.tariffs else None
+        os.makedirs(args.output_dir, exist_ok=True)
+        failed = 0
+        for path in args.inputs:
+            try:
+                kind = FROM_COLUMNAR_KINDS[read_columnar_info(path).get('kind', 'detail')]
+                output, record_count, month, year = run_from_columnar(
+                    path, reference_store, args.reference_workbook, tariffs=tariffs,
+                    part_matching=args.part_matching, layout=args.layout
+                )
+            except Exception as e:
+                print(f"❌ {path}: {type(e).__name__}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            output_path = os.path.join(args.output_dir,
+                                       output_name(columnar_source(path, month, year), month, year, kind))
+            with open(output_path, 'wb') as f:
+                f.write(output.getvalue())
+            print(f"✅ {path}: {record_count} records -> {output_path}")
+        return 0 if failed == 0 else 1
+
+    if args.command == 'consolidate':
+        return run_consolidate(args)
+
+    if args.command == 'validate':
+        return run_validate(args)
+
+    if args.command == 'serve':
+        return run_serve(args)
+
+    if args.command == 'generate':
+        rows = generate_workbook(args.path, args.days, args.rows_per_day, args.parts, args.post_codes, seed=args.seed)
+        print(f"✅ Wrote {rows} rows over {args.days} day sheets to {args.path}")
+        return 0
+
+    if args.command == 'bench':
+        month, year = args.period
+        result = run_benchmark(
+            args.days, args.rows_per_day, args.parts, args.post_codes, args.repeat,
+            month, year, args.seed, args.workbook, track_memory=not args.no_memory
+        )
+        print(format_result(result))
+        if args.results:
+            append_result(result, args.results)
+        else:
+            print(json.dumps(result, indent=2))
+        return 0
+
+    if args.memory_limit is not None and (args.incremental_dir or args.columnar):
+        print("❌ --memory-limit cannot be combined with --incremental-dir or --columnar", file=sys.stderr)
+        return 2
+    paths = find_workbooks(args.inputs)
+    if not paths:
+        print("❌ No workbooks found", file=sys.stderr)
+        return 2
+
+    periods = list(dict.fromkeys(args.periods))
+    report = run_batch(paths, periods, args.output_dir, args.jobs, args.cache_dir, args.reference_store,
+                       args.incremental_dir, columnar=args.columnar, tariffs_path=args.tariffs,
+                       memory_limit_mb=args.memory_limit, part_matching=args.part_matching,
+                       layout=args.layout)
+
+    report_path = args.report or os.path.join(args.output_dir, 'run_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n📊 {report['succeeded']} succeeded, {report['failed']} failed in {report['seconds']}s "
+          f"-> {report_path}")
+    return 0 if report['failed'] == 0 else 1
@@ -0,0 +1,205 @@
+"""Parquet / Arrow IPC copies of the detail rows and the summary
+
+A month's extracted detail rows (and its summary) can be written to a
+columnar file once; later runs and analytics tools read that file instead
+of parsing the workbook again. The billing period is stored in the file
+metadata, so a detail file can be re-priced without repeating it.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for columnar export/import
+    pa = None
+    pq = None
+
+from billing.summary import EXTRA_COLUMNS, SUMMARY_COLUMNS
+
+# File extension -> format
+COLUMNAR_FORMATS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# Schema metadata key holding {'kind', 'month', 'year', ...}
+METADATA_KEY = b'billing'
+
+PART_NOT_FOUND = 'Part Not Found'
+
+MIXED_KINDS = ('mixed', 'mixed-integer', 'mixed-integer-float')
+
+# Companion column of a mixed column, naming the type of each value stored
+# as text: 'int', 'float' or null for text
+TYPE_MARKER_SUFFIX = '__type'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet/Arrow export needs pyarrow: pip install pyarrow")
+
+
+def columnar_format(path, fmt=None):
+    """'parquet' or 'arrow', from fmt or the file extension"""
+    if fmt is not None:
+        if fmt not in ('parquet', 'arrow'):
+            raise ValueError(f"Unknown columnar format '{fmt}', expected 'parquet' or 'arrow'")
+        return fmt
+    ext = os.path.splitext(os.fspath(path))[1].lower()
+    if ext not in COLUMNAR_FORMATS:
+        raise ValueError(f"Cannot tell the columnar format of '{path}' (use .parquet or .arrow)")
+    return COLUMNAR_FORMATS[ext]
+
+
+def is_columnar_path(path):
+    return os.path.splitext(os.fspath(path))[1].lower() in COLUMNAR_FORMATS
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _value_type(value):
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return 'int'
+    if isinstance(value, (float, np.floating)) and not np.isnan(value):
+        return 'float'
+    return None
+
+
+def _typed_columns(name, values):
+    """{column: values} Arrow can store with a single type each
+
+    Numeric, date and text columns are kept as they are. Columns mixing
+    numbers and text (e.g. post codes, part numbers) are stored as text,
+    with integral floats written without '.0' so lookup keys stay the same,
+    plus a TYPE_MARKER_SUFFIX column so _restore_types gives the numbers
+    back.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Arrow dictionaries need one category type as well
+        categories = values.cat.categories
+        if pd.api.types.infer_dtype(categories, skipna=True) not in MIXED_KINDS:
+            return {name: values}
+        # Text and type per category, and None for missing values (code -1);
+        # 10110 and '10110' share a text category but keep their types
+        codes = values.cat.codes.to_numpy()
+        texts = np.asarray([_text(category) for category in categories] + [None], dtype=object)
+        types = np.asarray([_value_type(category) for category in categories] + [None], dtype=object)
+        return {
+            name: pd.Categorical(texts[codes]),
+            name + TYPE_MARKER_SUFFIX: pd.Categorical(types[codes]),
+        }
+    if pd.api.types.infer_dtype(values, skipna=True) not in MIXED_KINDS:
+        return {name: values}
+    values = values.astype(object)
+    return {
+        name: values.map(_text, na_action='ignore'),
+        name + TYPE_MARKER_SUFFIX: values.map(_value_type).astype('category'),
+    }
+
+
+def _restore_types(frame):
+    """Numbers of mixed columns back from their text, dropping the marker columns"""
+    for marker in [column for column in frame.columns if column.endswith(TYPE_MARKER_SUFFIX)]:
+        name = marker[:-len(TYPE_MARKER_SUFFIX)]
+        types = frame.pop(marker).astype(object)
+        categorical = isinstance(frame[name].dtype, pd.CategoricalDtype)
+        values = frame[name].to_numpy(dtype=object, copy=True)
+        for kind, convert in (('int', int), ('float', float)):
+            is_kind = (types == kind).to_numpy()
+            values[is_kind] = [convert(value) for value in values[is_kind]]
+        frame[name] = pd.Categorical(values) if categorical else values
+    return frame
+
+
+def _to_table(df, kind, month, year, extra=None):
+    _require_pyarrow()
+    columns = {}
+    for name in df.columns:
+        columns.update(_typed_columns(name, df[name]))
+    frame = pd.DataFrame(columns)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    info = {'kind': kind, 'month': month, 'year': year}
+    info.update(extra or {})
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(info).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _write_table(table, path, fmt):
+    if columnar_format(path, fmt) == 'parquet':
+        pq.write_table(table, path, compression='zstd')
+    else:
+        with pa.OSFile(os.fspath(path), 'wb') as sink:
+            options = pa.ipc.IpcWriteOptions(compression='zstd')
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+
+def _read_table(path, fmt=None):
+    _require_pyarrow()
+    if columnar_format(path, fmt) == 'parquet':
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(os.fspath(path), 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+    info = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+    return _restore_types(table.to_pandas()), info
+
+
+def write_detail(temp_df, path, month, year, fmt=None):
+    """Write the detail rows of one month (as from detail_frame)"""
+    _write_table(_to_table(temp_df, 'detail', month, year), path, fmt)
+
+
+def read_detail(path, fmt=None):
+    """(detail DataFrame, {'kind', 'month', 'year'}) from write_detail's file"""
+    temp_df, info = _read_table(path, fmt)
+    if info.get('kind', 'detail') != 'detail':
+        raise ValueError(f"'{path}' holds {info['kind']} rows, not detail rows")
+    return temp_df, info
+
+
+def write_summary_columnar(summary_df, path, month, year, fmt=None):
+    """Write the Summary rows with numeric Total Weight
+
+    'Part Not Found' rows get a null Total Weight and Part Found = False,
+    so the column keeps a float type for analytics.
+    """
+    frame = summary_df.copy()
+    found = frame['Total Weight'].astype(object) != PART_NOT_FOUND
+    frame['Total Weight'] = pd.to_numeric(frame['Total Weight'].where(found, np.nan))
+    frame['Part Found'] = found.astype(bool)
+    _write_table(_to_table(frame, 'summary', month, year), path, fmt)
+
+
+def read_summary_columnar(path, fmt=None):
+    """(Summary DataFrame ready for write_summary, metadata) from a summary file"""
+    frame, info = _read_table(path, fmt)
+    if info.get('kind') != 'summary':
+        raise ValueError(f"'{path}' does not hold summary rows")
+    frame['Total Weight'] = frame['Total Weight'].astype(object).where(frame['Part Found'], PART_NOT_FOUND)
+    columns = SUMMARY_COLUMNS + [name for name in EXTRA_COLUMNS if name in frame]
+    return frame[columns], info
+
+
+def read_columnar_info(path, fmt=None):
+    """Metadata of a columnar file without reading its rows"""
+    _require_pyarrow()
+    if columnar_format(path, fmt) == 'parquet':
+        schema = pq.read_schema(path)
+    else:
+        with pa.memory_map(os.fspath(path), 'r') as source:
+            schema = pa.ipc.open_file(source).schema
+    return json.loads((schema.metadata or {}).get(METADATA_KEY, b'{}'))
@@ -0,0 +1,154 @@
+"""Quarterly / yearly rollup of many monthly billing runs
+
+    python -m billing consolidate jan.xlsm@2024-01 feb.xlsm@2024-02 out/*_Summary_*.parquet -o Q1.xlsx
+
+Each input is summarized and reduced to a few totals rows before the next
+one is read, so memory depends on the largest month, not on the range.
+"""
+
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+
+from billing.cache import content_key
+from billing.columnar import is_columnar_path, read_columnar_info
+from billing.ingest import month_days, workbook_source
+from billing.pipeline import _report, cached_month, columnar_summary, month_frames, parse_workbook
+from billing.summary import order_rows
+from billing.writer import FSC_RATE, _named_styles, _write_table
+
+# Per-order amounts that are added up
+TOTAL_COLUMNS = ["Total Pick Q'TY", 'Ship Total WT', 'All Charge']
+
+# Columns of every rollup sheet after its key columns
+AMOUNT_COLUMNS = TOTAL_COLUMNS + ['FSC', 'Total incl. FSC']
+ROLLUP_COLUMNS = ['Orders', 'Lines'] + AMOUNT_COLUMNS
+
+# Sheet column widths by column name (others get DEFAULT_WIDTH)
+SHEET_WIDTHS = {'Period': 10, 'Area': 22, 'Transport': 10, 'input': 60}
+DEFAULT_WIDTH = 15
+
+
+def period_label(month, year):
+    return f'{year}-{month:02d}'
+
+
+def order_totals(summary_df, month, year, fsc_rate=FSC_RATE):
+    """Totals of one month by Area and Transport
+
+    The Summary sheet repeats each order's totals on every detail line, so
+    orders are counted once here (the footer of the month sheet sums every
+    line instead). FSC uses each order's 'FSC Rate' when the summary has
+    one, fsc_rate otherwise.
+    """
+    if len(summary_df) == 0:
+        return pd.DataFrame(columns=['Period', 'Area', 'Transport', 'Orders', 'Lines'] + TOTAL_COLUMNS + ['FSC'])
+
+    orders = order_rows(summary_df, fsc_rate)
+    frame = pd.DataFrame({
+        'Period': period_label(month, year),
+        'Area': orders['Area'].astype(object).to_numpy(),
+        'Transport': orders['Transport'].astype(object).to_numpy(),
+        'Orders': 1,
+        'Lines': orders['Lines'].to_numpy(),
+    })
+    for name in TOTAL_COLUMNS + ['FSC']:
+        frame[name] = orders[name].to_numpy()
+    return frame.groupby(['Period', 'Area', 'Transport'], as_index=False).sum()
+
+
+def input_summary(source, month=None, year=None, reference_store=None, cache=None, tariffs=None,
+                  part_matching=None):
+    """(Summary DataFrame, month, year) of one consolidation input
+
+    source is a billing workbook (month and year required) or a Parquet/Arrow
+    file written by run --columnar, which carries its own period.
+    """
+    if is_columnar_path(source):
+        summary_df, info = columnar_summary(source, reference_store, tariffs=tariffs, part_matching=part_matching)
+        return summary_df, info['month'], info['year']
+
+    if month is None or year is None:
+        raise ValueError(f"No billing period given for workbook '{source}'")
+
+    if cache is not None:
+        parsed = cached_month(cache, content_key(workbook_source(source)), source, month, year,
+                              reference_store=reference_store)
+    else:
+        parsed = parse_workbook(source, month_days(month, year), reference_store=reference_store)
+    _, summary_df = month_frames(parsed, month, year, tariffs=tariffs, part_matching=part_matching)
+    return summary_df, month, year
+
+
+def input_period(source, month=None, year=None):
+    """(month, year) of an input without summarizing it"""
+    if is_columnar_path(source):
+        info = read_columnar_info(source)
+        return info['month'], info['year']
+    return month, year
+
+
+def _rollup(totals, keys):
+    frame = totals.groupby(keys, as_index=False)[['Orders', 'Lines'] + TOTAL_COLUMNS + ['FSC']].sum()
+    frame['Total incl. FSC'] = frame['All Charge'] + frame['FSC']
+    return frame.sort_values(keys).reset_index(drop=True)
+
+
+def consolidate(inputs, reference_store=None, cache=None, fsc_rate=FSC_RATE, progress=None, tariffs=None,
+                part_matching=None):
+    """Rollup report over many (source, month, year) inputs
+
+    Inputs of the same period (e.g. one workbook per customer) are added
+    together. Returns the DataFrames 'by_month', 'by_area', 'by_transport'
+    (per period) and 'by_area_total', 'by_transport_total' (whole range),
+    each with ROLLUP_COLUMNS, plus 'inputs', one entry per input. Workbooks
+    and detail files are priced with tariffs, their parts matched as
+    part_matching says; summary files keep their charges, and fsc_rate
+    applies to those written without an FSC Rate.
+    """
+    inputs = list(inputs)
+    parts = []
+    sources = []
+    for idx, (source, month, year) in enumerate(inputs):
+        _report(progress, idx / len(inputs), f"Summarizing {source}...")
+        summary_df, month, year = input_summary(source, month, year, reference_store, cache, tariffs, part_matching)
+        parts.append(order_totals(summary_df, month, year, fsc_rate))
+        sources.append({'input': str(source), 'period': period_label(month, year), 'records': len(summary_df)})
+        # Only the totals are kept from here on
+        del summary_df
+
+    totals = pd.concat(parts, ignore_index=True) if parts else order_totals(pd.DataFrame(), 1, 1)
+    _report(progress, 1.0, "Consolidating...")
+    return {
+        'by_month': _rollup(totals, ['Period']),
+        'by_area': _rollup(totals, ['Period', 'Area']),
+        'by_transport': _rollup(totals, ['Period', 'Transport']),
+        'by_area_total': _rollup(totals, ['Area']),
+        'by_transport_total': _rollup(totals, ['Transport']),
+        'inputs': sources,
+    }
+
+
+def _write_rollup(sheet, frame, total_label=None):
+    _write_table(sheet, frame, AMOUNT_COLUMNS, ROLLUP_COLUMNS, total_label, widths=SHEET_WIDTHS)
+
+
+def write_consolidation(report, output=None):
+    """Rollup workbook: By Month, By Area, By Transport and Inputs sheets"""
+    wb = openpyxl.Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+
+    _write_rollup(wb.create_sheet('By Month'), report['by_month'], 'Total')
+    _write_rollup(wb.create_sheet('By Area'), report['by_area'], 'Total')
+    _write_rollup(wb.create_sheet('By Transport'), report['by_transport'], 'Total')
+    _write_rollup(wb.create_sheet('Area Totals'), report['by_area_total'], 'Total')
+    _write_rollup(wb.create_sheet('Transport Totals'), report['by_transport_total'], 'Total')
+    _write_rollup(wb.create_sheet('Inputs'), pd.DataFrame(report['inputs'], columns=['input', 'period', 'records']))
+
+    if output is None:
+        output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
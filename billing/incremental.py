@@ -0,0 +1,196 @@
+"""Incremental month-to-date processing: only changed day sheets are redone"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from billing.cache import private_directory, user_temp_dir
+from billing.ingest import extract_days, extract_days_parallel, month_days, open_workbook
+from billing.manifest import sheet_fingerprints
+from billing.parts import DEFAULT_PART_MATCHING, PartIndex
+from billing.pipeline import _report, detail_frame
+from billing.profiling import phase, run_context
+from billing.reference import REFERENCE_SHEETS, load_reference_tables, lookups_fingerprint
+from billing.summary import SUMMARY_COLUMNS, summarize
+from billing.writer import DEFAULT_LAYOUT, write_summary
+
+# Default directory for month-to-date state files
+INCREMENTAL_DIR = user_temp_dir('billing_incremental')
+
+# Bump when the state layout changes; older state is discarded
+STATE_VERSION = 1
+
+
+def state_path(name, month, year, directory=INCREMENTAL_DIR, owner=None):
+    """State file for one workbook name and month
+
+    owner (e.g. the signed-in user) keeps the state of people who upload
+    files of the same name apart; it is hashed into the file name.
+    """
+    safe = ''.join(ch if ch.isalnum() or ch in '-_.' else '_' for ch in name)
+    if owner is not None:
+        safe = f"{hashlib.sha256(owner.encode('utf-8')).hexdigest()[:16]}-{safe}"
+    return os.path.join(directory, f'{safe}-{year}-{month:02d}.pkl')
+
+
+def _load_state(path, month, year):
+    private_directory(os.path.dirname(os.path.abspath(path)))
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if state.get('version') != STATE_VERSION or (state.get('month'), state.get('year')) != (month, year):
+        return None
+    return state
+
+
+def _save_state(path, state):
+    directory = private_directory(os.path.dirname(os.path.abspath(path)))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def cross_day_orders(day_states):
+    """{DU-Order: [days]} for orders that appear on more than one day"""
+    seen = {}
+    for day in sorted(day_states):
+        for du_order in day_states[day]['orders']:
+            seen.setdefault(du_order, []).append(day)
+    return {du_order: days for du_order, days in seen.items() if len(days) > 1}
+
+
+def run_incremental(file, month, year, path, workers=1, reference_store=None, progress=None, metrics=None,
+                    tariffs=None, part_matching=None, layout=DEFAULT_LAYOUT):
+    """Month-to-date summary that reuses unchanged days from the last run
+
+    Each day sheet is fingerprinted (see sheet_fingerprints). Days whose
+    fingerprint matches the saved state keep their extracted rows and their
+    per-DU-Order summary rows; only new or changed days are extracted and
+    summarized again. When the reference tables, the tariffs or the part
+    matching change every day is re-summarized from its saved rows. The per-day summaries are merged
+    in DU-Order order, which equals a full run as long as no DU-Order spans
+    two days; if one does, it is reported and the month is summarized in one
+    pass instead.
+
+    Returns (BytesIO with the XLSX, number of records, report dict).
+    """
+    with run_context(metrics):
+        return _run_incremental(file, month, year, path, workers, reference_store, progress, metrics, tariffs,
+                                part_matching, layout)
+
+
+def _run_incremental(file, month, year, path, workers, reference_store, progress, metrics, tariffs, part_matching,
+                     layout):
+    days = month_days(month, year)
+
+    _report(progress, None, "Fingerprinting day sheets...")
+    with phase(metrics, 'fingerprint', len(days)):
+        fingerprints = {int(name): fp for name, fp in sheet_fingerprints(file, [str(d) for d in days]).items()}
+        state = _load_state(path, month, year)
+        saved_days = state['days'] if state else {}
+        changed = [day for day in sorted(fingerprints)
+                   if day not in saved_days or saved_days[day]['fingerprint'] != fingerprints[day]]
+
+    # Only the changed day sheets and the reference sheets are opened
+    with phase(metrics, 'load'):
+        wb = open_workbook(file, [str(day) for day in changed] + list(REFERENCE_SHEETS))
+    try:
+        _report(progress, None, "Building lookup tables...")
+        with phase(metrics, 'lookup') as record:
+            cargo_lookup, sell_lookup = load_reference_tables(wb, file, reference_store)
+            part_matching = part_matching or DEFAULT_PART_MATCHING
+            reference_fp = f'{lookups_fingerprint(cargo_lookup, sell_lookup)}-{part_matching}'
+            # Part Numbers are matched with one index for every day
+            part_index = PartIndex(cargo_lookup, part_matching)
+            if tariffs is not None:
+                reference_fp = f'{reference_fp}-{tariffs.fingerprint}'
+            record['rows'] = len(cargo_lookup) + len(sell_lookup)
+
+        # Re-extract new and changed days only
+        days_done = []
+
+        def on_day(day, day_count):
+            days_done.append(day)
+            _report(progress, len(days_done) / day_count, f"Processing day {day}...")
+
+        with phase(metrics, 'extract') as record:
+            if workers > 1 and len(changed) > 1:
+                extracted = extract_days_parallel(file, wb.sheetnames, changed, workers=workers, on_day=on_day)
+            else:
+                extracted = extract_days(wb, changed, on_day=on_day)
+            record['rows'] = sum(len(batch['DU']) for batch in extracted.values())
+    finally:
+        wb.close()
+
+    # Per-day rows and summaries
+    reference_changed = state is not None and state.get('reference_fp') != reference_fp
+    day_states = {}
+    resummarized = []
+    _report(progress, None, "Generating summary...")
+    with phase(metrics, 'summarize') as record:
+        for day in sorted(fingerprints):
+            if day in extracted:
+                rows = extracted[day]
+            else:
+                rows = saved_days[day]['rows']
+
+            if day in extracted or reference_changed:
+                temp_df = detail_frame({day: rows}, month, year)
+                day_summary = summarize(temp_df, part_index, sell_lookup, tariffs)
+                resummarized.append(day)
+            else:
+                day_summary = saved_days[day]['summary']
+
+            day_states[day] = {
+                'fingerprint': fingerprints[day],
+                'rows': rows,
+                'summary': day_summary,
+                'orders': {du_order for du_order in rows['DU-Order'] if du_order is not None},
+            }
+        record['rows'] = sum(len(day_states[day]['summary']) for day in resummarized)
+
+        # Merge: orders never cross days in practice, so per-day summaries
+        # can be stacked; otherwise summarize the whole month at once
+        spanning = cross_day_orders(day_states)
+        if spanning:
+            temp_df = detail_frame({day: s['rows'] for day, s in day_states.items()}, month, year)
+            summary_df = summarize(temp_df, part_index, sell_lookup, tariffs)
+        else:
+            frames = [day_states[day]['summary'] for day in sorted(day_states)]
+            frames = [frame for frame in frames if len(frame) > 0]
+            if frames:
+                summary_df = pd.concat(frames, ignore_index=True)
+                summary_df = summary_df.sort_values('DU-Order', kind='stable').reset_index(drop=True)
+            else:
+                summary_df = pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    _report(progress, 1.0, "Creating output file...")
+    with phase(metrics, 'write', len(summary_df)):
+        output = write_summary(summary_df, layout=layout)
+
+    with phase(metrics, 'cache'):
+        _save_state(path, {
+            'version': STATE_VERSION,
+            'month': month,
+            'year': year,
+            'reference_fp': reference_fp,
+            'days': day_states,
+        })
+
+    report = {
+        'days': sorted(fingerprints),
+        'reused': sorted(set(fingerprints) - set(extracted)),
+        'extracted': sorted(extracted),
+        'resummarized': resummarized,
+        'removed': sorted(set(saved_days) - set(fingerprints)),
+        'reference_changed': reference_changed,
+        'cross_day_orders': spanning,
+    }
+    _report(progress, 1.0, "Complete!")
+    return output, len(summary_df), report
@@ -0,0 +1,276 @@
+"""Streaming read-only ingestion of the daily billing sheets"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from io import BytesIO
+import calendar
+import multiprocessing
+import os
+
+import openpyxl
+
+# openpyxl 3.1 internals used to open only some sheets; other versions open
+# the whole workbook instead
+try:
+    from openpyxl.reader.excel import ExcelReader
+    from openpyxl.styles.stylesheet import apply_stylesheet
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+except ImportError:
+    ExcelReader = None
+
+from billing.manifest import SharedStrings
+
+# Columns of a day sheet (A..P), in sheet order
+DAY_COLUMNS = [
+    'DU', 'Order', 'DU-Order', 'CM Code', 'Sold To', 'CN Code', 'Ship To',
+    'Address1', 'Address2', 'Province', 'Post Code', 'Tel', 'Part Number',
+    'Pick QTY', 'Free Gift', 'Remark'
+]
+
+# Detail frame schema: text that repeats from row to row is stored as
+# categories, quantities as numbers. DU-Order and Order stay as read.
+CATEGORY_COLUMNS = [
+    'Order Date', 'DU', 'CM Code', 'Sold To', 'CN Code', 'Ship To', 'Address1',
+    'Address2', 'Province', 'Post Code', 'Tel', 'Part Number', 'Free Gift', 'Remark'
+]
+NUMERIC_COLUMNS = ['Pick QTY']
+
+# Data in the day sheets starts at row 9
+FIRST_DATA_ROW = 9
+
+# Every possible day sheet name
+ALL_DAYS = list(range(1, 32))
+
+# Rows per column batch handed back by iter_day_batches
+BATCH_SIZE = 5000
+
+
+def open_workbook(file, sheets=None):
+    """Open the workbook for streaming, reading cached values only
+
+    The VBA project and the formula trees are never loaded, and sheets are
+    parsed lazily as their rows are iterated. With sheets (names), only the
+    workbook manifest, the styles and those sheets are opened: other tabs,
+    chart sheets and the shared strings only they use are never read, and
+    wb.sheetnames lists just the requested sheets the workbook has.
+
+    This relies on openpyxl 3.1 internals. Should they differ, the whole
+    workbook is opened as without sheets, which reads the same values.
+    """
+    if sheets is not None and ExcelReader is not None:
+        try:
+            return _open_sheets(file, sheets)
+        except (AttributeError, TypeError):
+            if hasattr(file, 'seek'):
+                file.seek(0)
+    return openpyxl.load_workbook(file, read_only=True, data_only=True, keep_vba=False)
+
+
+def _open_sheets(file, sheets):
+    reader = ExcelReader(file, read_only=True, keep_vba=False, data_only=True)
+    reader.read_manifest()
+    reader.read_workbook()
+    apply_stylesheet(reader.archive, reader.wb)
+
+    wanted = set(sheets)
+    found = [
+        (sheet, rel.target) for sheet, rel in reader.parser.find_sheets()
+        if sheet.name in wanted and 'chartsheet' not in rel.Type and rel.target in reader.valid_files
+    ]
+    strings = SharedStrings(reader.archive, [target for _, target in found])
+    for sheet, target in found:
+        ws = ReadOnlyWorksheet(reader.wb, sheet.name, target, strings)
+        ws.sheet_state = sheet.state
+        reader.wb._sheets.append(ws)
+    return reader.wb
+
+
+def _new_batch():
+    batch = {'Order Date': []}
+    for name in DAY_COLUMNS:
+        batch[name] = []
+    return batch
+
+
+def iter_day_batches(sheet, delivery_date, batch_size=BATCH_SIZE):
+    """Yield column-oriented batches from a day sheet
+
+    Rows are streamed from row 9 until the first empty DU. Each batch is a
+    dict mapping 'Order Date' and the DAY_COLUMNS names to lists of values.
+    """
+    width = len(DAY_COLUMNS)
+    batch = _new_batch()
+    columns = [batch[name] for name in DAY_COLUMNS]
+    dates = batch['Order Date']
+
+    for values in sheet.iter_rows(min_row=FIRST_DATA_ROW, max_col=width, values_only=True):
+        if not values or values[0] is None:
+            break
+
+        dates.append(delivery_date)
+        for col_idx in range(width):
+            columns[col_idx].append(values[col_idx] if col_idx < len(values) else None)
+
+        if len(dates) >= batch_size:
+            yield batch
+            batch = _new_batch()
+            columns = [batch[name] for name in DAY_COLUMNS]
+            dates = batch['Order Date']
+
+    if dates:
+        yield batch
+
+
+def extract_day(sheet, delivery_date):
+    """Read a whole day sheet into a single column batch"""
+    data = _new_batch()
+    for batch in iter_day_batches(sheet, delivery_date):
+        for name, values in batch.items():
+            data[name].extend(values)
+    return data
+
+
+def month_days(month, year):
+    """Day numbers 1..N of the month"""
+    return list(range(1, calendar.monthrange(year, month)[1] + 1))
+
+
+def extract_days(wb, days, on_day=None):
+    """Read the given day sheets into {day: column batch}
+
+    Days without a sheet are left out. Order Date is not filled in here; use
+    stamp_month to date the batches for a given month. on_day, if given, is
+    called as on_day(day, len(days)) after each day so callers can report
+    progress.
+    """
+    day_data = {}
+    for day in days:
+        sheet_name = str(day)
+        if sheet_name in wb.sheetnames:
+            day_data[day] = extract_day(wb[sheet_name], None)
+
+        if on_day is not None:
+            on_day(day, len(days))
+
+    return day_data
+
+
+def stamp_month(day_data, month, year):
+    """Join per-day batches of the month into one batch, in day order
+
+    Order Date is set from the day number, month and year. Days beyond the
+    end of the month are ignored.
+    """
+    data = _new_batch()
+    for day in month_days(month, year):
+        if day not in day_data:
+            continue
+        batch = day_data[day]
+        data['Order Date'].extend([date(year, month, day)] * len(batch['DU']))
+        for name in DAY_COLUMNS:
+            data[name].extend(batch[name])
+    return data
+
+
+def extract_month(wb, month, year, on_day=None):
+    """Read every day sheet of the month into one column batch
+
+    on_day, if given, is called as on_day(day, days_in_month) after each day
+    so callers can report progress.
+    """
+    return stamp_month(extract_days(wb, month_days(month, year), on_day), month, year)
+
+
+def workbook_source(file):
+    """Path or raw bytes of an uploaded workbook, safe to send to worker processes"""
+    if isinstance(file, (str, os.PathLike)):
+        return os.fspath(file)
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+# Workbook opened once per worker process by _init_day_worker
+_worker_wb = None
+
+
+def _init_day_worker(source, sheet_names):
+    global _worker_wb
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    _worker_wb = open_workbook(source, sheet_names)
+
+
+def _extract_day_task(sheet_name):
+    return extract_day(_worker_wb[sheet_name], None)
+
+
+def extract_days_parallel(file, sheetnames, days, workers=None, on_day=None):
+    """Read the given day sheets concurrently in worker processes
+
+    Each worker opens its own read-only copy of the workbook and returns one
+    column batch per day, giving the same {day: column batch} as
+    extract_days. on_day is called as days finish, in completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    day_sheets = [day for day in days if str(day) in sheetnames]
+    for day in days:
+        if day not in day_sheets and on_day is not None:
+            on_day(day, len(days))
+
+    if not day_sheets:
+        return {}
+
+    day_data = {}
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(day_sheets)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_day_worker,
+        initargs=(workbook_source(file), [str(day) for day in day_sheets]),
+    ) as pool:
+        futures = {pool.submit(_extract_day_task, str(day)): day for day in day_sheets}
+        for future in as_completed(futures):
+            day = futures[future]
+            day_data[day] = future.result()
+            if on_day is not None:
+                on_day(day, len(days))
+
+    return {day: day_data[day] for day in day_sheets}
+
+
+def extract_month_parallel(file, sheetnames, month, year, workers=None, on_day=None):
+    """Parallel version of extract_month, see extract_days_parallel"""
+    day_data = extract_days_parallel(file, sheetnames, month_days(month, year), workers, on_day)
+    return stamp_month(day_data, month, year)
+
+
+def read_cargo_lookup(wb):
+    """Build the Part Number -> Weight lookup from 'Cargo and Weight' (row 3 on)"""
+    cargo_lookup = {}
+    for values in wb['Cargo and Weight'].iter_rows(min_row=3, max_col=5, values_only=True):
+        part_num = values[1] if len(values) > 1 else None
+        if part_num is None:
+            break
+        weight = values[4] if len(values) > 4 else None
+        if part_num and weight:
+            cargo_lookup[str(part_num)] = float(weight)
+    return cargo_lookup
+
+
+def read_sell_lookup(wb):
+    """Build the Post Code -> Area, Min Charge, Rate/KG lookup from 'Sell Price' (row 2 on)"""
+    sell_lookup = {}
+    for values in wb['Sell Price'].iter_rows(min_row=2, max_col=5, values_only=True):
+        post_code = values[0] if values else None
+        if post_code is None:
+            break
+        area, min_charge, rate_kg = (tuple(values[2:5]) + (None, None, None))[:3]
+        if post_code:
+            sell_lookup[str(int(post_code))] = {
+                'area': area,
+                'min_charge': float(min_charge) if min_charge else 0,
+                'rate_kg': float(rate_kg) if rate_kg else 0
+            }
+    return sell_lookup
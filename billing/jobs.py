@@ -0,0 +1,263 @@
+"""Background job runner so a billing run does not block the Streamlit session"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from billing.bounded import run_bounded
+from billing.incremental import run_incremental, state_path
+from billing.pipeline import run_billing
+from billing.validate import days_outside_month
+from billing.writer import DEFAULT_LAYOUT
+
+# Jobs a server runs at the same time; the rest wait in the queue
+MAX_CONCURRENT_JOBS = 2
+
+# Finished jobs are kept this long so pages can reconnect to them, but no
+# more than this many, nor more result bytes than this (newest kept first)
+KEEP_FINISHED_SECONDS = 2 * 60 * 60
+KEEP_FINISHED_JOBS = 20
+KEEP_RESULT_MB = 500
+
+
+def job_worker_budget(max_jobs=MAX_CONCURRENT_JOBS):
+    """Extraction processes one job may use so that max_jobs jobs share the CPUs"""
+    return max(1, (os.cpu_count() or 1) // max_jobs)
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job is cancelled"""
+
+
+def _result_bytes(result):
+    if not isinstance(result, dict):
+        return 0
+    return sum(len(value) for value in result.values() if isinstance(value, (bytes, bytearray)))
+
+
+class Job:
+    """State of one submitted job, updated by the worker thread"""
+
+    def __init__(self, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created = datetime.now()
+        self.started = None
+        self.finished = None
+        self._finished_at = None
+        self._future = None
+        self._cancel_requested = False
+
+    @property
+    def done(self):
+        return self.status in ('done', 'error', 'cancelled')
+
+    def update(self, fraction, message):
+        if self._cancel_requested:
+            raise JobCancelled()
+        if fraction is not None:
+            self.progress = fraction
+        if message:
+            self.message = message
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'label': self.label,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created': self.created.isoformat(timespec='seconds'),
+            'started': self.started.isoformat(timespec='seconds') if self.started else None,
+            'finished': self.finished.isoformat(timespec='seconds') if self.finished else None,
+        }
+
+
+class JobRunner:
+    """Thread pool with a fixed number of workers and pollable jobs
+
+    submit() returns a job id at once; get() returns the Job so a page can
+    show its progress, and reconnect to it after a rerun or refresh.
+    Finished jobs are dropped after keep_seconds, and beyond the newest
+    keep_jobs or keep_bytes of results.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, keep_seconds=KEEP_FINISHED_SECONDS,
+                 keep_jobs=KEEP_FINISHED_JOBS, keep_bytes=int(KEEP_RESULT_MB * 1e6)):
+        self.max_workers = max_workers
+        self.keep_seconds = keep_seconds
+        self.keep_jobs = keep_jobs
+        self.keep_bytes = keep_bytes
+        self.worker_budget = job_worker_budget(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='billing-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, label=None, **kwargs):
+        """Queue func(*args, progress=..., **kwargs); returns the job id
+
+        A workers keyword (extraction processes) is capped at worker_budget,
+        so the jobs running at once do not oversubscribe the CPUs.
+        """
+        if 'workers' in kwargs:
+            workers = kwargs['workers']
+            kwargs['workers'] = self.worker_budget if workers is None else min(workers, self.worker_budget)
+        job = Job(label or getattr(func, '__name__', 'job'))
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            job._future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False when it is unknown or already done
+
+        A queued job never starts. A running one stops at its next progress
+        report with status 'cancelled'.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job._cancel_requested = True
+            if job._future.cancel():
+                self._finish(job, 'cancelled', "Cancelled")
+            else:
+                job.message = "Cancelling..."
+        return True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def queue_position(self, job_id):
+        """1-based position among queued jobs, or None when not queued"""
+        queued = [job for job in self.jobs() if job.status == 'queued']
+        queued.sort(key=lambda job: job.created)
+        for position, job in enumerate(queued, start=1):
+            if job.id == job_id:
+                return position
+        return None
+
+    def wait(self, job_id, timeout=None, interval=0.1):
+        """Block until the job is done (for scripts and tests)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.done:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(interval)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        job.started = datetime.now()
+        job.message = "Starting..."
+        try:
+            job.update(None, None)
+            result = func(*args, progress=job.update, **kwargs)
+        except JobCancelled:
+            status, message = 'cancelled', "Cancelled"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.traceback = traceback.format_exc()
+            status, message = 'error', job.message
+        else:
+            job.result = result
+            job.progress = 1.0
+            status, message = 'done', "Complete!"
+        with self._lock:
+            self._finish(job, status, message)
+            self._prune()
+
+    @staticmethod
+    def _finish(job, status, message):
+        job.status = status
+        job.message = message
+        job.finished = datetime.now()
+        job._finished_at = time.monotonic()
+
+    def _prune(self):
+        """Drop expired finished jobs, then the oldest beyond keep_jobs / keep_bytes"""
+        now = time.monotonic()
+        finished = sorted(
+            (job for job in self._jobs.values() if job._finished_at is not None),
+            key=lambda job: job._finished_at, reverse=True
+        )
+        kept = kept_bytes = 0
+        for job in finished:
+            kept += 1
+            kept_bytes += _result_bytes(job.result)
+            if now - job._finished_at > self.keep_seconds or (
+                    kept > 1 and (kept > self.keep_jobs or kept_bytes > self.keep_bytes)):
+                del self._jobs[job.id]
+
+
+def billing_job(data, name, month, year, workers=1, cache=None, reference_store=None,
+                incremental=False, metrics=None, tariffs=None, part_matching=None, memory_limit_mb=None,
+                progress=None, layout=DEFAULT_LAYOUT, owner=None):
+    """One billing run on uploaded bytes, free of any UI calls
+
+    With memory_limit_mb the run is made in large-file mode (run_bounded):
+    in a child process held under that many MB, without extraction workers.
+    layout is the output layout, 'flat' or 'normalized' (see billing.writer).
+    owner, who uploaded the file, keys the incremental state with the name.
+    Returns {'xlsx': bytes, 'records': int, 'month': int, 'year': int,
+    'incremental': report or None, 'metrics': RunMetrics or None,
+    'peak_rss_bytes': int or None, 'days_outside_month': {day: rows}}.
+    Day sheets the month does not have are never billed; those holding rows
+    are listed in 'days_outside_month'.
+    """
+    peak_rss = None
+    if memory_limit_mb is not None:
+        if incremental:
+            raise ValueError("Incremental month-to-date runs are not available in large-file mode")
+        report = None
+        output, record_count, peak_rss = run_bounded(
+            data, month, year, memory_limit_mb,
+            cache=cache, reference_store=reference_store, progress=progress, metrics=metrics, tariffs=tariffs,
+            part_matching=part_matching, layout=layout
+        )
+    elif incremental:
+        output, record_count, report = run_incremental(
+            BytesIO(data), month, year, state_path(name, month, year, owner=owner),
+            workers=workers, reference_store=reference_store, progress=progress, metrics=metrics,
+            tariffs=tariffs, part_matching=part_matching, layout=layout
+        )
+    else:
+        report = None
+        output, record_count = run_billing(
+            BytesIO(data), month, year,
+            workers=workers, cache=cache, reference_store=reference_store, progress=progress, metrics=metrics,
+            tariffs=tariffs, part_matching=part_matching, layout=layout
+        )
+    return {
+        'xlsx': output.getvalue(),
+        'records': record_count,
+        'month': month,
+        'year': year,
+        'incremental': report,
+        'metrics': metrics,
+        'peak_rss_bytes': peak_rss,
+        'days_outside_month': days_outside_month(BytesIO(data), month, year),
+    }
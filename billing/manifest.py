@@ -0,0 +1,199 @@
+"""Sheet manifest of an .xlsx/.xlsm file, read straight from the zip directory"""
+
+import hashlib
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+from openpyxl.reader.strings import read_string_table
+
+try:
+    from openpyxl.cell.text import Text
+except ImportError:  # rich text items are then read with the whole table
+    Text = None
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+
+# Shared string items and cells referring to them, matched on the raw XML;
+# elements may carry a namespace prefix (<x:si>, <x:c>) when the file was
+# not written by Excel or openpyxl
+SHARED_STRING_ITEM = re.compile(rb'<(?:\w+:)?si>(.*?)</(?:\w+:)?si>|<(?:\w+:)?si/>', re.S)
+SHARED_STRING_CELL = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)</(?:\w+:)?v>')
+
+# Namespace prefix of an element, declared again when an item is parsed alone
+ELEMENT_PREFIX = re.compile(rb'</?(\w+):')
+
+# Any cell of type shared string, to tell when SHARED_STRING_CELL missed some
+SHARED_STRING_TYPE = re.compile(rb'\bt="s"')
+
+# Shared string item that is plain text, decoded without an XML parser
+PLAIN_TEXT_ITEM = re.compile(rb'<(?:\w+:)?t(?: xml:space="preserve")?>([^<&]*)</(?:\w+:)?t>')
+
+
+def _open_zip(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return zipfile.ZipFile(file)
+
+
+def _sheet_parts(archive):
+    """{sheet name: zip part path} in workbook order"""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+
+    targets = {}
+    for rel in rels.iter(f'{PKG_REL_NS}Relationship'):
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = target
+
+    parts = {}
+    for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+        parts[sheet.get('name')] = targets.get(sheet.get(f'{REL_NS}id'))
+    return parts
+
+
+def read_manifest(file):
+    """{sheet name: zip part path} without parsing any sheet"""
+    with _open_zip(file) as archive:
+        return _sheet_parts(archive)
+
+
+def parts_fingerprint(file, sheet_names):
+    """Fingerprint of the stored XML of the given sheets
+
+    Built from the CRC-32 and size recorded in the zip directory, so no part
+    is decompressed. The shared string table is included because sheet cells
+    refer to text by index into it.
+    """
+    digest = hashlib.sha256()
+    with _open_zip(file) as archive:
+        parts = _sheet_parts(archive)
+        members = [parts.get(name) for name in sheet_names] + [SHARED_STRINGS_PART]
+        for member in members:
+            try:
+                info = archive.getinfo(member) if member else None
+            except KeyError:
+                info = None
+            if info is None:
+                digest.update(f'{member}:missing;'.encode())
+            else:
+                digest.update(f'{member}:{info.CRC}:{info.file_size};'.encode())
+    return digest.hexdigest()
+
+
+def _shared_strings(archive):
+    """(raw XML of every shared string item by index, raw XML of the whole table)"""
+    try:
+        data = archive.read(SHARED_STRINGS_PART)
+    except KeyError:
+        return [], b''
+    return [match.group(1) or b'' for match in SHARED_STRING_ITEM.finditer(data)], data
+
+
+def sheet_fingerprints(file, sheet_names):
+    """{sheet name: content fingerprint} for the sheets that exist
+
+    The fingerprint covers the sheet XML and the text of every shared string
+    the sheet refers to, so it changes whenever the sheet content does, but
+    not when only other sheets change. Only regular expressions run over
+    the raw XML; no cell objects are built. Should the expressions not
+    account for every shared string cell of a sheet, the whole table is
+    hashed instead, which still changes with the sheet content.
+    """
+    fingerprints = {}
+    with _open_zip(file) as archive:
+        parts = _sheet_parts(archive)
+        strings = None
+        for name in sheet_names:
+            member = parts.get(name)
+            if member is None:
+                continue
+            data = archive.read(member)
+            if strings is None:
+                strings, table = _shared_strings(archive)
+
+            digest = hashlib.sha256(data)
+            cells = SHARED_STRING_CELL.findall(data)
+            if len(cells) != len(SHARED_STRING_TYPE.findall(data)) or any(int(idx) >= len(strings) for idx in cells):
+                digest.update(table)
+            else:
+                for idx in cells:
+                    digest.update(strings[int(idx)])
+                    digest.update(b'\0')
+            fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+
+def _item_text(item):
+    """Text of a raw <si> item as openpyxl reads it, or None if it is not well-formed on its own"""
+    plain = PLAIN_TEXT_ITEM.fullmatch(item)
+    if plain:
+        text = plain.group(1).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    elif Text is None:
+        return None
+    else:
+        namespace = MAIN_NS[1:-1].encode()
+        declarations = b''.join(b' xmlns:%s="%s"' % (prefix, namespace) for prefix in set(ELEMENT_PREFIX.findall(item)))
+        try:
+            node = ET.fromstring(b'<si xmlns="' + namespace + b'"' + declarations + b'>' + item + b'</si>')
+        except ET.ParseError:
+            return None
+        text = Text.from_tree(node).content
+    return text.replace('x005F_', '')
+
+
+class SharedStrings:
+    """Shared string table decoded only where the given sheet parts refer to it
+
+    Workbooks with many auxiliary tabs carry large tables that a run mostly
+    never reads. The indices the sheet parts use are found with
+    SHARED_STRING_CELL and only those items are decoded. Should a sheet
+    refer to any other index (cell XML the expression does not match), the
+    whole table is read on first use instead.
+    """
+
+    def __init__(self, archive, members):
+        self.archive = archive
+        self._complete = False
+        indices = set()
+        for member in members:
+            indices.update(int(idx) for idx in SHARED_STRING_CELL.findall(archive.read(member)))
+        self._strings = self._decode(indices) if indices else {}
+
+    def _decode(self, indices):
+        try:
+            data = self.archive.read(SHARED_STRINGS_PART)
+        except KeyError:
+            return {}
+        strings = {}
+        last = max(indices)
+        for idx, match in enumerate(SHARED_STRING_ITEM.finditer(data)):
+            if idx > last:
+                break
+            if idx in indices:
+                text = _item_text(match.group(1) or b'')
+                if text is not None:
+                    strings[idx] = text
+        return strings
+
+    def __getitem__(self, idx):
+        if idx not in self._strings and not self._complete:
+            try:
+                with self.archive.open(SHARED_STRINGS_PART) as src:
+                    self._strings = dict(enumerate(read_string_table(src)))
+            except KeyError:
+                self._strings = {}
+            self._complete = True
+        try:
+            return self._strings[idx]
+        except KeyError:
+            raise IndexError(f"shared string {idx} out of range") from None
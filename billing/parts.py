@@ -0,0 +1,131 @@
+"""Part Number index for the cargo weight lookup
+
+A day sheet's Part Number is looked up in three tiers, from strict to loose:
+
+- exact: str(part), as the VBA macro does
+- normalized: case, whitespace and dashes ignored, and numbers matched with
+  text ('12345', 12345, 12345.0, ' 012345 ' are the same part)
+- fallback (part_matching='fuzzy' only): a unique catalog part that the
+  part is a prefix of or that is a prefix of it (a few characters apart),
+  or else the unique closest spelling among its neighbours in sort order
+
+The first two tiers are dict lookups. The fallback looks at a bounded number
+of candidates and is only tried for parts the other tiers do not resolve.
+"""
+
+import bisect
+import difflib
+import re
+
+# Part matching modes, strictest first
+PART_MATCHING = ('exact', 'normalized', 'fuzzy')
+DEFAULT_PART_MATCHING = 'exact'
+
+# How a part was matched, per detail row ('' when it was not found)
+MATCH_KINDS = ('exact', 'normalized', 'prefix', 'approximate')
+FALLBACK_KINDS = ('prefix', 'approximate')
+
+# Fallback bounds: shortest key tried, characters a prefix match may add or
+# drop, catalog neighbours compared and the similarity an approximate match needs
+MIN_FALLBACK_LENGTH = 4
+MAX_PREFIX_EXTRA = 3
+MAX_CANDIDATES = 50
+MIN_SIMILARITY = 0.9
+
+# Whitespace and the dash family, ignored by normalize_part
+SEPARATORS = re.compile(r'[\s\-\u2010-\u2015\u2212]+')
+INTEGRAL = re.compile(r'0*(\d+?)(?:\.0+)?')
+
+
+def normalize_part(value):
+    """Normalized key of a Part Number ('' when nothing is left)"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = SEPARATORS.sub('', str(value)).upper()
+    # Digits only: numbers and numeric text match without leading zeros or '.0'
+    integral = INTEGRAL.fullmatch(key)
+    return integral.group(1) if integral else key
+
+
+class PartIndex:
+    """cargo_lookup indexed for exact, normalized and fallback matching
+
+    Built once per run. Normalized keys shared by catalog parts of different
+    weights are left out, so they only ever match exactly.
+    """
+
+    def __init__(self, cargo_lookup, part_matching=DEFAULT_PART_MATCHING):
+        if part_matching not in PART_MATCHING:
+            raise ValueError(f"Unknown part matching '{part_matching}', expected one of {', '.join(PART_MATCHING)}")
+        self.cargo_lookup = cargo_lookup
+        self.part_matching = part_matching
+
+        self.normalized = {}
+        if part_matching != 'exact':
+            ambiguous = set()
+            for part, weight in cargo_lookup.items():
+                key = normalize_part(part)
+                if not key:
+                    continue
+                seen = self.normalized.setdefault(key, part)
+                if seen != part and cargo_lookup[seen] != weight:
+                    ambiguous.add(key)
+            for key in ambiguous:
+                del self.normalized[key]
+        self.sorted_keys = sorted(self.normalized) if part_matching == 'fuzzy' else []
+
+    def match(self, part):
+        """(catalog part, match kind), or (None, '') when the part is not found"""
+        if part in self.cargo_lookup:
+            return part, 'exact'
+        if self.part_matching == 'exact':
+            return None, ''
+        key = normalize_part(part)
+        if key in self.normalized:
+            return self.normalized[key], 'normalized'
+        if self.part_matching == 'fuzzy' and len(key) >= MIN_FALLBACK_LENGTH:
+            for fallback, kind in ((self._prefix_match, 'prefix'), (self._approximate_match, 'approximate')):
+                found = fallback(key)
+                if found is not None:
+                    return self.normalized[found], kind
+        return None, ''
+
+    def _prefix_match(self, key):
+        candidates = set()
+        # The only catalog key that starts with key, if a few characters longer...
+        start = bisect.bisect_left(self.sorted_keys, key)
+        longer = [candidate for candidate in self.sorted_keys[start:start + 2] if candidate.startswith(key)]
+        if len(longer) > 1:
+            return None
+        if longer and len(longer[0]) - len(key) <= MAX_PREFIX_EXTRA:
+            candidates.add(longer[0])
+        # ...or catalog keys a few characters shorter
+        for length in range(max(MIN_FALLBACK_LENGTH, len(key) - MAX_PREFIX_EXTRA), len(key)):
+            if key[:length] in self.normalized:
+                candidates.add(key[:length])
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def _approximate_match(self, key):
+        position = bisect.bisect_left(self.sorted_keys, key)
+        half = MAX_CANDIDATES // 2
+        neighbours = self.sorted_keys[max(0, position - half):position + half]
+        scored = sorted(
+            (difflib.SequenceMatcher(None, key, candidate).ratio(), candidate)
+            for candidate in neighbours
+            if abs(len(candidate) - len(key)) <= MAX_PREFIX_EXTRA
+        )
+        if not scored or scored[-1][0] < MIN_SIMILARITY:
+            return None
+        # A tie between two catalog parts is no match
+        if len(scored) > 1 and scored[-2][0] == scored[-1][0]:
+            return None
+        return scored[-1][1]
+
+    def match_keys(self, keys):
+        """(catalog parts, match kinds) lists for a sequence of lookup keys"""
+        matched, kinds = [], []
+        for key in keys:
+            part, kind = self.match(key) if key != '' else (None, '')
+            matched.append(part)
+            kinds.append(kind)
+        return matched, kinds
@@ -0,0 +1,319 @@
+"""Billing summary run without any UI, shared by the app and the CLI"""
+
+from io import BytesIO
+
+import pandas as pd
+
+from billing.cache import content_key
+from billing.columnar import read_columnar_info, read_detail, read_summary_columnar
+from billing.ingest import (
+    ALL_DAYS, CATEGORY_COLUMNS, NUMERIC_COLUMNS, open_workbook, month_days, extract_days,
+    extract_days_parallel, stamp_month, workbook_source,
+)
+from billing.manifest import read_manifest
+from billing.parts import DEFAULT_PART_MATCHING
+from billing.profiling import phase, run_context
+from billing.reference import REFERENCE_SHEETS, load_reference_tables
+from billing.summary import summarize
+from billing.writer import DEFAULT_LAYOUT, write_summary
+
+
+def _report(progress, fraction, message):
+    if progress is not None:
+        progress(fraction, message)
+
+
+def parse_workbook(file, days, workers=1, reference_store=None, progress=None, metrics=None):
+    """Read the given day sheets and the lookup tables of a workbook
+
+    Only the manifest, these sheets and the reference sheets are opened;
+    other tabs are never parsed. Returns {'days': {day: column batch},
+    'parsed_days', 'cargo_lookup', 'sell_lookup', 'reference_fingerprint'},
+    'parsed_days' being the days asked for and 'reference_fingerprint' the
+    fingerprint of reference_store after the lookups were built (None
+    without a store).
+    """
+    wb = _open_days(file, days, workers, list(REFERENCE_SHEETS), metrics)
+    try:
+        day_data = _extract(file, wb, days, workers, progress, metrics)
+
+        # Build lookup dictionaries (from the compiled store when given)
+        _report(progress, None, "Building lookup tables...")
+        with phase(metrics, 'lookup') as record:
+            cargo_lookup, sell_lookup = load_reference_tables(wb, file, reference_store)
+            record['rows'] = len(cargo_lookup) + len(sell_lookup)
+    finally:
+        wb.close()
+
+    return {
+        'days': day_data,
+        'parsed_days': list(days),
+        # Cargo and Weight lookup (Part Number -> Weight)
+        'cargo_lookup': cargo_lookup,
+        # Sell Price lookup (Post Code -> Area, Min Charge, Rate/KG)
+        'sell_lookup': sell_lookup,
+        # Store the lookups may have come from, see cached_workbook
+        'reference_fingerprint': reference_store.fingerprint() if reference_store is not None else None,
+    }
+
+
+def _open_days(file, days, workers, other_sheets, metrics):
+    # Load workbook (streaming, cached values only); extraction workers
+    # open the day sheets themselves
+    with phase(metrics, 'load'):
+        day_sheets = [] if workers > 1 else [str(day) for day in days]
+        return open_workbook(file, day_sheets + other_sheets)
+
+
+def _extract(file, wb, days, workers, progress, metrics):
+    days_done = []
+
+    def on_day(day, day_count):
+        days_done.append(day)
+        _report(progress, len(days_done) / day_count, f"Processing day {day}...")
+
+    with phase(metrics, 'extract') as record:
+        if workers > 1:
+            day_data = extract_days_parallel(file, read_manifest(file), days, workers=workers, on_day=on_day)
+        else:
+            day_data = extract_days(wb, days, on_day=on_day)
+        record['rows'] = sum(len(batch['DU']) for batch in day_data.values())
+    return day_data
+
+
+def add_days(parsed, file, days, workers=1, progress=None, metrics=None):
+    """Read the day sheets of days that parsed has not read yet into it
+
+    Returns True when parsed was extended. Entries from before
+    'parsed_days' was recorded hold every day sheet.
+    """
+    parsed_days = parsed.get('parsed_days', ALL_DAYS)
+    missing = [day for day in days if day not in parsed_days]
+    if not missing:
+        return False
+    wb = _open_days(file, missing, workers, [], metrics)
+    try:
+        parsed['days'].update(_extract(file, wb, missing, workers, progress, metrics))
+    finally:
+        wb.close()
+    parsed['parsed_days'] = sorted(set(parsed_days) | set(missing))
+    return True
+
+
+def cached_month(cache, key, file, month, year, workers=1, reference_store=None, progress=None, metrics=None):
+    """Parsed workbook holding the month's day sheets, kept in the cache under key
+
+    Only the month's day sheets are read. A later run for another month
+    reads just the day sheets the cached entry does not hold yet (e.g. 30
+    and 31 after February) and adds them to it.
+    """
+    with phase(metrics, 'cache'):
+        parsed = cached_workbook(cache, key, file, reference_store)
+    days = month_days(month, year)
+    if parsed is None:
+        parsed = parse_workbook(file, days, workers, reference_store, progress, metrics)
+    elif not add_days(parsed, file, days, workers, progress, metrics):
+        return parsed
+    with phase(metrics, 'cache'):
+        cache.put_workbook(key, parsed)
+    return parsed
+
+
+def cached_workbook(cache, key, file, reference_store=None):
+    """Parsed workbook from the cache, or None
+
+    A workbook without reference sheets is priced from the store, so when
+    the store was recompiled (or is used or left out) since the workbook was
+    cached, the lookups are built again from the reference sheets or the
+    store and the entry is updated.
+    """
+    parsed = cache.get_workbook(key)
+    if parsed is None:
+        return None
+
+    store_fp = reference_store.fingerprint() if reference_store is not None else None
+    if parsed.get('reference_fingerprint') != store_fp:
+        wb = open_workbook(file, REFERENCE_SHEETS)
+        try:
+            parsed['cargo_lookup'], parsed['sell_lookup'] = load_reference_tables(wb, file, reference_store)
+        finally:
+            wb.close()
+        parsed['reference_fingerprint'] = reference_store.fingerprint() if reference_store is not None else None
+        cache.put_workbook(key, parsed)
+    return parsed
+
+
+def typed_columns(data):
+    """Column batch -> DataFrame with the detail schema
+
+    Repeated text becomes categorical, so each distinct Sold To, address or
+    part number is stored (and turned into a lookup key) once instead of
+    once per row. Non-numeric quantities become NaN.
+    """
+    columns = {}
+    for name, values in data.items():
+        if name == 'Order Date':
+            # Sorted categories, so sorting by date still works on the codes
+            columns[name] = pd.Categorical(values)
+        elif name in CATEGORY_COLUMNS:
+            codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+            columns[name] = pd.Categorical.from_codes(codes, uniques)
+        elif name in NUMERIC_COLUMNS:
+            columns[name] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns)
+
+
+def detail_frame(day_data, month, year):
+    """Detail rows of the month as a DataFrame sorted by Order Date, DU-Order"""
+    temp_df = typed_columns(stamp_month(day_data, month, year))
+    if len(temp_df) > 0:
+        temp_df = temp_df.sort_values(by=['Order Date', 'DU-Order'])
+    return temp_df
+
+
+def month_frames(parsed, month, year, progress=None, metrics=None, tariffs=None, part_matching=None):
+    """(detail DataFrame, Summary DataFrame) of one month from a parsed workbook
+
+    tariffs, a TariffBook, prices the orders (default: the standard tariff).
+    part_matching is 'exact' (default), 'normalized' or 'fuzzy'.
+    """
+    # Convert to DataFrame and sort
+    _report(progress, None, "Sorting data...")
+    with phase(metrics, 'sort') as record:
+        temp_df = detail_frame(parsed['days'], month, year)
+        record['rows'] = len(temp_df)
+
+    # Process summary data
+    _report(progress, None, "Generating summary...")
+    with phase(metrics, 'summarize', len(temp_df)):
+        summary_df = summarize(temp_df, parsed['cargo_lookup'], parsed['sell_lookup'], tariffs, part_matching)
+    return temp_df, summary_df
+
+
+def summarize_month(parsed, month, year, progress=None, metrics=None, tariffs=None, part_matching=None,
+                    layout=DEFAULT_LAYOUT):
+    """Summary workbook of one month from a parsed workbook
+
+    layout is 'flat' or 'normalized' (see billing.writer).
+    Returns (BytesIO with the XLSX, number of summary records).
+    """
+    _, summary_df = month_frames(parsed, month, year, progress, metrics, tariffs, part_matching)
+
+    # Create output workbook (streamed in write-only mode)
+    _report(progress, 1.0, "Creating output file...")
+    with phase(metrics, 'write', len(summary_df)):
+        output = write_summary(summary_df, layout=layout)
+    return output, len(summary_df)
+
+
+def run_billing(file, month, year, workers=1, cache=None, reference_store=None, progress=None, metrics=None,
+                tariffs=None, part_matching=None, layout=DEFAULT_LAYOUT):
+    """Produce the Summary workbook for one month of a billing file
+
+    progress, if given, is called as progress(fraction, message) where
+    fraction is a float in 0..1 or None when only the message changes.
+    metrics, a RunMetrics, receives one record per phase. tariffs, a
+    TariffBook, prices the orders (default: the standard tariff).
+    part_matching is how Part Numbers are matched (see billing.parts) and
+    layout how the workbook is laid out (see billing.writer).
+    Returns (BytesIO with the XLSX, number of summary records).
+    """
+    with run_context(metrics):
+        return _run_billing(file, month, year, workers, cache, reference_store, progress, metrics, tariffs,
+                            part_matching, layout)
+
+
+def _run_billing(file, month, year, workers, cache, reference_store, progress, metrics, tariffs, part_matching,
+                 layout):
+    # Reuse a finished summary or an already parsed workbook
+    parsed = None
+    if cache is not None:
+        _report(progress, None, "Checking cache...")
+        with phase(metrics, 'cache'):
+            key = content_key(workbook_source(file))
+            # Outputs depend on the tariffs, the part matching, the layout
+            # and the reference store as well, parsed workbooks do not
+            output_key = f'{key}-{part_matching or DEFAULT_PART_MATCHING}'
+            if reference_store is not None:
+                output_key += f"-{(reference_store.fingerprint() or 'nostore')[:16]}"
+            if tariffs is not None:
+                output_key += f'-{tariffs.fingerprint[:16]}'
+            if layout != DEFAULT_LAYOUT:
+                output_key += f'-{layout}'
+            cached = cache.get_output(output_key, month, year)
+        if cached is not None:
+            _report(progress, 1.0, "Complete! (cached)")
+            return BytesIO(cached['xlsx']), cached['records']
+        parsed = cached_month(cache, key, file, month, year, workers, reference_store, progress, metrics)
+    else:
+        parsed = parse_workbook(file, month_days(month, year), workers, reference_store, progress, metrics)
+
+    output, record_count = summarize_month(parsed, month, year, progress, metrics, tariffs, part_matching, layout)
+
+    if cache is not None:
+        with phase(metrics, 'cache'):
+            cache.put_output(output_key, month, year, output.getvalue(), record_count)
+
+    _report(progress, 1.0, "Complete!")
+    return output, record_count
+
+
+def columnar_summary(path, reference_store=None, reference_file=None, progress=None, metrics=None,
+                     tariffs=None, part_matching=None):
+    """(Summary DataFrame, {'kind', 'month', 'year'}) from a Parquet/Arrow file
+
+    A summary file is read as is. A detail file is priced again with the
+    current reference tables, taken from reference_store or from the
+    'Cargo and Weight' / 'Sell Price' sheets of reference_file.
+    """
+    info = read_columnar_info(path)
+    if info.get('kind') == 'summary':
+        with phase(metrics, 'load') as record:
+            summary_df, info = read_summary_columnar(path)
+            record['rows'] = len(summary_df)
+        return summary_df, info
+
+    with phase(metrics, 'load') as record:
+        temp_df, info = read_detail(path)
+        record['rows'] = len(temp_df)
+
+    _report(progress, None, "Building lookup tables...")
+    with phase(metrics, 'lookup') as record:
+        if reference_file is not None:
+            wb = open_workbook(reference_file, REFERENCE_SHEETS)
+            try:
+                cargo_lookup, sell_lookup = load_reference_tables(wb, reference_file, reference_store)
+            finally:
+                wb.close()
+        elif reference_store is not None and reference_store.exists():
+            cargo_lookup, sell_lookup = reference_store.load()
+        else:
+            raise ValueError("Pricing a detail file needs a reference store or a workbook "
+                             "with the 'Cargo and Weight' and 'Sell Price' sheets")
+        record['rows'] = len(cargo_lookup) + len(sell_lookup)
+
+    _report(progress, None, "Generating summary...")
+    with phase(metrics, 'summarize', len(temp_df)):
+        summary_df = summarize(temp_df, cargo_lookup, sell_lookup, tariffs, part_matching)
+    return summary_df, info
+
+
+def run_from_columnar(path, reference_store=None, reference_file=None, progress=None, metrics=None,
+                      tariffs=None, part_matching=None, layout=DEFAULT_LAYOUT):
+    """Summary workbook from a Parquet/Arrow file instead of the workbook
+
+    See columnar_summary for how detail and summary files are handled.
+    Returns (BytesIO with the XLSX, number of summary records, month, year).
+    """
+    with run_context(metrics):
+        summary_df, info = columnar_summary(path, reference_store, reference_file, progress, metrics, tariffs,
+                                            part_matching)
+
+        _report(progress, 1.0, "Creating output file...")
+        with phase(metrics, 'write', len(summary_df)):
+            output = write_summary(summary_df, layout=layout)
+
+    _report(progress, 1.0, "Complete!")
+    return output, len(summary_df), info['month'], info['year']
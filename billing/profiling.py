@@ -0,0 +1,166 @@
+"""Phase timing, memory and optional cProfile capture for a billing run"""
+
+from contextlib import contextmanager, nullcontext
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# tracemalloc and the profiler are process-wide, so only one run at a time
+# (e.g. one of several jobs in threads) may use them
+_instrument_lock = threading.Lock()
+
+
+class _RawStats:
+    """Profile data in the form pstats.Stats loads from a profiler object"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def max_rss_bytes():
+    """Peak resident set size of this process so far, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RunMetrics:
+    """Collects one record per pipeline phase
+
+    Each record holds the wall time, the rows the phase handled, rows per
+    second and the memory high-water mark. With track_memory the Python heap
+    peak of every phase is measured with tracemalloc (slower); the process
+    peak RSS is always recorded where the platform reports it.
+
+    While another run in the process holds tracemalloc and the profiler,
+    the run is timed only: instrumented is False, heap peaks are None and
+    no profile is captured. Metrics pickle with their profile data, so a
+    child process can send them back.
+    """
+
+    def __init__(self, track_memory=False, profile=False):
+        self.track_memory = track_memory
+        self.profile = profile
+        self.phases = []
+        self.profile_stats = None
+        self._profiler = cProfile.Profile() if profile else None
+        self._started = None
+        self._tracing = False
+        self.instrumented = None
+        self.total_seconds = None
+
+    @contextmanager
+    def run(self):
+        """Wrap the whole run: total time, tracemalloc and cProfile"""
+        wanted = self.track_memory or self._profiler is not None
+        self.instrumented = wanted and _instrument_lock.acquire(blocking=False)
+        profiler = self._profiler if self.instrumented else None
+        self._tracing = self.instrumented and self.track_memory
+        started_tracing = self._tracing and not tracemalloc.is_tracing()
+        try:
+            if started_tracing:
+                tracemalloc.start()
+            if profiler is not None:
+                profiler.enable()
+            self._started = time.perf_counter()
+            try:
+                yield self
+            finally:
+                self.total_seconds = time.perf_counter() - self._started
+                if profiler is not None:
+                    profiler.disable()
+                    self.profile_stats = pstats.Stats(profiler)
+                if started_tracing:
+                    tracemalloc.stop()
+        finally:
+            self._tracing = False
+            if self.instrumented:
+                _instrument_lock.release()
+
+    @contextmanager
+    def phase(self, name, rows=None):
+        """Time one phase; set record['rows'] inside the block if not known up front"""
+        record = {'phase': name, 'rows': rows}
+        tracing = self._tracing
+        if tracing:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - started
+            record['seconds'] = round(seconds, 4)
+            record['rows_per_second'] = round(record['rows'] / seconds, 1) if record['rows'] and seconds else None
+            record['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1] if tracing else None
+            record['max_rss_bytes'] = max_rss_bytes()
+            self.phases.append(record)
+
+    def seconds(self, name):
+        """Total seconds spent in phases with this name"""
+        return sum(record['seconds'] for record in self.phases if record['phase'] == name)
+
+    def profile_text(self, limit=30, sort='cumulative'):
+        if self.profile_stats is None:
+            return None
+        stream = io.StringIO()
+        self.profile_stats.stream = stream
+        self.profile_stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def profile_bytes(self):
+        """Raw .prof data for snakeviz / pstats, or None"""
+        if self.profile_stats is None:
+            return None
+        # Same format as Stats.dump_stats, which only writes to a path
+        return marshal.dumps(self.profile_stats.stats)
+
+    def __getstate__(self):
+        state = dict(self.__dict__, _profiler=None)
+        if self.profile_stats is not None:
+            state['profile_stats'] = self.profile_stats.stats
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.profile_stats is not None:
+            self.profile_stats = pstats.Stats(_RawStats(self.profile_stats))
+
+    def to_dict(self):
+        return {
+            'total_seconds': round(self.total_seconds, 4) if self.total_seconds is not None else None,
+            'max_rss_bytes': max_rss_bytes(),
+            'instrumented': self.instrumented,
+            'phases': self.phases,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+
+def phase(metrics, name, rows=None):
+    """metrics.phase(...) or a no-op context when metrics is None"""
+    if metrics is None:
+        return nullcontext({'phase': name, 'rows': rows})
+    return metrics.phase(name, rows)
+
+
+def run_context(metrics):
+    if metrics is None:
+        return nullcontext()
+    return metrics.run()
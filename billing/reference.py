@@ -0,0 +1,151 @@
+"""Compiled 'Cargo and Weight' / 'Sell Price' reference tables stored in SQLite"""
+
+from contextlib import closing
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+
+from billing.ingest import open_workbook, read_cargo_lookup, read_sell_lookup
+from billing.manifest import parts_fingerprint
+
+REFERENCE_SHEETS = ('Cargo and Weight', 'Sell Price')
+
+# Default location of the compiled store used by the app
+REFERENCE_STORE_PATH = 'reference_tables.sqlite'
+
+# Bump when the store layout changes; older stores are rebuilt
+STORE_VERSION = '1'
+
+
+def lookups_fingerprint(cargo_lookup, sell_lookup):
+    """Fingerprint of the reference table contents"""
+    payload = json.dumps(
+        [sorted(cargo_lookup.items()), sorted((k, v['area'], v['min_charge'], v['rate_kg']) for k, v in sell_lookup.items())],
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ReferenceStore:
+    """Reference tables compiled into a single SQLite file
+
+    Both tables are keyed (and indexed) by their lookup key. The meta table
+    records the store version, a fingerprint of the table contents and a
+    fingerprint of the sheet parts they were compiled from.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def exists(self):
+        return os.path.exists(self.path) and self.meta('version') == STORE_VERSION
+
+    def meta(self, key):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def fingerprint(self):
+        """Fingerprint of the compiled table contents, None when there is no store"""
+        return self.meta('content_fingerprint') if self.exists() else None
+
+    def set_meta(self, key, value):
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def save(self, cargo_lookup, sell_lookup, parts_fp=None):
+        """Compile the lookups into the store, replacing its contents"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # A unique file per call: jobs in threads of one process may save
+        # the same store at once
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+
+        with closing(sqlite3.connect(tmp_path)) as conn, conn:
+            conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            conn.execute('CREATE TABLE cargo (part TEXT PRIMARY KEY, weight REAL NOT NULL)')
+            conn.execute(
+                'CREATE TABLE sell (post_code TEXT PRIMARY KEY, area, '
+                'min_charge REAL NOT NULL, rate_kg REAL NOT NULL)'
+            )
+            conn.executemany('INSERT INTO cargo VALUES (?, ?)', cargo_lookup.items())
+            conn.executemany(
+                'INSERT INTO sell VALUES (?, ?, ?, ?)',
+                [(k, v['area'], v['min_charge'], v['rate_kg']) for k, v in sell_lookup.items()]
+            )
+            conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('version', STORE_VERSION),
+                ('content_fingerprint', lookups_fingerprint(cargo_lookup, sell_lookup)),
+                ('parts_fingerprint', parts_fp or ''),
+            ])
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """(cargo_lookup, sell_lookup) in the same shape as read_*_lookup"""
+        with self._connect() as conn:
+            cargo_lookup = dict(conn.execute('SELECT part, weight FROM cargo'))
+            sell_lookup = {
+                post_code: {'area': area, 'min_charge': min_charge, 'rate_kg': rate_kg}
+                for post_code, area, min_charge, rate_kg
+                in conn.execute('SELECT post_code, area, min_charge, rate_kg FROM sell')
+            }
+        return cargo_lookup, sell_lookup
+
+
+def has_reference_sheets(wb):
+    return all(name in wb.sheetnames for name in REFERENCE_SHEETS)
+
+
+def load_reference_tables(wb, file=None, store=None):
+    """(cargo_lookup, sell_lookup) for a run, going through the store if given
+
+    - workbook without the reference sheets: loaded from the store
+    - sheet parts unchanged since the store was compiled: loaded from the store
+    - otherwise the sheets are read, and the store is rebuilt only when the
+      table contents actually differ
+    """
+    if store is None:
+        return read_cargo_lookup(wb), read_sell_lookup(wb)
+
+    if not has_reference_sheets(wb):
+        if not store.exists():
+            raise ValueError(
+                "Workbook has no 'Cargo and Weight' / 'Sell Price' sheets "
+                f"and no compiled reference store exists at {store.path}"
+            )
+        return store.load()
+
+    parts_fp = parts_fingerprint(file, REFERENCE_SHEETS) if file is not None else None
+    if parts_fp and store.exists() and store.meta('parts_fingerprint') == parts_fp:
+        return store.load()
+
+    cargo_lookup = read_cargo_lookup(wb)
+    sell_lookup = read_sell_lookup(wb)
+    if store.exists() and store.meta('content_fingerprint') == lookups_fingerprint(cargo_lookup, sell_lookup):
+        if parts_fp:
+            store.set_meta('parts_fingerprint', parts_fp)
+    else:
+        store.save(cargo_lookup, sell_lookup, parts_fp)
+    return cargo_lookup, sell_lookup
+
+
+def compile_reference_store(file, path):
+    """Compile the reference sheets of a workbook into a store at path"""
+    wb = open_workbook(file, REFERENCE_SHEETS)
+    try:
+        store = ReferenceStore(path)
+        store.save(read_cargo_lookup(wb), read_sell_lookup(wb), parts_fingerprint(file, REFERENCE_SHEETS))
+    finally:
+        wb.close()
+    return store
@@ -0,0 +1,213 @@
+"""Vectorized per-order summary of the extracted day data"""
+
+import numpy as np
+import pandas as pd
+
+from billing.parts import DEFAULT_PART_MATCHING, PartIndex
+from billing.tariff import STANDARD_TARIFF, TariffBook
+
+# Columns of the output Summary sheet, in sheet order
+SUMMARY_COLUMNS = [
+    "Order Date", "DU", "DU-Order", "CM Code.", "Sold To",
+    "Destination Code", "Ship To", "Address 1", "Address 2",
+    "Province", "Post Code", "Area", "Total Pick Q'TY",
+    "Ship Total WT", "Up 10KG/Chg", "Rate/KG", "Min/Charge",
+    "All Charge", "Pick Date", "Transport", "Premium",
+    "Remark", "Part No.", "Pick Q'TY", "Total Weight"
+]
+
+# Columns summarize returns after SUMMARY_COLUMNS: each order's FSC rate, how
+# each line's part was matched (see billing.parts) and the catalog part used
+EXTRA_COLUMNS = ['FSC Rate', 'Part Match', 'Matched Part']
+
+# Columns of order_rows: the order header and totals once per DU-Order
+ORDER_COLUMNS = [
+    "Order Date", "DU", "DU-Order", "CM Code.", "Sold To",
+    "Destination Code", "Ship To", "Address 1", "Address 2",
+    "Province", "Post Code", "Area", "Lines", "Total Pick Q'TY",
+    "Ship Total WT", "Up 10KG/Chg", "Rate/KG", "Min/Charge",
+    "All Charge", "FSC", "Total incl. FSC", "Pick Date", "Transport",
+    "Premium", "Remark"
+]
+
+# Amounts added up by order_pivot
+PIVOT_COLUMNS = ['Orders', 'Lines', "Total Pick Q'TY", 'Ship Total WT', 'All Charge', 'FSC', 'Total incl. FSC']
+
+# Order header fields copied from the first row of each DU-Order
+ORDER_FIELDS = {
+    'Order Date': 'Order Date',
+    'CM Code': 'CM Code.',
+    'Sold To': 'Sold To',
+    'CN Code': 'Destination Code',
+    'Ship To': 'Ship To',
+    'Address1': 'Address 1',
+    'Address2': 'Address 2',
+    'Province': 'Province',
+    'Post Code': 'Post Code',
+    'Remark': 'Remark',
+}
+
+
+def cargo_table(cargo_lookup):
+    """Turn the Part Number -> Weight lookup into a mergeable frame"""
+    return pd.DataFrame({
+        'Matched Part': pd.Series(list(cargo_lookup.keys()), dtype=object),
+        'Unit Weight': pd.Series(list(cargo_lookup.values()), dtype=float),
+    })
+
+
+def sell_table(sell_lookup):
+    """Turn the Post Code -> pricing lookup into a mergeable frame"""
+    return pd.DataFrame({
+        'Post Code Key': pd.Series(list(sell_lookup.keys()), dtype=object),
+        'Area': pd.Series([v['area'] for v in sell_lookup.values()], dtype=object),
+        'Min/Charge': pd.Series([v['min_charge'] for v in sell_lookup.values()], dtype=float),
+        'Rate/KG': pd.Series([v['rate_kg'] for v in sell_lookup.values()], dtype=float),
+    })
+
+
+def _category_keys(values, key_func):
+    """Apply key_func to the distinct values of a categorical only"""
+    keys = np.append(key_func(pd.Series(values.cat.categories)).to_numpy(dtype=object), '')
+    # code -1 (missing) picks the trailing ''
+    return pd.Series(keys[values.cat.codes.to_numpy()], index=values.index, dtype=object)
+
+
+def part_keys(part_numbers):
+    """Cargo lookup keys for a Part Number column ('' when missing)"""
+    if isinstance(part_numbers.dtype, pd.CategoricalDtype):
+        return _category_keys(part_numbers, part_keys)
+    return part_numbers.astype(object).map(str, na_action='ignore').fillna('')
+
+
+def _post_code_key(value):
+    try:
+        return str(int(value))
+    except (TypeError, ValueError, OverflowError):
+        return ''
+
+
+def post_code_keys(post_codes):
+    """Sell Price lookup keys for a Post Code column
+
+    The key is '' when the post code is missing or is not a number (e.g.
+    'N/A'), so the order shows as "Post Code Not Found".
+    """
+    if isinstance(post_codes.dtype, pd.CategoricalDtype):
+        return _category_keys(post_codes, post_code_keys)
+    if pd.api.types.is_numeric_dtype(post_codes):
+        present = post_codes.notna()
+        keys = pd.Series('', index=post_codes.index, dtype=object)
+        keys[present] = np.trunc(post_codes[present]).astype('int64').astype(str).astype(object)
+        return keys
+    return post_codes.astype(object).map(_post_code_key, na_action='ignore').fillna('')
+
+
+def summarize(temp_df, cargo_lookup, sell_lookup, tariffs=None, part_matching=None):
+    """Build the Summary rows (one per detail line) as a DataFrame
+
+    Orders are grouped by DU-Order. Each detail row repeats its order header
+    with Total Pick Q'TY, Ship Total WT, Up 10KG/Chg, All Charge and
+    Transport computed per order, exactly as the VBA macro does, or by the
+    matching tariff of a TariffBook. The FSC rate of each order's tariff is
+    returned in an extra 'FSC Rate' column, which is not written to the sheet.
+
+    Part Numbers are matched as part_matching says ('exact', 'normalized' or
+    'fuzzy', see billing.parts); cargo_lookup may also be a PartIndex built
+    once for several calls. 'Part Match' and 'Matched Part' tell how each
+    line's part was found.
+    """
+    if len(temp_df) == 0:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS + EXTRA_COLUMNS)
+    if tariffs is None:
+        tariffs = TariffBook.standard()
+    if isinstance(cargo_lookup, PartIndex):
+        part_index = cargo_lookup
+    else:
+        part_index = PartIndex(cargo_lookup, part_matching or DEFAULT_PART_MATCHING)
+
+    # Rows without a DU-Order never form a group
+    df = temp_df[temp_df['DU-Order'].notna()]
+    df = df.sort_values('DU-Order', kind='stable').reset_index(drop=True)
+
+    # Per-line weight from the cargo table, each distinct part matched once
+    part_no = part_keys(df['Part Number'])
+    codes, distinct_parts = pd.factorize(part_no)
+    matched, kinds = part_index.match_keys(distinct_parts)
+    detail = pd.DataFrame({
+        'DU-Order': df['DU-Order'],
+        'Part No.': part_no,
+        "Pick Q'TY": df['Pick QTY'].fillna(0),
+        'Matched Part': np.asarray(matched + [None], dtype=object)[codes],
+        'Part Match': np.asarray(kinds + [''], dtype=object)[codes],
+    })
+    detail = detail.merge(cargo_table(part_index.cargo_lookup), on='Matched Part', how='left')
+    part_found = detail['Unit Weight'].notna()
+    item_weight = detail["Pick Q'TY"] * detail['Unit Weight']
+
+    # Per-order totals
+    totals = pd.DataFrame({
+        "Total Pick Q'TY": df['Pick QTY'].groupby(df['DU-Order']).sum(),
+        'Ship Total WT': item_weight.where(part_found, 0).groupby(detail['DU-Order']).sum(),
+    })
+
+    # Order header from the first row of each group, priced from the sell table
+    first_rows = df.drop_duplicates('DU-Order', keep='first')
+    orders = first_rows[['DU-Order'] + list(ORDER_FIELDS)].rename(columns=ORDER_FIELDS)
+    # Only the post codes of first rows are priced
+    post_codes = first_rows['Post Code']
+    if isinstance(post_codes.dtype, pd.CategoricalDtype):
+        post_codes = post_codes.cat.remove_unused_categories()
+    orders['Post Code Key'] = post_code_keys(post_codes).values
+    orders = orders.merge(sell_table(sell_lookup), on='Post Code Key', how='left', indicator=True)
+    orders = orders.merge(totals, left_on='DU-Order', right_index=True, how='left')
+
+    post_code_found = orders['_merge'] == 'both'
+    orders['Area'] = orders['Area'].where(post_code_found, "Post Code Not Found")
+    orders['Min/Charge'] = orders['Min/Charge'].where(post_code_found, 0)
+    orders['Rate/KG'] = orders['Rate/KG'].where(post_code_found, 0)
+
+    # Charges from each order's tariff
+    for name, values in tariffs.price(orders).items():
+        orders[name] = values
+    orders['DU'] = ''
+    orders['Pick Date'] = ''
+    orders['Premium'] = ''
+
+    # Detail rows repeat their order header
+    detail['Total Weight'] = item_weight.astype(object).where(part_found, 'Part Not Found')
+    detail['Matched Part'] = detail['Matched Part'].where(part_found, '')
+    summary_df = detail[['DU-Order', 'Part No.', "Pick Q'TY", 'Total Weight', 'Part Match', 'Matched Part']].merge(
+        orders.drop(columns=['Post Code Key', '_merge']), on='DU-Order', how='left'
+    )
+    return summary_df[SUMMARY_COLUMNS + EXTRA_COLUMNS]
+
+
+def order_rows(summary_df, fsc_rate=STANDARD_TARIFF['fsc_rate']):
+    """One row per DU-Order of the Summary rows, with ORDER_COLUMNS
+
+    The Summary rows repeat each order's header and totals on every detail
+    line; here they are kept once, with the number of lines and the order's
+    FSC at its 'FSC Rate' (fsc_rate for summaries without one).
+    """
+    if len(summary_df) == 0:
+        return pd.DataFrame(columns=ORDER_COLUMNS)
+
+    lines = summary_df.groupby('DU-Order', sort=False, observed=True).size()
+    orders = summary_df.drop_duplicates('DU-Order', keep='first').reset_index(drop=True)
+    orders['Lines'] = lines.reindex(orders['DU-Order']).to_numpy()
+    for name in ("Total Pick Q'TY", 'Ship Total WT', 'All Charge'):
+        orders[name] = pd.to_numeric(orders[name]).fillna(0)
+    rates = orders['FSC Rate'].to_numpy(dtype=float) if 'FSC Rate' in orders else fsc_rate
+    orders['FSC'] = orders['All Charge'] * rates
+    orders['Total incl. FSC'] = orders['All Charge'] + orders['FSC']
+    return orders[ORDER_COLUMNS]
+
+
+def order_pivot(orders, keys):
+    """PIVOT_COLUMNS totals of order_rows by keys, sorted by keys"""
+    frame = orders[keys].astype(object).assign(Orders=1)
+    for name in PIVOT_COLUMNS[1:]:
+        frame[name] = pd.to_numeric(orders[name]).to_numpy()
+    frame = frame.groupby(keys, as_index=False, dropna=False)[PIVOT_COLUMNS].sum()
+    return frame.sort_values(keys).reset_index(drop=True)
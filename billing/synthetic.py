@@ -0,0 +1,72 @@
+"""Synthetic billing workbooks for benchmarks and local experiments"""
+
+import random
+
+import openpyxl
+
+from billing.ingest import FIRST_DATA_ROW
+
+PROVINCES = ['Bangkok', 'Nonthaburi', 'Chiang Mai', 'Khon Kaen', 'Songkhla', 'Chon Buri']
+
+
+def generate_workbook(path, days=31, rows_per_day=500, parts=2000, post_codes=300,
+                      lines_per_order=(1, 6), missing_rate=0.01, seed=0):
+    """Write a billing workbook shaped like the real month-end files
+
+    Day sheets 1..days hold rows_per_day data rows from row 9, grouped into
+    DU-Orders of lines_per_order lines. 'Cargo and Weight' lists parts part
+    numbers (a mix of numeric and text) and 'Sell Price' lists post_codes
+    post codes. About missing_rate of the lines use an unknown part or post
+    code so the 'Not Found' paths are exercised too. Returns the number of
+    data rows written.
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+
+    part_numbers = [100000 + i if i % 4 == 0 else f'P{i:06d}-{rng.choice("ABCD")}' for i in range(parts)]
+    codes = [10000 + i * 7 for i in range(post_codes)]
+
+    # Day sheets: 8 header rows, then data
+    order_no = 0
+    total_rows = 0
+    for day in range(1, days + 1):
+        sheet = wb.create_sheet(str(day))
+        sheet.append([f'Delivery day {day}'])
+        for _ in range(FIRST_DATA_ROW - 2):
+            sheet.append([])
+
+        written = 0
+        while written < rows_per_day:
+            order_no += 1
+            du = f'DU{order_no:07d}'
+            post_code = rng.choice(codes) if rng.random() >= missing_rate else 99999
+            customer = rng.randrange(max(post_codes // 3, 1))
+            lines = min(rng.randint(*lines_per_order), rows_per_day - written)
+            for _ in range(lines):
+                part = rng.choice(part_numbers) if rng.random() >= missing_rate else 'UNKNOWN-PART'
+                sheet.append([
+                    du, order_no, f'{du}-{order_no}', f'CM{customer:04d}', f'Customer {customer}',
+                    f'CN{customer:04d}', f'Shop {customer}', f'{customer} Main Road', 'Soi 1',
+                    rng.choice(PROVINCES), post_code, '02-000-0000', part,
+                    rng.randint(1, 24), None, 'Urgent' if rng.random() < 0.05 else None,
+                ])
+            written += lines
+        total_rows += written
+
+    # Cargo and Weight: headers on row 2, data from row 3
+    cargo = wb.create_sheet('Cargo and Weight')
+    cargo.append(['Cargo and Weight'])
+    cargo.append(['No', 'Product', 'Package', 'Unit', 'Weight_Actual'])
+    for idx, part in enumerate(part_numbers, start=1):
+        cargo.append([idx, part, 'CTN', 'PCS', round(rng.uniform(0.2, 12.0), 2)])
+
+    # Sell Price: headers on row 1, data from row 2
+    sell = wb.create_sheet('Sell Price')
+    sell.append(['PostCodeMain', 'ProvinceEng', 'Area', 'MinCharge', 'Sell price/kg'])
+    for idx, code in enumerate(codes):
+        area = 'BKK' if idx % 3 == 0 else rng.choice(['UPC', 'NE', 'SOUTH'])
+        sell.append([code, rng.choice(PROVINCES), area, rng.choice([120, 150, 180]), round(rng.uniform(3, 9), 2)])
+
+    wb.save(path)
+    return total_rows
+
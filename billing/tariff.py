@@ -0,0 +1,207 @@
+"""Configurable tariffs: charge threshold, weight bands, FSC rate and transport rules
+
+Tariffs are defined in a JSON file and chosen per order by customer and
+Order Date, e.g.
+
+    {
+      "customer_field": "Sold To",
+      "tariffs": [
+        {"name": "standard", "threshold_kg": 10, "fsc_rate": 0.1362,
+         "transport": {"BKK": "STL"}, "default_transport": "DASH"},
+        {"name": "acme-2025", "customer": "ACME", "valid_from": "2025-01-01",
+         "threshold_kg": 5, "bands": [{"above_kg": 100, "factor": 0.8}], "fsc_rate": 0.12}
+      ]
+    }
+
+An order is charged Min/Charge + Rate/KG x the weight above threshold_kg;
+weight above a band's above_kg is charged at factor x Rate/KG instead.
+The tariff book is compiled into arrays once, so pricing stays vectorized.
+"""
+
+from datetime import date
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Default tariff file used by the app and the CLI when present
+TARIFF_PATH = 'tariffs.json'
+
+# The rules of the original VBA macro
+STANDARD_TARIFF = {
+    'name': 'standard',
+    'threshold_kg': 10,
+    'bands': [],
+    'fsc_rate': 0.1362,
+    'transport': {'BKK': 'STL'},
+    'default_transport': 'DASH',
+}
+
+# Summary column matched against a tariff's customer (e.g. 'Sold To', 'CM Code.')
+CUSTOMER_FIELD = 'Sold To'
+
+
+def _parse_date(value, name, field):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Tariff '{name}': {field} must be a YYYY-MM-DD date, got {value!r}")
+
+
+def _normalize(tariff, position):
+    """Validated tariff dict with every field filled in"""
+    name = tariff.get('name') or f'tariff {position + 1}'
+    unknown = set(tariff) - {'name', 'customer', 'valid_from', 'valid_to', 'threshold_kg', 'bands',
+                             'fsc_rate', 'transport', 'default_transport'}
+    if unknown:
+        raise ValueError(f"Tariff '{name}': unknown field(s) {', '.join(sorted(unknown))}")
+
+    normalized = {
+        'name': name,
+        'customer': tariff.get('customer'),
+        'valid_from': _parse_date(tariff.get('valid_from'), name, 'valid_from'),
+        'valid_to': _parse_date(tariff.get('valid_to'), name, 'valid_to'),
+        'threshold_kg': float(tariff.get('threshold_kg', STANDARD_TARIFF['threshold_kg'])),
+        'fsc_rate': float(tariff.get('fsc_rate', STANDARD_TARIFF['fsc_rate'])),
+        'transport': dict(tariff.get('transport', STANDARD_TARIFF['transport'])),
+        'default_transport': tariff.get('default_transport', STANDARD_TARIFF['default_transport']),
+    }
+    bands = sorted(
+        ((float(band['above_kg']), float(band['factor'])) for band in tariff.get('bands', [])),
+        key=lambda band: band[0]
+    )
+    if any(above <= normalized['threshold_kg'] for above, _ in bands):
+        raise ValueError(f"Tariff '{name}': bands must start above threshold_kg")
+    normalized['bands'] = bands
+    return normalized
+
+
+class TariffBook:
+    """A set of tariffs, compiled into per-tariff arrays for vectorized pricing
+
+    For each order the matching tariff with the highest priority is used:
+    customer-specific tariffs before generic ones, then the latest
+    valid_from, then the last one in the file. Orders no tariff matches are
+    priced with STANDARD_TARIFF.
+    """
+
+    def __init__(self, tariffs, customer_field=CUSTOMER_FIELD):
+        self.customer_field = customer_field
+        self.tariffs = [_normalize(tariff, idx) for idx, tariff in enumerate(tariffs)]
+        self.tariffs.append(_normalize(STANDARD_TARIFF, len(self.tariffs)))
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('tariffs', []), config.get('customer_field', CUSTOMER_FIELD))
+
+    @classmethod
+    def standard(cls):
+        return cls([])
+
+    def _compile(self):
+        count = len(self.tariffs)
+        band_count = max(len(tariff['bands']) for tariff in self.tariffs)
+        self.threshold = np.array([tariff['threshold_kg'] for tariff in self.tariffs])
+        self.fsc_rate = np.array([tariff['fsc_rate'] for tariff in self.tariffs])
+
+        # Bands as marginal rate changes: above band_start the factor grows by band_delta
+        self.band_start = np.full((count, band_count), np.inf)
+        self.band_delta = np.zeros((count, band_count))
+        for idx, tariff in enumerate(self.tariffs):
+            factor = 1.0
+            for band_idx, (above, band_factor) in enumerate(tariff['bands']):
+                self.band_start[idx, band_idx] = above
+                self.band_delta[idx, band_idx] = band_factor - factor
+                factor = band_factor
+
+        # Tariffs to try, lowest priority first (the STANDARD_TARIFF fallback,
+        # last in the list, is the starting point for every order)
+        self.match_order = sorted(
+            range(count - 1),
+            key=lambda idx: (self.tariffs[idx]['customer'] is not None,
+                             self.tariffs[idx]['valid_from'] or date.min, idx)
+        )
+
+    @property
+    def fingerprint(self):
+        payload = json.dumps([self.customer_field, self.tariffs], default=str, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def resolve(self, customers, order_dates):
+        """Index into self.tariffs of the tariff for each order"""
+        index = np.full(len(customers), len(self.tariffs) - 1)
+        customers = np.asarray(customers, dtype=object)
+        order_dates = pd.to_datetime(pd.Series(np.asarray(order_dates, dtype=object)), errors='coerce')
+        for idx in self.match_order:
+            tariff = self.tariffs[idx]
+            mask = np.ones(len(index), dtype=bool)
+            if tariff['customer'] is not None:
+                mask &= customers == tariff['customer']
+            if tariff['valid_from'] is not None:
+                mask &= (order_dates >= pd.Timestamp(tariff['valid_from'])).to_numpy()
+            if tariff['valid_to'] is not None:
+                mask &= (order_dates <= pd.Timestamp(tariff['valid_to'])).to_numpy()
+            index[mask] = idx
+        return index
+
+    def price(self, orders):
+        """Charges of one row per order
+
+        orders needs 'Ship Total WT', 'Rate/KG', 'Min/Charge', 'Area', 'Order
+        Date' and the customer field. Returns {'Up 10KG/Chg', 'All Charge',
+        'Transport', 'FSC Rate'} arrays; Up 10KG/Chg is the weight above
+        the tariff's threshold. Raises ValueError when a tariff is per
+        customer and the orders have no customer field column.
+        """
+        if self.customer_field in orders:
+            customers = orders[self.customer_field]
+        elif any(tariff['customer'] is not None for tariff in self.tariffs):
+            raise ValueError(f"Tariff customer_field '{self.customer_field}' is not an order column "
+                             f"(e.g. 'Sold To' or 'CM Code.')")
+        else:
+            customers = pd.Series([None] * len(orders))
+        index = self.resolve(customers, orders['Order Date'])
+
+        total_weight = orders['Ship Total WT'].to_numpy(dtype=float)
+        threshold = self.threshold[index]
+        excess = np.where(total_weight > threshold, total_weight - threshold, 0)
+
+        charged_weight = excess
+        for band_idx in range(self.band_start.shape[1]):
+            start = self.band_start[index, band_idx]
+            charged_weight = charged_weight + self.band_delta[index, band_idx] * np.where(
+                total_weight > start, total_weight - start, 0
+            )
+
+        rate_kg = orders['Rate/KG'].to_numpy(dtype=float)
+        all_charge = charged_weight * rate_kg + orders['Min/Charge'].to_numpy(dtype=float)
+
+        areas = orders['Area'].astype(object).to_numpy()
+        transport = np.empty(len(orders), dtype=object)
+        for idx, tariff in enumerate(self.tariffs):
+            in_tariff = index == idx
+            if not in_tariff.any():
+                continue
+            transport[in_tariff] = tariff['default_transport']
+            for area, value in tariff['transport'].items():
+                transport[in_tariff & (areas == area)] = value
+
+        return {
+            'Up 10KG/Chg': excess,
+            'All Charge': all_charge,
+            'Transport': transport,
+            'FSC Rate': self.fsc_rate[index],
+        }
+
+
+def load_tariffs(path=None):
+    """TariffBook from a JSON file, or the standard tariff when path is None"""
+    if path is None:
+        return TariffBook.standard()
+    return TariffBook.from_file(path)
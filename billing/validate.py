@@ -0,0 +1,269 @@
+"""Pre-flight validation of a billing workbook, reported with sheet and row
+
+    python -m billing validate book.xlsm --period 2024-05
+
+The day sheets and reference sheets are scanned once with the readers a
+run uses (open_workbook, iter_day_batches) and post codes are keyed by the
+summary's rules, so a check sees the values a run would, takes a fraction
+of a full run and lets bad input be fixed before a long run.
+"""
+
+from collections import Counter
+import calendar
+import time
+
+from openpyxl.utils import get_column_letter
+
+from billing.ingest import ALL_DAYS, DAY_COLUMNS, FIRST_DATA_ROW, iter_day_batches, open_workbook
+from billing.parts import DEFAULT_PART_MATCHING, PartIndex
+from billing.summary import _post_code_key
+
+# Anomaly kinds and what they mean
+ANOMALY_KINDS = {
+    'missing_part': "Part Number not found in 'Cargo and Weight'",
+    'missing_part_number': "Part Number is empty",
+    'inexact_part': "Part Number only matched after normalizing or by the fallback",
+    'unknown_post_code': "Post Code not found in 'Sell Price'",
+    'malformed_post_code': "Post Code is not a number",
+    'bad_quantity': "Pick QTY is not a number",
+    'duplicate_order': "DU-Order also appears on another day",
+    'day_outside_month': "Day sheet for a day the month does not have",
+    'bad_weight': "Weight in 'Cargo and Weight' is not a number",
+    'bad_rate': "Min Charge or Rate/KG in 'Sell Price' is not a number",
+}
+
+# Anomalies listed per kind; the counts always cover all of them
+MAX_LOCATIONS = 1000
+
+# Column letter of each day sheet column, for anomaly locations
+DAY_COLUMN_LETTERS = {name: get_column_letter(idx) for idx, name in enumerate(DAY_COLUMNS, start=1)}
+
+REFERENCE_SHEETS = ['Cargo and Weight', 'Sell Price']
+
+
+def iter_day_rows(sheet):
+    """Yield (row number, {DAY_COLUMNS name: value}) as a run reads the day sheet"""
+    row_number = FIRST_DATA_ROW
+    for batch in iter_day_batches(sheet, None):
+        for values in zip(*(batch[name] for name in DAY_COLUMNS)):
+            yield row_number, dict(zip(DAY_COLUMNS, values))
+            row_number += 1
+
+
+def _count_rows(sheet):
+    """Rows a run would read from a day sheet"""
+    return sum(len(batch['DU']) for batch in iter_day_batches(sheet, None))
+
+
+def days_outside_month(file, month, year):
+    """{day: rows} of the day sheets for days the month does not have, when they hold rows
+
+    Runs never read these sheets (e.g. sheets 29..31 in February), so their
+    rows would be left out unnoticed. Only the manifest and these sheets are
+    looked at.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    wb = open_workbook(file, [str(day) for day in ALL_DAYS if day > days_in_month])
+    try:
+        rows = {int(name): _count_rows(wb[name]) for name in wb.sheetnames}
+    finally:
+        wb.close()
+    return {day: count for day, count in sorted(rows.items()) if count}
+
+
+def format_days_outside_month(days, month, year):
+    """One-line warning for days_outside_month, or '' when there are none"""
+    if not days:
+        return ''
+    sheets = ', '.join(f"'{day}' ({count} rows)" for day, count in days.items())
+    return (f"Day sheet(s) {sheets} are not in {calendar.month_name[month]} {year} "
+            f"({calendar.monthrange(year, month)[1]} days) and were not billed")
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+class _Report:
+    def __init__(self, max_locations):
+        self.max_locations = max_locations
+        self.counts = Counter()
+        self.anomalies = []
+
+    def add(self, kind, sheet, row=None, column=None, value=None, detail=None):
+        self.counts[kind] += 1
+        if self.counts[kind] <= self.max_locations:
+            self.anomalies.append({
+                'kind': kind,
+                'sheet': sheet,
+                'row': row,
+                'column': column,
+                'value': value if value is None or isinstance(value, (int, float, str)) else str(value),
+                'message': ANOMALY_KINDS[kind] + (f" ({detail})" if detail else ''),
+            })
+
+
+def _scan_cargo(sheet, report):
+    """{Part Number: weight} as read_cargo_lookup reads it"""
+    parts = {}
+    for row_number, values in enumerate(sheet.iter_rows(min_row=3, max_col=5, values_only=True), start=3):
+        part_num = values[1] if len(values) > 1 else None
+        if part_num is None:
+            break
+        weight = values[4] if len(values) > 4 else None
+        if weight is not None and weight != '' and not _is_number(weight):
+            report.add('bad_weight', 'Cargo and Weight', row_number, 'E', weight)
+        elif part_num and weight:
+            parts[str(part_num)] = float(weight)
+    return parts
+
+
+def _scan_sell(sheet, report):
+    """Post code keys as read_sell_lookup builds them"""
+    post_codes = set()
+    for row_number, values in enumerate(sheet.iter_rows(min_row=2, max_col=5, values_only=True), start=2):
+        post_code = values[0] if values else None
+        if post_code is None:
+            break
+        key = _post_code_key(post_code)
+        if not key:
+            report.add('malformed_post_code', 'Sell Price', row_number, 'A', post_code)
+            continue
+        for col_idx, column in ((3, 'D'), (4, 'E')):
+            value = values[col_idx] if len(values) > col_idx else None
+            if value and not _is_number(value):
+                report.add('bad_rate', 'Sell Price', row_number, column, value)
+        post_codes.add(key)
+    return post_codes
+
+
+def validate_workbook(file, month, year, reference_store=None, max_locations=MAX_LOCATIONS,
+                      part_matching=DEFAULT_PART_MATCHING):
+    """Check a workbook for one month before running it
+
+    Returns {'month', 'year', 'days', 'rows', 'seconds', 'counts': {kind: n},
+    'anomalies': [{'kind', 'sheet', 'row', 'column', 'value', 'message'}]},
+    with at most max_locations anomalies listed per kind. Parts and post
+    codes are checked against the workbook's reference sheets, or against
+    reference_store when the workbook has none, with part_matching as a run
+    would match them (parts matched other than exactly are reported too).
+    """
+    started = time.perf_counter()
+    report = _Report(max_locations)
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    wb = open_workbook(file, [str(day) for day in ALL_DAYS] + REFERENCE_SHEETS)
+    try:
+        # Reference sheets first, so the day rows can be checked against them
+        if all(name in wb.sheetnames for name in REFERENCE_SHEETS):
+            parts = _scan_cargo(wb['Cargo and Weight'], report)
+            post_codes = _scan_sell(wb['Sell Price'], report)
+        elif reference_store is not None and reference_store.exists():
+            parts, sell_lookup = reference_store.load()
+            post_codes = set(sell_lookup)
+        else:
+            parts = post_codes = None
+        part_index = PartIndex(parts, part_matching) if parts is not None else None
+        part_matches = {}
+
+        first_seen = {}
+        row_count = 0
+        days = []
+        for day in ALL_DAYS:
+            sheet_name = str(day)
+            if sheet_name not in wb.sheetnames:
+                continue
+
+            if day > days_in_month:
+                extra = _count_rows(wb[sheet_name])
+                if extra:
+                    report.add('day_outside_month', sheet_name,
+                               detail=f"{extra} row(s); {calendar.month_name[month]} {year} has {days_in_month} days")
+                continue
+
+            days.append(day)
+            reported_orders = set()
+            for row_number, values in iter_day_rows(wb[sheet_name]):
+                row_count += 1
+
+                du_order = values['DU-Order']
+                if du_order is not None:
+                    seen = first_seen.setdefault(du_order, (day, row_number))
+                    if seen[0] != day and du_order not in reported_orders:
+                        reported_orders.add(du_order)
+                        report.add('duplicate_order', sheet_name, row_number, DAY_COLUMN_LETTERS['DU-Order'],
+                                   du_order, f"first on day {seen[0]}, row {seen[1]}")
+
+                post_code = values['Post Code']
+                if post_code is not None:
+                    key = _post_code_key(post_code)
+                    if not key:
+                        report.add('malformed_post_code', sheet_name, row_number, DAY_COLUMN_LETTERS['Post Code'],
+                                   post_code)
+                    elif post_codes is not None and key not in post_codes:
+                        report.add('unknown_post_code', sheet_name, row_number, DAY_COLUMN_LETTERS['Post Code'],
+                                   post_code)
+
+                part_num = values['Part Number']
+                if part_num is None or part_num == '':
+                    report.add('missing_part_number', sheet_name, row_number, DAY_COLUMN_LETTERS['Part Number'])
+                elif part_index is not None:
+                    key = str(part_num)
+                    if key not in part_matches:
+                        part_matches[key] = part_index.match(key)
+                    matched, kind = part_matches[key]
+                    if matched is None:
+                        report.add('missing_part', sheet_name, row_number, DAY_COLUMN_LETTERS['Part Number'],
+                                   part_num)
+                    elif kind != 'exact':
+                        report.add('inexact_part', sheet_name, row_number, DAY_COLUMN_LETTERS['Part Number'],
+                                   part_num, f"{kind} match: {matched}")
+
+                quantity = values['Pick QTY']
+                if quantity is not None and not _is_number(quantity):
+                    report.add('bad_quantity', sheet_name, row_number, DAY_COLUMN_LETTERS['Pick QTY'], quantity)
+    finally:
+        wb.close()
+
+    return {
+        'month': month,
+        'year': year,
+        'days': days,
+        'rows': row_count,
+        'reference_checked': parts is not None,
+        'seconds': round(time.perf_counter() - started, 3),
+        'counts': dict(report.counts),
+        'anomalies': report.anomalies,
+    }
+
+
+def format_validation(result, limit=20):
+    """Short text report: counts per kind and the first locations"""
+    period = f"{calendar.month_name[result['month']]} {result['year']}"
+    lines = [f"🔍 {result['rows']} rows on {len(result['days'])} day sheet(s) for {period} "
+             f"checked in {result['seconds']}s"]
+    if not result['reference_checked']:
+        lines.append("   ⚠️ No reference sheets or store: parts and post codes were not looked up")
+    if not result['counts']:
+        lines.append("   ✅ No problems found")
+        return '\n'.join(lines)
+
+    for kind, count in result['counts'].items():
+        lines.append(f"   ❌ {count} x {ANOMALY_KINDS[kind]}")
+    for anomaly in result['anomalies'][:limit]:
+        location = anomaly['sheet'] if anomaly['row'] is None else f"{anomaly['sheet']}!{anomaly['column']}{anomaly['row']}"
+        value = '' if anomaly['value'] is None else f" {anomaly['value']!r}"
+        lines.append(f"      {location}:{value} {anomaly['message']}")
+    if len(result['anomalies']) > limit:
+        lines.append(f"      ... {len(result['anomalies']) - limit} more")
+    return '\n'.join(lines)
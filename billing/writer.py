@@ -0,0 +1,302 @@
+"""Streaming writer for the Summary output workbook
+
+Two layouts are written: 'flat', the single Summary sheet of the VBA macro
+(every detail line repeats its order), and 'normalized', with one row per
+DU-Order on an Orders sheet, the lines on a Detail sheet and By Day /
+By Area totals, all built from one order_rows pass.
+
+The two grand totals differ on purpose: the flat footer sums the All Charge
+column as the macro did, so an order's charge counts once per detail line,
+while the normalized sheets count every order once. Both are labelled.
+"""
+
+from io import BytesIO
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from billing.parts import FALLBACK_KINDS
+from billing.summary import PIVOT_COLUMNS, SUMMARY_COLUMNS, order_pivot, order_rows
+from billing.tariff import STANDARD_TARIFF
+
+# Column widths of the Summary sheet (A..Y)
+COLUMN_WIDTHS = [12, 3, 17, 10, 24, 16, 28, 13, 13, 9, 10, 9, 15, 13, 14, 9, 13, 15, 14, 9, 9, 18, 16, 10, 12]
+
+# Columns shown as #,##0.00 when they hold a number
+NUMBER_COLUMNS = ["Total Pick Q'TY", 'Ship Total WT', 'Up 10KG/Chg', 'All Charge', "Pick Q'TY", 'Total Weight']
+
+NUMBER_FORMAT = '#,##0.00'
+
+# Extra last column, written only when some part was not matched exactly
+PART_MATCH_HEADER = 'Part Match'
+PART_MATCH_WIDTH = 30
+
+# Fuel surcharge factor of the standard tariff
+FSC_RATE = STANDARD_TARIFF['fsc_rate']
+
+# Output layouts
+LAYOUTS = ('flat', 'normalized')
+DEFAULT_LAYOUT = 'flat'
+
+# Normalized layout: columns of the Detail sheet, amounts shown as numbers
+# and totalled, and column widths by name (others get DEFAULT_WIDTH)
+DETAIL_COLUMNS = ['DU-Order', 'Part No.', "Pick Q'TY", 'Total Weight']
+ORDER_NUMBER_COLUMNS = ["Total Pick Q'TY", 'Ship Total WT', 'Up 10KG/Chg', 'Rate/KG', 'Min/Charge', 'All Charge',
+                        'FSC', 'Total incl. FSC']
+ORDER_TOTAL_COLUMNS = ['Lines', "Total Pick Q'TY", 'Ship Total WT', 'All Charge', 'FSC', 'Total incl. FSC']
+SHEET_WIDTHS = dict(zip(SUMMARY_COLUMNS, COLUMN_WIDTHS), **{
+    'DU': 6, 'Lines': 8, 'Orders': 9, 'FSC': 13, 'Total incl. FSC': 15, PART_MATCH_HEADER: PART_MATCH_WIDTH,
+})
+DEFAULT_WIDTH = 15
+
+# Labels of the grand totals, which count orders differently (see above)
+FLAT_TOTAL_LABEL = 'Sum of lines'
+ORDER_TOTAL_LABEL = 'Total (each order once)'
+
+
+def _named_styles():
+    """Shared named styles used by every cell of the Summary sheet"""
+    header = NamedStyle(name='summary_header')
+    header.font = Font(bold=True)
+    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+
+    number = NamedStyle(name='summary_number')
+    number.number_format = NUMBER_FORMAT
+
+    total = NamedStyle(name='summary_total')
+    total.number_format = NUMBER_FORMAT
+    total.font = Font(bold=True)
+    total.alignment = Alignment(horizontal='center')
+
+    grand_total = NamedStyle(name='summary_grand_total')
+    grand_total.number_format = NUMBER_FORMAT
+    grand_total.font = Font(bold=True)
+    grand_total.alignment = Alignment(horizontal='center')
+    grand_total.fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+
+    label = NamedStyle(name='summary_label')
+    label.alignment = Alignment(horizontal='center')
+
+    # Lines weighed with a fallback part match, to be checked
+    flag = NamedStyle(name='summary_flag')
+    flag.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
+
+    return [header, number, total, grand_total, label, flag]
+
+
+def _styled(sheet, value, style):
+    cell = WriteOnlyCell(sheet, value)
+    cell.style = style
+    return cell
+
+
+def _cell_value(value):
+    """Convert pandas/numpy scalars to plain Python values for openpyxl"""
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _footer_rows(sheet, last_data_row, fsc_rate):
+    """Rows of the SUM/FSC footer, starting right after the last data row"""
+    total_row = last_data_row + 4
+    fsc_row = last_data_row + 7
+
+    def row(values):
+        # values: {column index (1-based): cell}
+        return [values.get(col_idx) for col_idx in range(1, max(values) + 1)]
+
+    return [
+        [],
+        [],
+        [],
+        row({
+            12: _styled(sheet, FLAT_TOTAL_LABEL, 'summary_label'),
+            13: _styled(sheet, f'=SUM(M2:M{last_data_row})', 'summary_total'),
+            14: _styled(sheet, f'=SUM(N2:N{last_data_row})', 'summary_total'),
+            18: _styled(sheet, f'=SUM(R2:R{last_data_row})', 'summary_total'),
+        }),
+        row({
+            13: _styled(sheet, 'CTN', 'summary_label'),
+            14: _styled(sheet, 'KG', 'summary_label'),
+            18: _styled(sheet, 'BATH', 'summary_label'),
+        }),
+        [],
+        row({
+            13: _styled(sheet, 'Fuel surcharge (FSC)', 'summary_total'),
+            14: _styled(sheet, f'=R{total_row}*{fsc_rate}', 'summary_total'),
+            18: _styled(sheet, f'=R{total_row}+N{fsc_row}', 'summary_grand_total'),
+        }),
+        row({
+            13: _styled(sheet, None, 'summary_label'),
+            14: _styled(sheet, 'BATH', 'summary_label'),
+            18: _styled(sheet, 'BATH', 'summary_label'),
+        }),
+    ]
+
+
+def footer_fsc_rate(summary_df):
+    """FSC rate for the footer formula, from the 'FSC Rate' column
+
+    When orders fall under tariffs with different FSC rates, the rate is the
+    All Charge weighted average, so the footer still shows their total FSC.
+    """
+    if 'FSC Rate' not in summary_df or len(summary_df) == 0:
+        return FSC_RATE
+    rates = summary_df['FSC Rate'].to_numpy(dtype=float)
+    if (rates == rates[0]).all():
+        return float(rates[0])
+    charges = summary_df['All Charge'].to_numpy(dtype=float)
+    if charges.sum() == 0:
+        return float(rates[0])
+    return round(float((charges * rates).sum() / charges.sum()), 10)
+
+
+def _part_match_notes(summary_df):
+    """'Part Match' cell per row ('kind: matched part' unless exact), or None if all are exact"""
+    if 'Part Match' not in summary_df:
+        return None
+    kinds = summary_df['Part Match'].astype(object).fillna('')
+    inexact = (kinds != 'exact') & (kinds != '')
+    if not inexact.any():
+        return None
+    notes = (kinds + ': ' + summary_df['Matched Part'].astype(object).fillna('').map(str)).where(inexact, None)
+    return list(zip(notes, kinds.isin(FALLBACK_KINDS)))
+
+
+def _write_table(sheet, frame, number_columns=(), total_columns=(), total_label=None, widths=SHEET_WIDTHS,
+                 flagged=None):
+    """Stream a DataFrame to a write-only sheet: header row, data rows and a totals row
+
+    Numbers in number_columns get the number style. With total_label a row
+    of SUM formulas over total_columns follows, labelled in the first
+    column. flagged, one bool per row, highlights the last cell of a row.
+    """
+    columns = list(frame.columns)
+    for col_idx, name in enumerate(columns, start=1):
+        sheet.column_dimensions[get_column_letter(col_idx)].width = widths.get(name, DEFAULT_WIDTH)
+    sheet.freeze_panes = 'A2'
+    sheet.append([_styled(sheet, name, 'summary_header') for name in columns])
+
+    number_cols = {col_idx for col_idx, name in enumerate(columns) if name in number_columns}
+    for row_idx, values in enumerate(frame.itertuples(index=False, name=None)):
+        row = []
+        for col_idx, value in enumerate(values):
+            value = _cell_value(value)
+            if col_idx in number_cols and isinstance(value, (int, float)):
+                value = _styled(sheet, value, 'summary_number')
+            row.append(value)
+        if flagged is not None and flagged[row_idx]:
+            row[-1] = _styled(sheet, row[-1], 'summary_flag')
+        sheet.append(row)
+
+    if total_label is not None and len(frame) > 0:
+        last_row = len(frame) + 1
+        row = []
+        for col_idx, name in enumerate(columns, start=1):
+            if name in total_columns:
+                letter = get_column_letter(col_idx)
+                style = 'summary_grand_total' if name == 'Total incl. FSC' else 'summary_total'
+                row.append(_styled(sheet, f'=SUM({letter}2:{letter}{last_row})', style))
+            elif col_idx == 1:
+                row.append(_styled(sheet, total_label, 'summary_total'))
+            else:
+                row.append(None)
+        sheet.append(row)
+
+
+def _write_flat(output_wb, summary_df, fsc_rate):
+    """The Summary sheet of the VBA macro, with its SUM/FSC footer"""
+    if fsc_rate is None:
+        fsc_rate = footer_fsc_rate(summary_df)
+    summary_sheet = output_wb.create_sheet("Summary")
+
+    part_match_notes = _part_match_notes(summary_df)
+    widths = COLUMN_WIDTHS + ([PART_MATCH_WIDTH] if part_match_notes is not None else [])
+
+    # Layout has to be set before the first row is streamed
+    for col_idx, width in enumerate(widths, start=1):
+        summary_sheet.column_dimensions[get_column_letter(col_idx)].width = width
+    summary_sheet.row_dimensions[1].height = 35
+    summary_sheet.freeze_panes = 'A2'
+
+    # Headers
+    headers = SUMMARY_COLUMNS + ([PART_MATCH_HEADER] if part_match_notes is not None else [])
+    summary_sheet.append([_styled(summary_sheet, header, 'summary_header') for header in headers])
+
+    # Data
+    number_cols = {SUMMARY_COLUMNS.index(name) for name in NUMBER_COLUMNS}
+    frame = summary_df.reindex(columns=SUMMARY_COLUMNS)
+    row_count = 0
+    for values in frame.itertuples(index=False, name=None):
+        row = []
+        for col_idx, value in enumerate(values):
+            value = _cell_value(value)
+            if col_idx in number_cols and isinstance(value, (int, float)):
+                value = _styled(summary_sheet, value, 'summary_number')
+            row.append(value)
+        if part_match_notes is not None:
+            note, fallback = part_match_notes[row_count]
+            row.append(_styled(summary_sheet, note, 'summary_flag') if fallback else note)
+        summary_sheet.append(row)
+        row_count += 1
+
+    # Summary formulas at bottom
+    if row_count > 0:
+        for row in _footer_rows(summary_sheet, row_count + 1, fsc_rate):
+            summary_sheet.append(row)
+
+
+def _write_normalized(output_wb, summary_df, fsc_rate):
+    """Orders, Detail, By Day and By Area sheets from one order_rows pass"""
+    orders = order_rows(summary_df, FSC_RATE if fsc_rate is None else fsc_rate)
+    _write_table(output_wb.create_sheet('Orders'), orders, ORDER_NUMBER_COLUMNS, ORDER_TOTAL_COLUMNS,
+                 ORDER_TOTAL_LABEL)
+
+    detail = summary_df.reindex(columns=DETAIL_COLUMNS)
+    part_match_notes = _part_match_notes(summary_df)
+    flagged = None
+    if part_match_notes is not None:
+        detail[PART_MATCH_HEADER] = [note for note, _ in part_match_notes]
+        flagged = [fallback for _, fallback in part_match_notes]
+    _write_table(output_wb.create_sheet('Detail'), detail, ["Pick Q'TY", 'Total Weight'], flagged=flagged)
+
+    amounts = PIVOT_COLUMNS[2:]
+    _write_table(output_wb.create_sheet('By Day'), order_pivot(orders, ['Order Date']), amounts, PIVOT_COLUMNS,
+                 ORDER_TOTAL_LABEL)
+    _write_table(output_wb.create_sheet('By Area'), order_pivot(orders, ['Area', 'Transport']), amounts,
+                 PIVOT_COLUMNS, ORDER_TOTAL_LABEL)
+
+
+def write_summary(summary_df, fsc_rate=None, output=None, layout=DEFAULT_LAYOUT):
+    """Write the output workbook in write-only mode and return it as BytesIO
+
+    Rows are streamed straight to the file, so memory stays bounded and time
+    is linear in the row count. Every styled cell shares a named style.
+    layout is 'flat' (the Summary sheet) or 'normalized' (Orders, Detail,
+    By Day and By Area sheets; see the module docstring). fsc_rate defaults
+    to the rate of the tariffs the orders were priced with. When a Part
+    Number was matched other than exactly, a last 'Part Match' column names
+    the catalog part used; fallback matches are highlighted.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown output layout '{layout}', expected one of {', '.join(LAYOUTS)}")
+    output_wb = openpyxl.Workbook(write_only=True)
+    for style in _named_styles():
+        output_wb.add_named_style(style)
+
+    if layout == 'flat':
+        _write_flat(output_wb, summary_df, fsc_rate)
+    else:
+        _write_normalized(output_wb, summary_df, fsc_rate)
+
+    if output is None:
+        output = BytesIO()
+    output_wb.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,15 @@
+"""Shared fixtures: small synthetic billing workbooks"""
+
+import pytest
+
+from billing.synthetic import generate_workbook
+
+MONTH, YEAR = 1, 2024
+
+
+@pytest.fixture(scope='session')
+def workbook_path(tmp_path_factory):
+    """Three day sheets of about 60 lines, with unknown parts and post codes mixed in"""
+    path = tmp_path_factory.mktemp('workbooks') / 'month.xlsx'
+    generate_workbook(path, days=3, rows_per_day=60, parts=40, post_codes=12, missing_rate=0.1, seed=7)
+    return path
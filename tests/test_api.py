@@ -0,0 +1,111 @@
+"""HTTP API round trip on a server bound to a free local port"""
+
+from io import BytesIO
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+import openpyxl
+import pytest
+
+from billing import make_server
+
+from conftest import MONTH, YEAR
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _json(response):
+    return json.loads(response.read().decode('utf-8'))
+
+
+def test_submit_and_fetch_result(server, workbook_path):
+    with urlopen(f'{server}/health') as response:
+        assert _json(response)['status'] == 'ok'
+
+    request = Request(f'{server}/jobs?month={MONTH}&year={YEAR}&name=month.xlsx',
+                      data=workbook_path.read_bytes(), method='POST')
+    with urlopen(request) as response:
+        assert response.status == 202
+        job = _json(response)
+    assert response.headers['Location'] == f"/jobs/{job['id']}"
+
+    with urlopen(f"{server}{job['result_url']}?wait=60") as response:
+        assert response.status == 200
+        assert response.headers['Content-Disposition'] == 'attachment; filename="month_Summary_Billing_January_2024.xlsx"'
+        records = int(response.headers['X-Billing-Records'])
+        body = response.read()
+
+    sheet = openpyxl.load_workbook(BytesIO(body))['Summary']
+    assert records > 0
+    assert sheet.cell(records + 1, 3).value is not None and sheet.cell(records + 2, 3).value is None
+
+    with urlopen(f"{server}/jobs/{job['id']}") as response:
+        status = _json(response)
+    assert status['status'] == 'done' and status['records'] == records
+
+    # A finished job can no longer be cancelled
+    with pytest.raises(HTTPError) as error:
+        urlopen(Request(f"{server}/jobs/{job['id']}", method='DELETE'))
+    assert error.value.code == 409
+
+
+def test_bad_requests(server):
+    with pytest.raises(HTTPError) as error:
+        urlopen(Request(f'{server}/jobs?month=13&year={YEAR}', data=b'PK', method='POST'))
+    assert error.value.code == 400
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(f'{server}/jobs/unknown')
+    assert error.value.code == 404
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(Request(f'{server}/jobs/unknown', method='DELETE'))
+    assert error.value.code == 404
+
+
+def _result_headers(server, request):
+    with urlopen(request) as response:
+        job = _json(response)
+    with urlopen(f"{server}{job['result_url']}?wait=60") as response:
+        response.read()
+        return response.headers
+
+
+@pytest.mark.parametrize('name, header', [
+    ('ใช้ไฟล์.xlsm', "attachment; filename=\"_Summary_Billing_January_2024.xlsx\"; "
+                    "filename*=UTF-8''%E0%B9%83%E0%B8%8A%E0%B9%89%E0%B9%84%E0%B8%9F%E0%B8%A5%E0%B9%8C"
+                    "_Summary_Billing_January_2024.xlsx"),
+    ('a\r\nX-Injected: 1.xlsx', 'attachment; filename="aX-Injected: 1_Summary_Billing_January_2024.xlsx"'),
+])
+def test_result_file_names(server, workbook_path, name, header):
+    url = f'{server}/jobs?month={MONTH}&year={YEAR}&name={quote(name)}'
+    headers = _result_headers(server, Request(url, data=workbook_path.read_bytes(), method='POST'))
+    assert headers['Content-Disposition'] == header
+    assert headers['X-Injected'] is None
+
+
+def test_multipart_file_name(server, workbook_path):
+    boundary = 'billing-test-boundary'
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="month"\r\n\r\n{MONTH}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="year"\r\n\r\n{YEAR}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="C:\\\\in\\\\bad\x01.xlsx"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode(),
+        workbook_path.read_bytes(),
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    request = Request(f'{server}/jobs', data=body, method='POST',
+                      headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    headers = _result_headers(server, request)
+    assert headers['Content-Disposition'] == 'attachment; filename="bad_Summary_Billing_January_2024.xlsx"'
@@ -0,0 +1,28 @@
+"""Large-file mode: the memory ceiling and the metrics of the child process"""
+
+import openpyxl
+import pytest
+
+from billing import RunMetrics, run_billing, run_bounded
+from billing.bounded import MemoryLimitExceeded
+
+from conftest import MONTH, YEAR
+
+
+def test_small_ceiling_stops_the_run(workbook_path):
+    with pytest.raises(MemoryLimitExceeded) as error:
+        run_bounded(workbook_path, MONTH, YEAR, memory_limit_mb=20)
+    assert error.value.limit_bytes == 20_000_000
+
+
+def test_child_metrics_and_profile(workbook_path):
+    metrics = RunMetrics(profile=True)
+    output, record_count, peak = run_bounded(workbook_path.read_bytes(), MONTH, YEAR, metrics=metrics)
+
+    expected = openpyxl.load_workbook(run_billing(workbook_path, MONTH, YEAR)[0])['Summary']
+    assert list(openpyxl.load_workbook(output)['Summary'].iter_rows(values_only=True)) == list(
+        expected.iter_rows(values_only=True))
+    assert record_count > 0 and peak
+    assert {'extract', 'summarize', 'write'} <= {record['phase'] for record in metrics.phases}
+    assert metrics.instrumented
+    assert 'summarize' in metrics.profile_text()
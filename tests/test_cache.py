@@ -0,0 +1,64 @@
+"""Cached results follow the reference store they were priced from"""
+
+import openpyxl
+
+from billing import ReferenceStore, ResultCache, pipeline, run_billing
+from billing.cache import content_key
+from billing.ingest import extract_days
+
+from conftest import MONTH, YEAR
+
+
+def _day_only_workbook(path):
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = '1'
+    for col, value in {1: 'DU1', 2: 1, 3: 'DU1-1', 11: 10100, 13: 'P1', 14: 1}.items():
+        sheet.cell(9, col, value)
+    wb.save(path)
+
+
+def _all_charge(output):
+    sheet = openpyxl.load_workbook(output)['Summary']
+    headers = [cell.value for cell in sheet[1]]
+    return sheet.cell(2, headers.index('All Charge') + 1).value
+
+
+def test_recompiled_store_is_not_served_from_cache(tmp_path):
+    _day_only_workbook(tmp_path / 'days.xlsx')
+    store = ReferenceStore(tmp_path / 'reference.sqlite')
+    cache = ResultCache(tmp_path / 'cache')
+
+    store.save({'P1': 5.0}, {'10100': {'area': 'BKK', 'min_charge': 200, 'rate_kg': 1}})
+    assert _all_charge(run_billing(tmp_path / 'days.xlsx', MONTH, YEAR, cache=cache, reference_store=store)[0]) == 200
+
+    store.save({'P1': 5.0}, {'10100': {'area': 'BKK', 'min_charge': 999, 'rate_kg': 1}})
+    assert _all_charge(run_billing(tmp_path / 'days.xlsx', MONTH, YEAR, cache=cache, reference_store=store)[0]) == 999
+    # Another month reuses the parsed workbook, with the lookups rebuilt
+    assert _all_charge(run_billing(tmp_path / 'days.xlsx', 3, YEAR, cache=cache, reference_store=store)[0]) == 999
+
+
+def _rows(output):
+    return list(openpyxl.load_workbook(output)['Summary'].iter_rows(values_only=True))
+
+
+def test_cached_workbook_grows_by_month(workbook_path, tmp_path, monkeypatch):
+    extracted = []
+
+    def recording_extract(wb, days, on_day=None):
+        extracted.append(list(days))
+        return extract_days(wb, days, on_day)
+
+    monkeypatch.setattr(pipeline, 'extract_days', recording_extract)
+    cache = ResultCache(tmp_path / 'cache')
+
+    run_billing(workbook_path, 2, 2024, cache=cache)
+    assert extracted == [list(range(1, 30))]
+    # January needs only the day sheets February does not have
+    january, _ = run_billing(workbook_path, 1, 2024, cache=cache)
+    assert extracted[1:] == [[30, 31]]
+    assert cache.get_workbook(content_key(str(workbook_path)))['parsed_days'] == list(range(1, 32))
+    # Every day sheet is cached now
+    run_billing(workbook_path, 3, 2024, cache=cache, layout='normalized')
+    assert len(extracted) == 2
+    assert _rows(january) == _rows(run_billing(workbook_path, 1, 2024)[0])
@@ -0,0 +1,64 @@
+"""Batch runs from the command line, served from the result cache until an input changes"""
+
+import json
+import shutil
+
+import openpyxl
+
+from billing import ReferenceStore, pipeline
+from billing.cli import main
+
+from conftest import MONTH, YEAR
+
+
+def _charges(path):
+    sheet = openpyxl.load_workbook(path)['Summary']
+    headers = [cell.value for cell in sheet[1]]
+    col_idx = headers.index('All Charge')
+    return [row[col_idx] for row in sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def test_run_uses_and_invalidates_cache(workbook_path, tmp_path, monkeypatch):
+    parsed = []
+
+    def recording_cached_month(cache, key, file, *args, **kwargs):
+        parsed.append(file)
+        return cached_month(cache, key, file, *args, **kwargs)
+
+    cached_month = pipeline.cached_month
+    monkeypatch.setattr(pipeline, 'cached_month', recording_cached_month)
+    workbook = tmp_path / 'book.xlsx'
+    shutil.copy(workbook_path, workbook)
+    store_path = tmp_path / 'reference.sqlite'
+    assert main(['compile-reference', str(workbook), '--store', str(store_path)]) == 0
+
+    def run():
+        return main(['run', str(workbook), '-p', f'{YEAR}-{MONTH:02d}', '-o', str(tmp_path / 'out'), '-j', '1',
+                     '--cache-dir', str(tmp_path / 'cache'), '--reference-store', str(store_path)])
+
+    assert run() == 0
+    report = json.loads((tmp_path / 'out' / 'run_report.json').read_text())
+    assert (report['succeeded'], report['failed']) == (1, 0)
+    entry = report['jobs'][0]
+    assert entry['output'].endswith('book_Summary_Billing_January_2024.xlsx') and entry['records'] > 0
+    first = _charges(entry['output'])
+    assert len(parsed) == 1
+
+    # Same workbook and store: the summary comes from the cache
+    assert run() == 0
+    assert len(parsed) == 1 and _charges(entry['output']) == first
+
+    # A recompiled store is a cache miss; the workbook's own reference sheets still price it
+    cargo_lookup, sell_lookup = ReferenceStore(store_path).load()
+    ReferenceStore(store_path).save(cargo_lookup, {
+        code: dict(sell, min_charge=sell['min_charge'] + 1000) for code, sell in sell_lookup.items()
+    })
+    assert run() == 0
+    assert len(parsed) == 2 and _charges(entry['output']) == first
+
+    # Changed workbook content is a new cache key
+    wb = openpyxl.load_workbook(workbook)
+    wb['1']['A1'] = 'edited'
+    wb.save(workbook)
+    assert run() == 0
+    assert len(parsed) == 3
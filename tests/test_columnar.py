@@ -0,0 +1,48 @@
+"""Parquet/Arrow round trips and from-columnar output names"""
+
+import openpyxl
+import pandas as pd
+
+from billing.cli import main
+from billing.columnar import read_detail, write_detail
+
+from conftest import MONTH, YEAR
+
+
+def _typed(values):
+    return [(value, type(value)) for value in values]
+
+
+def test_mixed_columns_keep_their_types(tmp_path):
+    post_codes = [10110, '10110', 'AB-1', None, 10110, 10500.0]
+    frame = pd.DataFrame({
+        'Post Code': pd.Categorical(post_codes),
+        'Part Number': pd.Series([12345, 'P-1', 2.5, None, '12345', 7], dtype=object),
+        "Pick Q'TY": [1, 2, 3, 4, 5, 6],
+    })
+    for name in ('detail.parquet', 'detail.arrow'):
+        write_detail(frame, tmp_path / name, MONTH, YEAR)
+        restored, info = read_detail(tmp_path / name)
+        assert list(restored.columns) == list(frame.columns)
+        assert info['month'] == MONTH
+        assert _typed(restored['Post Code'].tolist()[:3]) == _typed(post_codes[:3])
+        assert _typed(restored['Post Code'].tolist()[4:]) == _typed(post_codes[4:])
+        assert pd.isna(restored['Post Code'][3])
+        values = restored['Part Number'].tolist()
+        assert _typed(values[:3] + values[4:]) == [
+            (12345, int), ('P-1', str), (2.5, float), ('12345', str), (7, int)]
+
+
+def test_from_columnar_names_outputs_by_input_kind(workbook_path, tmp_path):
+    columnar = tmp_path / 'columnar'
+    assert main(['run', str(workbook_path), '--period', f'{YEAR}-{MONTH:02d}', '-o', str(columnar), '-j', '1',
+                 '--columnar', 'parquet']) == 0
+    inputs = sorted(str(path) for path in columnar.glob('*.parquet'))
+    assert len(inputs) == 2
+
+    output = tmp_path / 'summaries'
+    assert main(['from-columnar', *inputs, '--reference-workbook', str(workbook_path), '-o', str(output)]) == 0
+    names = sorted(path.name for path in output.iterdir())
+    assert names == ['month_Summary_Billing_January_2024.xlsx', 'month_Summary_Billing_Repriced_January_2024.xlsx']
+    rows = [list(openpyxl.load_workbook(output / name)['Summary'].iter_rows(values_only=True)) for name in names]
+    assert rows[0] == rows[1]
@@ -0,0 +1,45 @@
+"""Rollups count each order once and add inputs of the same period together"""
+
+import openpyxl
+import pytest
+
+from billing import consolidate, write_consolidation, write_summary_columnar
+from billing.ingest import month_days
+from billing.pipeline import month_frames, parse_workbook
+from billing.summary import order_rows
+from billing.writer import FSC_RATE
+
+from conftest import MONTH, YEAR
+
+
+def test_rollup_matches_order_totals(workbook_path, tmp_path):
+    summary_df = month_frames(parse_workbook(workbook_path, month_days(MONTH, YEAR)), MONTH, YEAR)[1]
+    orders = order_rows(summary_df, FSC_RATE)
+    assert len(orders) < len(summary_df)
+    summary_path = tmp_path / 'book_Summary_February_2024.parquet'
+    write_summary_columnar(summary_df, summary_path, 2, YEAR)
+
+    report = consolidate([
+        (workbook_path, MONTH, YEAR),
+        (workbook_path, MONTH, YEAR),
+        (summary_path, None, None),
+    ])
+
+    by_month = report['by_month'].set_index('Period')
+    assert list(by_month.index) == ['2024-01', '2024-02']
+    # Two workbooks of January add up; the February summary file is the same month once
+    for period, copies in (('2024-01', 2), ('2024-02', 1)):
+        row = by_month.loc[period]
+        assert row['Orders'] == copies * len(orders)
+        assert row['Lines'] == copies * len(summary_df)
+        assert row['All Charge'] == pytest.approx(copies * orders['All Charge'].sum())
+        assert row['FSC'] == pytest.approx(copies * orders['FSC'].sum())
+        assert row['Total incl. FSC'] == pytest.approx(row['All Charge'] + row['FSC'])
+    assert report['by_area_total']['All Charge'].sum() == pytest.approx(by_month['All Charge'].sum())
+    assert report['by_transport']['Orders'].sum() == by_month['Orders'].sum()
+    assert [entry['period'] for entry in report['inputs']] == ['2024-01', '2024-01', '2024-02']
+
+    sheet = openpyxl.load_workbook(write_consolidation(report))['By Month']
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0][:3] == ('Period', 'Orders', 'Lines')
+    assert [row[0] for row in rows[1:3]] == ['2024-01', '2024-02']
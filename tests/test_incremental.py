@@ -0,0 +1,59 @@
+"""Month-to-date runs reuse unchanged days and give the same output as a full run"""
+
+import re
+import zipfile
+
+import openpyxl
+
+from billing import run_billing, run_incremental, state_path
+from billing.manifest import read_manifest
+
+from conftest import MONTH, YEAR
+
+
+def _rows(output):
+    return list(openpyxl.load_workbook(output)['Summary'].iter_rows(values_only=True))
+
+
+def test_unchanged_days_are_reused(workbook_path, tmp_path):
+    state = tmp_path / 'state' / 'month.pkl'
+    full, full_count = run_billing(workbook_path, MONTH, YEAR)
+
+    first, first_count, report = run_incremental(workbook_path, MONTH, YEAR, state)
+    assert report['extracted'] == [1, 2, 3] and report['reused'] == []
+    assert first_count == full_count
+    assert _rows(first) == _rows(full)
+
+    again, again_count, report = run_incremental(workbook_path, MONTH, YEAR, state)
+    assert report['extracted'] == [] and report['reused'] == [1, 2, 3]
+    assert report['resummarized'] == []
+    assert again_count == full_count
+    assert _rows(again) == _rows(full)
+
+
+def test_only_the_changed_day_is_extracted(workbook_path, tmp_path):
+    state = tmp_path / 'state' / 'month.pkl'
+    run_incremental(workbook_path, MONTH, YEAR, state)
+
+    # Edit one cell of day 2 in place; saving with openpyxl would renumber
+    # the shared strings every sheet refers to
+    changed = tmp_path / 'changed.xlsx'
+    member = read_manifest(workbook_path)['2']
+    with zipfile.ZipFile(workbook_path) as src, zipfile.ZipFile(changed, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == member:
+                data = re.sub(rb'(<c r="N9"[^>]*><v>)\d+(</v>)', rb'\g<1>99\g<2>', data)
+            dst.writestr(info, data)
+
+    output, record_count, report = run_incremental(changed, MONTH, YEAR, state)
+    assert report['extracted'] == [2] and report['reused'] == [1, 3]
+    assert _rows(output) == _rows(run_billing(changed, MONTH, YEAR)[0])
+
+
+def test_state_is_kept_per_owner(tmp_path):
+    owners = (None, 'a@example.com', 'b@example.com')
+    paths = {state_path('month.xlsx', MONTH, YEAR, tmp_path, owner) for owner in owners}
+    assert len(paths) == 3
+    assert all(path.endswith(f'month.xlsx-{YEAR}-{MONTH:02d}.pkl') for path in paths)
+    assert not any('example' in path for path in paths)
@@ -0,0 +1,84 @@
+"""open_workbook with a sheet list reads what load_workbook reads"""
+
+from io import BytesIO
+
+import openpyxl
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+import pytest
+
+from billing import ingest
+from billing.ingest import open_workbook
+from billing.manifest import SharedStrings
+
+SHEETS = ['1', '2', 'Cargo and Weight', 'Sell Price']
+
+
+@pytest.fixture
+def workbook():
+    """Day sheets, reference sheets and auxiliary tabs with awkward text"""
+    wb = openpyxl.Workbook()
+    wb.active.title = 'Notes'
+    wb['Notes']['A1'] = 'only on an auxiliary tab'
+    for name in SHEETS:
+        sheet = wb.create_sheet(name)
+        for row in range(1, 12):
+            sheet.append([
+                f'{name}-{row}', row, row * 1.5, None, 'a & b < c', '  padded  ', 'line\nbreak',
+                'literal _x005F_x0041_', 'ไทย', '',
+            ])
+        sheet['L3'] = CellRichText(['plain ', TextBlock(InlineFont(b=True), 'bold')])
+    wb.create_sheet('Aux')['A1'] = 'never read'
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def _values(wb, names):
+    return {name: list(wb[name].iter_rows(values_only=True)) for name in names}
+
+
+def test_selected_sheets_match_load_workbook(workbook):
+    full = openpyxl.load_workbook(BytesIO(workbook), read_only=True, data_only=True)
+    lazy = open_workbook(BytesIO(workbook), SHEETS + ['31'])
+    try:
+        assert lazy.sheetnames == SHEETS
+        assert _values(lazy, SHEETS) == _values(full, SHEETS)
+        # Decoded from the selected items, not from the whole table
+        assert not lazy['1']._shared_strings._complete
+    finally:
+        full.close()
+        lazy.close()
+
+
+@pytest.mark.parametrize('error', [
+    AttributeError('ExcelReader has no attribute parser'),
+    TypeError('ReadOnlyWorksheet() takes 4 positional arguments'),
+])
+def test_falls_back_to_whole_workbook(workbook, monkeypatch, error):
+    def changed_internals(file, sheets):
+        # Fail after reading part of the file, as a half-done open would
+        file.read(100)
+        raise error
+
+    monkeypatch.setattr(ingest, '_open_sheets', changed_internals)
+    wb = open_workbook(BytesIO(workbook), SHEETS)
+    try:
+        assert 'Aux' in wb.sheetnames
+        assert wb['1']['A9'].value == '1-9'
+    finally:
+        wb.close()
+
+
+def test_shared_strings_read_whole_table_on_unknown_index(workbook):
+    full = openpyxl.load_workbook(BytesIO(workbook), read_only=True)
+    lazy = open_workbook(BytesIO(workbook), ['1'])
+    try:
+        strings = SharedStrings(lazy._archive, [])
+        texts = [strings[idx] for idx in range(len(full.shared_strings))]
+        assert texts == list(full.shared_strings)
+        with pytest.raises(IndexError):
+            strings[len(texts)]
+    finally:
+        full.close()
+        lazy.close()
@@ -0,0 +1,100 @@
+"""JobRunner queueing, cancellation, expiry and the per-job worker budget"""
+
+import threading
+import time
+
+from billing.jobs import JobRunner, job_worker_budget
+
+
+def blocked(release, started=None, progress=None):
+    """A job that reports progress until release is set"""
+    if started is not None:
+        started.set()
+    while not release.wait(0.01):
+        progress(None, "working")
+    return {'body': b''}
+
+
+def result(value, progress=None):
+    return value
+
+
+def test_jobs_queue_behind_the_workers():
+    runner = JobRunner(max_workers=1)
+    release, started = threading.Event(), threading.Event()
+    try:
+        first, second = runner.submit(blocked, release, started), runner.submit(result, 2)
+        assert started.wait(10)
+        assert runner.get(second).status == 'queued'
+        assert runner.queue_position(second) == 1
+        assert runner.queue_position(first) is None
+        release.set()
+        assert runner.wait(second, timeout=10).result == 2
+        assert runner.get(first).status == 'done'
+    finally:
+        release.set()
+        runner.shutdown()
+
+
+def test_cancel_queued_and_running_jobs():
+    runner = JobRunner(max_workers=1)
+    release, started, ran = threading.Event(), threading.Event(), []
+    try:
+        running = runner.submit(blocked, release, started)
+        queued = runner.submit(lambda progress=None: ran.append(True))
+        assert started.wait(10)
+
+        assert runner.cancel(queued)
+        assert runner.get(queued).status == 'cancelled'
+        assert runner.cancel(running)
+        job = runner.wait(running, timeout=10)
+        assert job.status == 'cancelled' and job.result is None
+        assert not ran
+        # Done jobs and unknown ids cannot be cancelled
+        assert not runner.cancel(running)
+        assert not runner.cancel('missing')
+    finally:
+        release.set()
+        runner.shutdown()
+
+
+def test_finished_jobs_expire():
+    runner = JobRunner(max_workers=1, keep_seconds=0.05)
+    try:
+        old = runner.submit(result, 1)
+        runner.wait(old, timeout=10)
+        time.sleep(0.1)
+        new = runner.submit(result, 2)
+        runner.wait(new, timeout=10)
+        assert runner.get(old) is None
+        assert runner.get(new).result == 2
+    finally:
+        runner.shutdown()
+
+
+def test_kept_results_are_capped():
+    runner = JobRunner(max_workers=1, keep_jobs=3, keep_bytes=250)
+    try:
+        ids = [runner.submit(result, {'body': b'x' * 100}) for _ in range(5)]
+        for job_id in ids:
+            runner.wait(job_id, timeout=10)
+        # Two results fit in 250 bytes; the newest is always kept
+        assert [runner.get(job_id) is not None for job_id in ids] == [False, False, False, True, True]
+        large = runner.submit(result, {'body': b'x' * 1000})
+        runner.wait(large, timeout=10)
+        assert [job.id for job in runner.jobs()] == [large]
+    finally:
+        runner.shutdown()
+
+
+def test_workers_are_capped_at_the_job_budget(monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 8)
+    assert job_worker_budget(2) == 4
+    assert job_worker_budget(16) == 1
+    runner = JobRunner(max_workers=2)
+    try:
+        granted = [runner.wait(runner.submit(lambda workers=1, progress=None: workers, workers=workers),
+                               timeout=10).result for workers in (1, 64, None)]
+        assert granted == [1, 4, 4]
+    finally:
+        runner.shutdown()
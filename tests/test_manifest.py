@@ -0,0 +1,105 @@
+"""Sheet fingerprints and lazy shared strings on shared-string and namespace-prefixed XML"""
+
+from io import BytesIO
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from billing.ingest import open_workbook
+from billing.manifest import MAIN_NS, SHARED_STRINGS_PART, sheet_fingerprints
+
+MAIN = MAIN_NS[1:-1].encode()
+SHEET_PARTS = {'1': 'xl/worksheets/sheet1.xml', '2': 'xl/worksheets/sheet2.xml'}
+INLINE_CELL = re.compile(rb'<c r="(\w+)"([^>]*) t="inlineStr"><is><t>([^<]*)</t></is></c>')
+SHARED_STRINGS_REL = (b'<Relationship Id="rIdSst" Target="sharedStrings.xml" Type="http://schemas.openxmlformats.org'
+                      b'/officeDocument/2006/relationships/sharedStrings"/>')
+SHARED_STRINGS_TYPE = (b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                       b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>')
+
+
+def _prefixed(xml):
+    """The same XML with every spreadsheetml element under an x: prefix"""
+    xml = xml.replace(b'xmlns="' + MAIN + b'"', b'xmlns:x="' + MAIN + b'"')
+    return re.sub(rb'<(/?)(?=[A-Za-z])(?!\w+:)', rb'<\1x:', xml)
+
+
+def workbook(strings, prefix=False):
+    """Sheets '1' and '2' with their text in a shared string table
+
+    openpyxl writes text inline, so the cells are moved to a table the way
+    Excel stores them. strings is {sheet name: row of text}.
+    """
+    wb = openpyxl.Workbook()
+    wb.active.title = '1'
+    wb.create_sheet('2')
+    for name, row in strings.items():
+        wb[name].append(row)
+    source = BytesIO()
+    wb.save(source)
+
+    table = []
+
+    def shared(match):
+        text = match.group(3)
+        if text not in table:
+            table.append(text)
+        return b'<c r="%s"%s t="s"><v>%d</v></c>' % (match.group(1), match.group(2), table.index(text))
+
+    output = BytesIO()
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as dst:
+        parts = {info.filename: src.read(info) for info in src.infolist()}
+        for name in SHEET_PARTS.values():
+            parts[name] = INLINE_CELL.sub(shared, parts[name])
+        parts[SHARED_STRINGS_PART] = b'<sst xmlns="%s" count="%d" uniqueCount="%d">%s</sst>' % (
+            MAIN, len(table), len(table), b''.join(b'<si><t>%s</t></si>' % text for text in table))
+        parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+            b'</Relationships>', SHARED_STRINGS_REL + b'</Relationships>')
+        parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(
+            b'</Types>', SHARED_STRINGS_TYPE + b'</Types>')
+        if prefix:
+            for name in list(SHEET_PARTS.values()) + [SHARED_STRINGS_PART]:
+                parts[name] = _prefixed(parts[name])
+        for name, data in parts.items():
+            dst.writestr(name, data)
+    return output
+
+
+@pytest.mark.parametrize('prefix', [False, True])
+def test_fingerprint_follows_referenced_strings(prefix):
+    before = sheet_fingerprints(workbook({'1': ['a', 'b'], '2': ['c', 'd']}, prefix), ['1', '2'])
+    # Only the text of a string sheet 1 refers to changes; the table layout stays the same
+    after = sheet_fingerprints(workbook({'1': ['a', 'B'], '2': ['c', 'd']}, prefix), ['1', '2'])
+    assert after['1'] != before['1']
+    assert after['2'] == before['2']
+
+
+def test_unmatched_cells_hash_the_whole_table():
+    def with_comment(file):
+        # A comment inside the cell hides the index from SHARED_STRING_CELL
+        output = BytesIO()
+        with zipfile.ZipFile(file) as src, zipfile.ZipFile(output, 'w') as dst:
+            for info in src.infolist():
+                data = src.read(info)
+                if info.filename == SHEET_PARTS['1']:
+                    data = data.replace(b't="s"><v>', b't="s"><!-- --><v>', 1)
+                dst.writestr(info, data)
+        return output
+
+    before = sheet_fingerprints(with_comment(workbook({'1': ['a'], '2': ['c']})), ['1', '2'])
+    after = sheet_fingerprints(with_comment(workbook({'1': ['a'], '2': ['C']})), ['1', '2'])
+    # Sheet 1 cannot tell which strings it uses, so any change to the table counts
+    assert after['1'] != before['1']
+    assert after['2'] != before['2']
+
+
+def test_prefixed_shared_strings_are_read_lazily():
+    file = workbook({'1': ['a', 'b & c', 1], '2': ['c', 'a']}, prefix=True)
+    wb = open_workbook(file, ['1', '2'])
+    try:
+        assert [list(wb[name].iter_rows(values_only=True)) for name in ('1', '2')] == [
+            [('a', 'b & c', 1)], [('c', 'a')]]
+        assert not wb['2']._shared_strings._complete
+    finally:
+        wb.close()
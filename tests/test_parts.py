@@ -0,0 +1,59 @@
+"""Part Number matching tiers of PartIndex"""
+
+import pytest
+
+from billing.parts import DEFAULT_PART_MATCHING, PartIndex, normalize_part
+
+CATALOG = {'P-00119': 1.5, 'AB 1234': 2.0, '10168': 3.0, 'X-1': 4.0, 'x1': 5.0, 'LONGPART77': 6.0}
+
+
+def test_default_is_exact():
+    index = PartIndex(CATALOG)
+    assert DEFAULT_PART_MATCHING == 'exact'
+    assert index.match('P-00119') == ('P-00119', 'exact')
+    assert index.match('p00119') == (None, '')
+
+
+@pytest.mark.parametrize('value, key', [
+    ('p-00119', 'P00119'), (' ab\t12-34 ', 'AB1234'), (10168, '10168'), (10168.0, '10168'),
+    ('010168.0', '10168'), ('12–3', '123'), ('--', ''),
+])
+def test_normalize_part(value, key):
+    assert normalize_part(value) == key
+
+
+def test_normalized_keys():
+    index = PartIndex(CATALOG, 'normalized')
+    assert index.match('P-00119') == ('P-00119', 'exact')
+    assert index.match('p 00119') == ('P-00119', 'normalized')
+    assert index.match('10168.0') == ('10168', 'normalized')
+    assert index.match('AB1234') == ('AB 1234', 'normalized')
+    # No fallback tiers outside fuzzy matching
+    assert index.match('LONGPART7') == (None, '')
+
+
+def test_ambiguous_normalized_collision():
+    index = PartIndex(CATALOG, 'normalized')
+    # 'X-1' and 'x1' share the key X1 with different weights: exact matches only
+    assert index.match('X-1') == ('X-1', 'exact')
+    assert index.match('x1') == ('x1', 'exact')
+    assert index.match('x-1') == (None, '')
+    # The same weight under both spellings is not ambiguous
+    assert PartIndex({'X-1': 4.0, 'x1': 4.0}, 'normalized').match('x-1')[1] == 'normalized'
+
+
+def test_fuzzy_fallback():
+    index = PartIndex(CATALOG, 'fuzzy')
+    assert index.match('LONGPART7') == ('LONGPART77', 'prefix')
+    assert index.match('LONGPART77A') == ('LONGPART77', 'prefix')
+    assert index.match('LONGPERT77') == ('LONGPART77', 'approximate')
+    # Too short for a fallback, and too far from any catalog part
+    assert index.match('P00') == (None, '')
+    assert index.match('ZZZZZZZZ') == (None, '')
+    assert index.match_keys(['p00119', '', 'LONGPART7']) == (
+        ['P-00119', None, 'LONGPART77'], ['normalized', '', 'prefix'])
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match='Unknown part matching'):
+        PartIndex(CATALOG, 'loose')
@@ -0,0 +1,29 @@
+"""Day sheets read in worker processes give what a serial read gives"""
+
+import openpyxl
+
+from billing import run_billing
+from billing.ingest import month_days
+from billing.pipeline import parse_workbook
+
+from conftest import MONTH, YEAR
+
+
+def _rows(output):
+    return list(openpyxl.load_workbook(output)['Summary'].iter_rows(values_only=True))
+
+
+def test_parallel_extraction_matches_serial(workbook_path):
+    days = month_days(MONTH, YEAR)
+    reported = []
+    serial = parse_workbook(workbook_path, days)
+    parallel = parse_workbook(workbook_path, days, workers=2,
+                              progress=lambda fraction, message: reported.append(fraction))
+
+    assert list(parallel['days']) == list(serial['days'])
+    assert parallel == serial
+    # Every day is reported, sheet or not
+    day_fractions = [fraction for fraction in reported if fraction is not None]
+    assert len(day_fractions) == len(days) and max(day_fractions) == 1
+    assert _rows(run_billing(workbook_path, MONTH, YEAR, workers=2)[0]) == _rows(
+        run_billing(workbook_path, MONTH, YEAR)[0])
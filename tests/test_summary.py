@@ -0,0 +1,146 @@
+"""The vectorized summary against the per-row rules of the VBA port it replaced"""
+
+from datetime import date, datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from billing import run_billing, summarize
+from billing.ingest import DAY_COLUMNS, FIRST_DATA_ROW, _new_batch, month_days
+from billing.pipeline import typed_columns
+from billing.summary import SUMMARY_COLUMNS
+
+from conftest import MONTH, YEAR
+
+NUMBER_COLUMNS = ["Total Pick Q'TY", 'Ship Total WT', 'Up 10KG/Chg', 'Rate/KG', 'Min/Charge', 'All Charge',
+                  "Pick Q'TY"]
+
+
+def reference_summary(path, month, year):
+    """Summary rows computed one order and one line at a time, as the original macro port did"""
+    wb = openpyxl.load_workbook(path, data_only=True)
+    lines = []
+    for day in month_days(month, year):
+        if str(day) not in wb.sheetnames:
+            continue
+        sheet = wb[str(day)]
+        row = FIRST_DATA_ROW
+        while sheet.cell(row, 1).value is not None:
+            values = [sheet.cell(row, col).value for col in range(1, len(DAY_COLUMNS) + 1)]
+            lines.append(dict(zip(DAY_COLUMNS, values), **{'Order Date': date(year, month, day)}))
+            row += 1
+
+    cargo_lookup = {}
+    row = 3
+    while wb['Cargo and Weight'].cell(row, 2).value is not None:
+        part, weight = wb['Cargo and Weight'].cell(row, 2).value, wb['Cargo and Weight'].cell(row, 5).value
+        if part and weight:
+            cargo_lookup[str(part)] = float(weight)
+        row += 1
+    sell_lookup = {}
+    row = 2
+    while wb['Sell Price'].cell(row, 1).value is not None:
+        post_code, area, min_charge, rate_kg = (wb['Sell Price'].cell(row, col).value for col in (1, 3, 4, 5))
+        sell_lookup[str(int(post_code))] = (area, float(min_charge or 0), float(rate_kg or 0))
+        row += 1
+
+    temp_df = pd.DataFrame(lines).sort_values(by=['Order Date', 'DU-Order'])
+    rows = []
+    for du_order, group in temp_df.groupby('DU-Order'):
+        first = group.iloc[0]
+        total_weight = 0
+        for _, line in group.iterrows():
+            part = str(line['Part Number']) if pd.notna(line['Part Number']) else ''
+            if part in cargo_lookup:
+                total_weight += line['Pick QTY'] * cargo_lookup[part]
+        post_code = str(int(first['Post Code'])) if pd.notna(first['Post Code']) else ''
+        area, min_charge, rate_kg = sell_lookup.get(post_code, ("Post Code Not Found", 0, 0))
+        up_10kg = max(total_weight - 10, 0) if total_weight > 10 else 0
+        order = {
+            'Order Date': first['Order Date'], 'DU-Order': du_order, 'Post Code': first['Post Code'],
+            'Area': area, "Total Pick Q'TY": group['Pick QTY'].sum(), 'Ship Total WT': total_weight,
+            'Up 10KG/Chg': up_10kg, 'Rate/KG': rate_kg, 'Min/Charge': min_charge,
+            'All Charge': up_10kg * rate_kg + min_charge, 'Transport': 'STL' if area == 'BKK' else 'DASH',
+        }
+        for _, line in group.iterrows():
+            part = str(line['Part Number']) if pd.notna(line['Part Number']) else ''
+            weight = line['Pick QTY'] * cargo_lookup[part] if part in cargo_lookup else 'Part Not Found'
+            rows.append(dict(order, **{'Part No.': part, "Pick Q'TY": line['Pick QTY'], 'Total Weight': weight}))
+    return rows
+
+
+def read_summary(output):
+    sheet = openpyxl.load_workbook(output)['Summary']
+    rows = list(sheet.iter_rows(values_only=True))
+    assert list(rows[0]) == SUMMARY_COLUMNS
+    return rows
+
+
+def _plain(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def test_run_matches_per_row_rules(workbook_path):
+    output, record_count = run_billing(workbook_path, MONTH, YEAR)
+    rows = read_summary(output)
+    expected = reference_summary(workbook_path, MONTH, YEAR)
+
+    assert record_count == len(expected)
+    data = [dict(zip(SUMMARY_COLUMNS, map(_plain, row))) for row in rows[1:1 + record_count]]
+    for got, want in zip(data, expected):
+        for name, value in want.items():
+            if name in NUMBER_COLUMNS or (name == 'Total Weight' and value != 'Part Not Found'):
+                assert got[name] == pytest.approx(value), (want['DU-Order'], name)
+            else:
+                assert got[name] == value, (want['DU-Order'], name)
+
+    # The workbook exercises both lookups failing
+    assert any(row['Area'] == "Post Code Not Found" for row in expected)
+    assert any(row['Total Weight'] == 'Part Not Found' for row in expected)
+
+
+def test_footer(workbook_path):
+    output, record_count = run_billing(workbook_path, MONTH, YEAR)
+    sheet = openpyxl.load_workbook(output)['Summary']
+    last = record_count + 1
+    total, fsc = last + 4, last + 7
+    assert [sheet.cell(total, col).value for col in (13, 14, 18)] == [
+        f'=SUM(M2:M{last})', f'=SUM(N2:N{last})', f'=SUM(R2:R{last})']
+    assert [sheet.cell(total + 1, col).value for col in (13, 14, 18)] == ['CTN', 'KG', 'BATH']
+    assert sheet.cell(fsc, 13).value == 'Fuel surcharge (FSC)'
+    assert sheet.cell(fsc, 14).value == f'=R{total}*0.1362'
+    assert sheet.cell(fsc, 18).value == f'=R{total}+N{fsc}'
+
+
+def detail(lines):
+    """Detail frame from (DU-Order, Post Code, Part Number, Pick QTY) lines"""
+    batch = _new_batch()
+    for du_order, post_code, part, quantity in lines:
+        values = dict.fromkeys(DAY_COLUMNS)
+        values.update({'DU': du_order.split('-')[0], 'DU-Order': du_order, 'Post Code': post_code,
+                       'Part Number': part, 'Pick QTY': quantity})
+        batch['Order Date'].append(date(YEAR, MONTH, 1))
+        for name in DAY_COLUMNS:
+            batch[name].append(values[name])
+    return typed_columns(batch)
+
+
+def test_ten_kilogram_threshold():
+    frame = detail([('A-1', 10100, 'P1', 19), ('B-2', 10100, 'P1', 20), ('C-3', 10100, 'P1', 21)])
+    summary = summarize(frame, {'P1': 0.5}, {'10100': {'area': 'BKK', 'min_charge': 150, 'rate_kg': 4}})
+    orders = summary.set_index('DU-Order')
+    assert list(orders['Ship Total WT']) == [9.5, 10.0, 10.5]
+    assert list(orders['Up 10KG/Chg']) == [0, 0, 0.5]
+    assert list(orders['All Charge']) == [150, 150, 152]
+    assert set(orders['Transport']) == {'STL'}
+
+
+def test_non_numeric_post_code_on_a_later_line():
+    frame = detail([('A-1', 10100, 'P1', 1), ('A-1', 'N/A', 'P1', 1), ('B-2', 'N/A', 'P2', 1)])
+    summary = summarize(frame, {'P1': 1.0}, {'10100': {'area': 'UPC', 'min_charge': 200, 'rate_kg': 5}})
+    orders = summary.drop_duplicates('DU-Order').set_index('DU-Order')
+    assert orders.loc['A-1', 'Area'] == 'UPC'
+    assert orders.loc['A-1', 'Transport'] == 'DASH'
+    assert orders.loc['B-2', 'Area'] == "Post Code Not Found"
+    assert summary['Total Weight'].iloc[-1] == 'Part Not Found'
@@ -0,0 +1,65 @@
+"""Tariff selection by customer and date, weight bands and the weighted footer FSC"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from billing.tariff import STANDARD_TARIFF, TariffBook
+from billing.writer import footer_fsc_rate
+
+STANDARD_FSC = STANDARD_TARIFF['fsc_rate']
+
+
+def orders(*rows, customer_field='Sold To'):
+    """Order frame from (customer, Order Date, Ship Total WT) rows at 2 per kg above a 100 minimum"""
+    return pd.DataFrame({
+        customer_field: [customer for customer, _, _ in rows],
+        'Order Date': [order_date for _, order_date, _ in rows],
+        'Ship Total WT': [weight for _, _, weight in rows],
+        'Rate/KG': 2.0,
+        'Min/Charge': 100.0,
+        'Area': 'BKK',
+    })
+
+
+def test_customer_override():
+    book = TariffBook([{'name': 'acme', 'customer': 'ACME', 'threshold_kg': 5, 'fsc_rate': 0.1,
+                        'transport': {}, 'default_transport': 'TRUCK'}])
+    priced = book.price(orders(('ACME', date(2024, 1, 2), 20), ('OTHER', date(2024, 1, 2), 20)))
+    assert list(priced['Up 10KG/Chg']) == [15, 10]
+    assert list(priced['All Charge']) == [130, 120]
+    assert list(priced['Transport']) == ['TRUCK', 'STL']
+    assert list(priced['FSC Rate']) == [0.1, STANDARD_FSC]
+
+
+def test_effective_date_switch():
+    book = TariffBook([
+        {'name': 'old', 'valid_to': '2024-01-14', 'fsc_rate': 0.1},
+        {'name': 'new', 'valid_from': '2024-01-15', 'fsc_rate': 0.2},
+    ])
+    priced = book.price(orders(*[(None, date(2024, 1, day), 20) for day in (14, 15, 16)]))
+    assert list(priced['FSC Rate']) == [0.1, 0.2, 0.2]
+
+
+def test_band_boundaries():
+    book = TariffBook([{'threshold_kg': 10, 'bands': [{'above_kg': 100, 'factor': 0.5}]}])
+    priced = book.price(orders(*[(None, date(2024, 1, 2), weight) for weight in (10, 11, 100, 102, 150)]))
+    # Weight above 100 kg is charged at half the rate
+    assert list(priced['Up 10KG/Chg']) == [0, 1, 90, 92, 140]
+    assert list(priced['All Charge']) == pytest.approx([100, 102, 280, 282, 330])
+
+
+def test_missing_customer_field():
+    book = TariffBook([{'customer': 'ACME'}], customer_field='Customer')
+    with pytest.raises(ValueError, match="'Customer'"):
+        book.price(orders(('ACME', date(2024, 1, 2), 20)))
+    # Without per-customer tariffs the field is not needed
+    TariffBook([], customer_field='Customer').price(orders(('ACME', date(2024, 1, 2), 20)))
+
+
+def test_footer_fsc_is_charge_weighted():
+    summary = pd.DataFrame({'All Charge': [300.0, 100.0], 'FSC Rate': [0.1, 0.2]})
+    assert footer_fsc_rate(summary) == pytest.approx(0.125)
+    assert footer_fsc_rate(summary.assign(**{'FSC Rate': 0.1})) == 0.1
+    assert footer_fsc_rate(summary.drop(columns='FSC Rate')) == STANDARD_FSC
@@ -0,0 +1,63 @@
+"""validate_workbook counts against the synthetic workbook's known defects"""
+
+import openpyxl
+
+from billing import validate_workbook
+from billing.ingest import FIRST_DATA_ROW
+
+from conftest import MONTH, YEAR
+
+
+def _day_lines(path):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    lines = []
+    for name in ('1', '2', '3'):
+        for values in wb[name].iter_rows(min_row=FIRST_DATA_ROW, values_only=True):
+            if values[0] is None:
+                break
+            lines.append(values)
+    wb.close()
+    return lines
+
+
+def test_counts(workbook_path):
+    lines = _day_lines(workbook_path)
+    result = validate_workbook(workbook_path, MONTH, YEAR, part_matching='exact')
+
+    assert result['days'] == [1, 2, 3]
+    assert result['rows'] == len(lines)
+    assert result['reference_checked']
+    assert result['counts'].get('missing_part') == sum(values[12] == 'UNKNOWN-PART' for values in lines)
+    assert result['counts'].get('unknown_post_code') == sum(values[10] == 99999 for values in lines)
+    assert set(result['counts']) == {'missing_part', 'unknown_post_code'}
+    assert len(result['anomalies']) == sum(result['counts'].values())
+
+
+def test_bad_cells_are_located(workbook_path, tmp_path):
+    path = tmp_path / 'bad.xlsx'
+    wb = openpyxl.load_workbook(workbook_path)
+    wb['1']['N9'] = 'ten'
+    wb['1']['K10'] = 'N/A'
+    wb.create_sheet('31')['A9'] = 'DU-extra'
+    wb.save(path)
+
+    result = validate_workbook(path, 2, YEAR, part_matching='exact')
+    located = {(a['kind'], a['sheet'], a['row'], a['column']) for a in result['anomalies']}
+    assert ('bad_quantity', '1', 9, 'N') in located
+    assert ('malformed_post_code', '1', 10, 'K') in located
+    assert ('day_outside_month', '31', None, None) in located
+
+
+def test_post_codes_are_keyed_like_the_summary(workbook_path, tmp_path):
+    path = tmp_path / 'text_post_codes.xlsx'
+    wb = openpyxl.load_workbook(workbook_path)
+    post_code = next(value for value in (wb['1'].cell(row, 11).value for row in range(FIRST_DATA_ROW, 60))
+                     if value != 99999)
+    # Text and float copies of a known post code are found; '<code>.0' as text is not a number
+    wb['1']['K9'], wb['1']['K10'], wb['1']['K11'] = str(post_code), float(post_code), f'{post_code}.0'
+    wb.save(path)
+
+    result = validate_workbook(path, MONTH, YEAR, part_matching='exact')
+    located = {a['row']: a['kind'] for a in result['anomalies'] if a['sheet'] == '1' and a['column'] == 'K'}
+    assert 9 not in located and 10 not in located
+    assert located[11] == 'malformed_post_code'
@@ -0,0 +1,46 @@
+"""Grand totals of the flat and normalized layouts written from the same month"""
+
+import openpyxl
+import pytest
+
+from billing.ingest import month_days
+from billing.pipeline import month_frames, parse_workbook
+from billing.summary import order_rows
+from billing.writer import FLAT_TOTAL_LABEL, ORDER_TOTAL_LABEL, write_summary
+
+from conftest import MONTH, YEAR
+
+
+@pytest.fixture(scope='module')
+def summary_df(workbook_path):
+    parsed = parse_workbook(workbook_path, month_days(MONTH, YEAR))
+    return month_frames(parsed, MONTH, YEAR)[1]
+
+
+def _column(sheet, name):
+    """Header-matched column of a sheet: (data values, value of the totals row)"""
+    rows = list(sheet.iter_rows(values_only=True))
+    col_idx = rows[0].index(name)
+    return [row[col_idx] for row in rows[1:-1]], rows[-1]
+
+
+def test_layout_totals(summary_df):
+    flat = openpyxl.load_workbook(write_summary(summary_df, layout='flat'))['Summary']
+    last = len(summary_df) + 1
+    flat_lines = [flat.cell(row, 18).value for row in range(2, last + 1)]
+    assert flat.cell(last + 4, 12).value == FLAT_TOTAL_LABEL
+    assert flat.cell(last + 4, 18).value == f'=SUM(R2:R{last})'
+
+    normalized = openpyxl.load_workbook(write_summary(summary_df, layout='normalized'))
+    charges, total_row = _column(normalized['Orders'], 'All Charge')
+    assert total_row[0] == ORDER_TOTAL_LABEL
+    for sheet in ('By Day', 'By Area'):
+        pivot_charges, pivot_total = _column(normalized[sheet], 'All Charge')
+        assert pivot_total[0] == ORDER_TOTAL_LABEL
+        assert sum(pivot_charges) == pytest.approx(sum(charges))
+
+    # The flat footer counts an order's charge once per line, the Orders sheet once
+    orders = order_rows(summary_df)
+    assert sum(charges) == pytest.approx(orders['All Charge'].sum())
+    assert sum(flat_lines) == pytest.approx((orders['All Charge'] * orders['Lines']).sum())
+    assert (orders['Lines'] > 1).any() and sum(flat_lines) > sum(charges)